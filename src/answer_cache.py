@@ -0,0 +1,302 @@
+# answer_cache.py
+
+# %%
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from instrumentation import node_scope, record_answer_cache, track_request
+from query_analysis import agenerate_query_analysis, generate_query_analysis, route_query_type
+from streaming import astream_graph, stream_graph
+
+# %%
+# --- 1. 설정 ---
+ANSWER_CACHE_BACKEND = os.getenv("ANSWER_CACHE_BACKEND", "memory")     # 'memory' | 'sqlite'
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "./db/answer_cache.sqlite")
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 60 * 60)))  # 초
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+KEY_FIELDS = ['status', 'title', 'year', 'casts', 'director', 'genre', 'ott', 'info']
+
+# %%
+# --- 2. 캐시 키 (정규화된 QueryDetails + 분기) ---
+
+def normalize_query(value: str) -> str:
+    """대소문자, 전각/반각, 공백, 문장부호 차이를 없앤 문자열을 반환합니다. (답변 캐시 키와 server.coalesce_key가 같이 사용)"""
+    value = unicodedata.normalize("NFKC", value).lower()
+    return re.sub(r"[\s\W_]+", "", value)
+
+
+def canonicalize_query_details(details: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    generate_query_analysis의 결과를 비교 가능한 형태로 정규화합니다.
+    (리스트는 정렬, Enum은 값으로, 문자열은 normalize_query 적용)
+    """
+    canonical: Dict[str, Any] = {}
+    for key in KEY_FIELDS:
+        value = details.get(key)
+        if isinstance(value, list):
+            values = [v.value if hasattr(v, 'value') else str(v) for v in value]
+            value = sorted({normalize_query(v) if key in ('casts', 'director') else v for v in values}) or None
+        elif hasattr(value, 'value'):
+            value = value.value
+        elif isinstance(value, str):
+            value = normalize_query(value) or None
+        canonical[key] = value
+    return canonical
+
+
+def make_cache_key(query: str, details: Dict[str, Any], route: str) -> str:
+    """
+    정규화된 QueryDetails와 route_query_type의 분기로 캐시 키를 만듭니다.
+    특정 작품 검색(specific_search)은 같은 작품이라도 질문마다 답이 달라지므로
+    (예: '감독이 누구야' / '줄거리 알려줘') 정규화된 원본 쿼리도 키에 포함합니다.
+    """
+    payload = {"route": route, "details": canonicalize_query_details(details)}
+    if route == "specific_search":
+        payload["query"] = normalize_query(query)
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _serialize_documents(docs: List[Document]) -> List[Dict[str, Any]]:
+    return [{"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata} for doc in docs or []]
+
+
+def _deserialize_documents(items: List[Dict[str, Any]]) -> List[Document]:
+    return [Document(id=item.get("id"), page_content=item["page_content"], metadata=item.get("metadata") or {}) for item in items]
+
+# %%
+# --- 3. 캐시 백엔드 ---
+
+class InMemoryAnswerCache:
+    """프로세스 메모리에 저장하는 TTL + LRU 캐시."""
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl: float = ANSWER_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, value = entry
+            if time.time() - created_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteAnswerCache:
+    """
+    SQLite 파일에 저장하는 TTL + LRU 캐시.
+    Streamlit을 재시작해도 캐시된 답변이 유지됩니다.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 ttl: float = ANSWER_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Streamlit은 여러 스레드에서 호출하므로 연결 하나를 lock으로 보호해서 공유
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS answer_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answer_cache_access ON answer_cache(last_access)")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, created_at FROM answer_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM answer_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE answer_cache SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answer_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            # 만료된 항목 정리 후, 최대 개수를 넘으면 가장 오래 사용되지 않은 항목부터 삭제
+            self._conn.execute("DELETE FROM answer_cache WHERE created_at < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM answer_cache WHERE key IN ("
+                " SELECT key FROM answer_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM answer_cache")
+
+
+def create_answer_cache_backend(backend: str = ANSWER_CACHE_BACKEND):
+    """환경 변수(ANSWER_CACHE_BACKEND)에 따라 캐시 백엔드를 생성합니다."""
+    if backend == "sqlite":
+        return SQLiteAnswerCache()
+    if backend == "memory":
+        return InMemoryAnswerCache()
+    raise ValueError(f"지원하지 않는 ANSWER_CACHE_BACKEND: {backend}")
+
+# %%
+# --- 4. 컴파일된 그래프를 감싸는 캐시 레이어 ---
+
+class CachedRagApp:
+    """
+    build_graph()로 컴파일된 앱을 감싸서, 같은 의미의 요청이면
+    그래프 전체를 다시 실행하지 않고 저장된 answer / context를 반환합니다.
+    analyze는 캐시 키를 만들기 위해 그래프 밖에서 실행하는 쿼리 분석기로, 기본값은 build_graph가
+    rag_query_mode에 맞춰 붙여 둔 app.query_analyzer입니다. (combined 모드면 rag_query까지 분석 결과에 포함)
+    aanalyze는 ainvoke / astream에서 쓰는 비동기 분석기 (기본값 app.aquery_analyzer,
+    analyze만 지정했으면 그 analyze를 스레드에서 실행)
+    """
+
+    def __init__(self, app, backend=None, analyze=None, aanalyze=None):
+        self.app = app
+        self.backend = backend if backend is not None else create_answer_cache_backend()
+        self.analyze = analyze or getattr(app, "query_analyzer", generate_query_analysis)
+        if aanalyze is None and analyze is None:
+            aanalyze = getattr(app, "aquery_analyzer", agenerate_query_analysis)
+        self.aanalyze = aanalyze
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _record(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def _lookup(self, inputs: Dict[str, Any]):
+        """쿼리 분석 후 (분석된 state, 캐시 키, 캐시된 state 또는 None)을 반환합니다."""
+        # 쿼리 분석은 캐시 키를 만들기 위해 그래프 밖에서 먼저 수행 (rag_query 등 분석 결과 전체를 그래프로 넘김)
+        with node_scope("generate_query_analysis"):
+            details = self.analyze({"query": inputs["query"]})
+        return self._lookup_analyzed(inputs, details)
+
+    async def _alookup(self, inputs: Dict[str, Any]):
+        """_lookup의 비동기 버전"""
+        with node_scope("generate_query_analysis"):
+            if self.aanalyze is not None:
+                details = await self.aanalyze({"query": inputs["query"]})
+            else:
+                details = await asyncio.to_thread(self.analyze, {"query": inputs["query"]})
+        return self._lookup_analyzed(inputs, details)
+
+    def _lookup_analyzed(self, inputs: Dict[str, Any], details: Dict[str, Any]):
+        query = inputs["query"]
+        state = {**inputs, **details}
+        route = route_query_type(state)
+        key = make_cache_key(query, details, route)
+
+        cached = self.backend.get(key)
+        self._record(hit=cached is not None)
+        record_answer_cache(hit=cached is not None)
+        if cached is None:
+            return state, key, None
+        print(f"--- 답변 캐시 적중 ({route}) ---")
+        return state, key, {**state, "answer": cached["answer"], "context": _deserialize_documents(cached["context"])}
+
+    def _store(self, key: str, final_state: Dict[str, Any]) -> None:
+        if final_state.get("answer"):
+            self.backend.set(key, {
+                "answer": final_state["answer"],
+                "context": _serialize_documents(final_state.get("context", [])),
+            })
+
+    def invoke(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        with track_request(inputs["query"]) as request:
+            state, key, cached_state = self._lookup(inputs)
+            if cached_state is not None:
+                request.branch = route_query_type(state)
+                return cached_state
+
+            # 캐시 미스: 분석 결과를 넘겨서 그래프 실행 (generate_query_analysis는 분석을 재사용)
+            final_state = self.app.invoke(state)
+            self._store(key, final_state)
+            return final_state
+
+    def stream(self, inputs: Dict[str, Any]):
+        """streaming.stream_graph와 같은 이벤트를 내보냅니다. (캐시 적중 시 답변 전체를 한 번에 전달)"""
+        with track_request(inputs["query"]) as request:
+            state, key, cached_state = self._lookup(inputs)
+            if cached_state is not None:
+                request.branch = route_query_type(state)
+                yield "token", cached_state["answer"]
+                yield "done", cached_state
+                return
+
+            for kind, payload in stream_graph(self.app, state):
+                if kind == "done":
+                    self._store(key, payload)
+                yield kind, payload
+
+    async def ainvoke(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """invoke의 비동기 버전. 그래프는 app.ainvoke로 실행합니다."""
+        with track_request(inputs["query"]) as request:
+            state, key, cached_state = await self._alookup(inputs)
+            if cached_state is not None:
+                request.branch = route_query_type(state)
+                return cached_state
+
+            final_state = await self.app.ainvoke(state)
+            self._store(key, final_state)
+            return final_state
+
+    async def astream(self, inputs: Dict[str, Any]):
+        """stream의 비동기 버전. 그래프는 app.astream으로 실행합니다. (server.py)"""
+        with track_request(inputs["query"]) as request:
+            state, key, cached_state = await self._alookup(inputs)
+            if cached_state is not None:
+                request.branch = route_query_type(state)
+                yield "token", cached_state["answer"]
+                yield "done", cached_state
+                return
+
+            async for kind, payload in astream_graph(self.app, state):
+                if kind == "done":
+                    self._store(key, payload)
+                yield kind, payload
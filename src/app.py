@@ -1,28 +1,40 @@
 import streamlit as st
-from main_graph import build_graph
+from rag_client import RAG_SERVER_URL, get_stats, stream_query
 
-# --- 1. 그래프 로드 (캐시 사용) ---
-# @st.cache_resource: 앱이 실행될 때 그래프를 한 번만 빌드하고 캐시에 저장
-@st.cache_resource
-def get_rag_app():
-    """
-    LangGraph 앱을 빌드하고 반환합니다.
-    """
-    # service.py, .env, ChromaDB 등이 모두 준비되어 있어야 함
+# 그래프는 server.py(ASGI 서버)가 실행합니다. 먼저 `python server.py`로 서버를 띄우고 RAG_SERVER_URL로 연결
+# (같은 질문의 동시 요청 합치기 / 혼잡 시 429 / 요청 마감 시간은 서버에서 처리)
+
+# --- 1. 서버 상태 ---
+def get_server_stats():
     try:
-        app = build_graph()
-        return app
-    except Exception as e:
-        st.error(f"그래프 빌드 중 오류 발생: {e}")
+        return get_stats()
+    except Exception:
         return None
 
-# 그래프 빌드 시도
-rag_app = get_rag_app()
+server_stats = get_server_stats()
 
 # --- 2. Streamlit UI 설정 ---
 st.title("🎬 OTT RAG 챗봇")
 st.caption("LangGraph와 Streamlit으로 만든 영화/드라마 추천 봇입니다.")
 
+# 답변 캐시 적중률 표시
+if server_stats is None:
+    st.sidebar.caption(f"RAG 서버({RAG_SERVER_URL})에 연결할 수 없습니다.")
+else:
+    cache_stats = server_stats.get("answer_cache")
+    if cache_stats:
+        st.sidebar.caption(
+            f"답변 캐시: hit {cache_stats['hits']} / miss {cache_stats['misses']} "
+            f"({cache_stats['hit_rate']:.0%})"
+        )
+    st.sidebar.caption(
+        f"요청 합치기: {server_stats['coalesced']} / {server_stats['requests']}, "
+        f"혼잡 거절: {server_stats['rejected']}"
+    )
+    # 분기별 첫 토큰까지 걸린 시간 (p50)
+    for branch, ttft in server_stats["ttft"].items():
+        st.sidebar.caption(f"TTFT {branch}: p50 {ttft['p50']:.2f}s (n={ttft['count']})")
+
 # --- 3. 채팅 기록 세션 초기화 ---
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -35,34 +47,44 @@ for message in st.session_state.messages:
 # --- 5. 사용자 입력 및 챗봇 응답 ---
 if prompt := st.chat_input("영화 '승부'에 대해 알려줘"):
     
-    # 그래프가 정상적으로 로드되었는지 확인
-    if rag_app is None:
-        st.error("챗봇 애플리케이션을 로드하지 못했습니다. 관리자에게 문의하세요.")
+    # 서버에 연결되는지 확인
+    if server_stats is None:
+        st.error("챗봇 서버에 연결하지 못했습니다. 관리자에게 문의하세요.")
     else:
         # 1. 사용자 메시지를 기록하고 UI에 표시
         st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # 2. 봇 응답 생성
+        # 2. 봇 응답 생성 (진행 단계와 답변 토큰을 스트리밍으로 표시)
         with st.chat_message("assistant"):
-            with st.spinner("답변을 생성 중입니다... 🤖"):
-                try:
-                    # LangGraph 앱 호출
-                    inputs = {"query": prompt}
-                    
-                    # .invoke()를 사용해 최종 상태(답변)를 받음
-                    final_state = rag_app.invoke(inputs)
-                    
-                    # 최종 답변 추출
-                    response = final_state.get('answer', '죄송합니다. 답변을 생성하지 못했습니다.')
-                    
-                    st.markdown(response)
-                    
-                    # 3. 봇 응답을 기록
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                    
-                except Exception as e:
-                    response = f"답변 생성 중 오류가 발생했습니다: {e}"
-                    st.error(response)
-                    st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
+            progress = st.status("쿼리 분석 중...", expanded=False)
+            answer_placeholder = st.empty()
+            try:
+                # RAG 서버 호출 (SSE)
+                tokens = []
+                final_state = {}
+                for kind, payload in stream_query(prompt):
+                    if kind == "progress":
+                        progress.update(label=f"{payload}...")
+                    elif kind == "token":
+                        tokens.append(payload)
+                        answer_placeholder.markdown("".join(tokens) + "▌")
+                    elif kind == "done":
+                        final_state = payload
+                
+                progress.update(label="답변 완료", state="complete")
+                
+                # 최종 답변 추출
+                response = final_state.get('answer') or "".join(tokens) or '죄송합니다. 답변을 생성하지 못했습니다.'
+                
+                answer_placeholder.markdown(response)
+                
+                # 3. 봇 응답을 기록
+                st.session_state.messages.append({"role": "assistant", "content": response})
+                
+            except Exception as e:
+                progress.update(label="오류 발생", state="error")
+                response = f"답변 생성 중 오류가 발생했습니다: {e}"
+                st.error(response)
+                st.session_state.messages.append({"role": "assistant", "content": response})
@@ -0,0 +1,165 @@
+# batch_runner.py
+"""
+여러 사용자 쿼리를 묶어서 그래프로 실행하고 결과를 JSONL로 내보냅니다.
+(홈 화면 추천 미리 만들기, 프롬프트 변경 평가 같은 오프라인 작업)
+
+쿼리를 --chunk-size개씩 읽어서 chunk마다
+    1. 쿼리 분석: 규칙 기반 fast-path로 끝나지 않는 쿼리만 모아 query_analysis_chain.batch 한 번
+    2. route_query_type으로 분기별로 묶어서 정렬 (같은 분기 요청이 함께 실행되어 검색이 잘 모임)
+    3. app.batch_as_completed로 실행, LLM 동시 호출은 --concurrency개로 제한
+       그래프 안의 벡터 검색은 search_batcher.BatchingVectorStore가 모아서
+       embed_documents 한 번 + 다중 질의 검색 한 번으로 처리 (SEARCH_BATCH_WINDOW_MS)
+    4. 끝나는 순서대로 결과를 한 줄씩 기록 (입력 순서는 "index" 필드)
+
+실행 방법:
+    python batch_runner.py --input queries.txt --output ./output/batch_results.jsonl
+    cat queries.jsonl | python batch_runner.py --chunk-size 64 --concurrency 16
+입력은 한 줄에 쿼리 하나, 또는 {"query": "..."} 형식의 JSON 한 줄입니다.
+"""
+
+# %%
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+# 검색을 모으는 시간(ms). service.py가 import되기 전에 지정해야 하므로 main()에서 환경 변수로 넘김
+DEFAULT_SEARCH_BATCH_WINDOW_MS = "20"
+
+# %%
+# --- 1. 입력 ---
+
+def read_queries(lines: TextIO) -> Iterator[str]:
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            yield json.loads(line)["query"]
+        else:
+            yield line
+
+# %%
+# --- 2. 쿼리 분석 (배치) ---
+
+def analyze_queries(queries: List[str], concurrency: int, rag_query_mode: str) -> List[Dict[str, Any]]:
+    """
+    generate_query_analysis와 같은 분석을 쿼리 묶음에 대해 수행합니다.
+    fast-path 확신도가 낮은 쿼리만 LLM 체인의 batch 한 번으로 분석하고, 실패한 쿼리는 "error"를 담아 반환합니다.
+    """
+    from query_analysis import analyze_query_fast_path, get_combined_query_analysis_chain, get_query_analysis_chain
+
+    states: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    llm_indices: List[int] = []
+    for i, query in enumerate(queries):
+        details = analyze_query_fast_path(query, verbose=False)
+        if details is not None:
+            states[i] = {"query": query, **details}
+        else:
+            llm_indices.append(i)
+
+    if llm_indices:
+        chain = get_combined_query_analysis_chain() if rag_query_mode == "combined" else get_query_analysis_chain()
+        responses = chain.batch([{"query": queries[i]} for i in llm_indices],
+                                config={"max_concurrency": concurrency}, return_exceptions=True)
+        for i, response in zip(llm_indices, responses):
+            if isinstance(response, Exception):
+                states[i] = {"query": queries[i], "error": f"쿼리 분석 실패: {response}"}
+            else:
+                states[i] = {"query": queries[i], **response.model_dump()}
+
+    print(f"--- 쿼리 분석: {len(queries)}개 중 LLM 분석 {len(llm_indices)}개 (batch 1회) ---")
+    return states
+
+# %%
+# --- 3. 그래프 실행 ---
+
+def _result(index: int, state: Dict[str, Any], route: str, output: Any) -> Dict[str, Any]:
+    record = {"index": index, "query": state["query"], "route": route}
+    if isinstance(output, Exception):
+        record["error"] = str(output)
+        return record
+    record["answer"] = output.get("answer")
+    record["titles"] = [doc.metadata.get("title_ko") for doc in output.get("context") or []]
+    return record
+
+
+def run_chunk(app, queries: List[str], start_index: int, concurrency: int,
+              rag_query_mode: str) -> Iterator[Dict[str, Any]]:
+    """쿼리 묶음 하나를 실행하고 끝나는 순서대로 결과를 내보냅니다."""
+    from query_analysis import route_query_type
+
+    states = analyze_queries(queries, concurrency, rag_query_mode)
+
+    by_route: Dict[str, List[int]] = defaultdict(list)
+    for i, state in enumerate(states):
+        if "error" in state:
+            yield {"index": start_index + i, "query": state["query"], "error": state["error"]}
+        else:
+            by_route[route_query_type(state)].append(i)
+    print("--- 분기별 쿼리 수: " + ", ".join(f"{route} {len(items)}" for route, items in by_route.items()) + " ---")
+
+    # 분석이 끝난 state(status 포함)를 넘기므로 그래프는 쿼리 분석을 다시 하지 않음
+    order = [(route, i) for route, items in by_route.items() for i in items]
+    inputs = [states[i] for _, i in order]
+    for position, output in app.batch_as_completed(inputs, config={"max_concurrency": concurrency},
+                                                   return_exceptions=True):
+        route, i = order[position]
+        yield _result(start_index + i, states[i], route, output)
+
+
+def run_batch(app, queries: Iterator[str], output: TextIO, chunk_size: int, concurrency: int,
+              rag_query_mode: str) -> Dict[str, float]:
+    """queries를 chunk_size개씩 실행하며 결과를 output에 JSONL로 기록합니다. (처리한 쿼리 수 / 오류 수 / 초당 쿼리 수)"""
+    from ingest import batched
+
+    start = time.perf_counter()
+    done = errors = 0
+    for chunk_index, chunk in enumerate(batched(queries, chunk_size)):
+        chunk_start = time.perf_counter()
+        for record in run_chunk(app, chunk, chunk_index * chunk_size, concurrency, rag_query_mode):
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            done += 1
+            errors += int("error" in record)
+        print(f"--- chunk {chunk_index}: {len(chunk)}개, {time.perf_counter() - chunk_start:.2f}s ---")
+
+    elapsed = time.perf_counter() - start
+    return {"queries": done, "errors": errors, "seconds": elapsed, "qps": done / elapsed if elapsed else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="쿼리 여러 개를 배치로 그래프에 실행하고 결과를 JSONL로 기록")
+    parser.add_argument("--input", default="-", help="쿼리 파일 ('-'이면 표준 입력)")
+    parser.add_argument("--output", default="./output/batch_results.jsonl", help="결과 JSONL 파일")
+    parser.add_argument("--chunk-size", type=int, default=32, help="한 번에 분석 / 실행할 쿼리 수")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시에 실행할 그래프 / LLM 호출 수")
+    parser.add_argument("--rag-query-mode", default=None, help="main_graph.RAG_QUERY_MODE (기본: 환경 변수 값)")
+    args = parser.parse_args()
+
+    # service.py가 import되기 전에 검색 모으기를 켬 (환경 변수로 이미 지정했으면 그 값을 사용)
+    os.environ.setdefault("SEARCH_BATCH_WINDOW_MS", DEFAULT_SEARCH_BATCH_WINDOW_MS)
+    os.environ.setdefault("SEARCH_BATCH_SIZE", str(args.concurrency))
+
+    from main_graph import RAG_QUERY_MODE, build_graph, warmup
+
+    rag_query_mode = args.rag_query_mode or RAG_QUERY_MODE
+    app = build_graph(rag_query_mode=rag_query_mode)
+    warmup()
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        with open(args.output, "w", encoding="utf-8") as output:
+            summary = run_batch(app, read_queries(source), output, args.chunk_size, args.concurrency, rag_query_mode)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print(f"--- 완료: {summary['queries']}개 (오류 {summary['errors']}개) → {args.output}, "
+          f"{summary['seconds']:.1f}s, {summary['qps']:.2f} queries/s ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmark_batch_runner.py
+"""
+같은 쿼리 목록을 app.invoke로 하나씩 실행할 때와 batch_runner.run_batch로 묶어서 실행할 때의
+처리량(queries/s)과 임베딩 API 호출 수, 검색 배치 수를 비교합니다.
+각 설정은 새 프로세스에서 SERVICE_BACKEND=fake(가짜 LLM / 해시 임베딩)로 실행합니다.
+
+실행 방법:
+    python benchmark_batch_runner.py
+    python benchmark_batch_runner.py --queries 128 --chunk-sizes 1 8 32 64 --concurrency 16
+"""
+
+# %%
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+from catalog import RAG_DATA_PATH
+
+GENRES = ["액션", "드라마", "코미디", "스릴러", "로맨스", "가족", "SF", "공포"]
+OTTS = ["넷플릭스", "디즈니플러스", "티빙", "웨이브"]
+
+RUN_SCRIPT = """
+import io, json, sys, time
+queries = json.loads(sys.stdin.read())
+from main_graph import build_graph, warmup
+from batch_runner import run_batch
+from instrumentation import registry
+import service
+
+app = build_graph()
+warmup()
+embedding_calls = registry.embedding_api_seconds.total
+
+start = time.perf_counter()
+if {chunk_size} == 0:
+    for query in queries:
+        app.invoke({{"query": query}})
+else:
+    run_batch(app, iter(queries), io.StringIO(), {chunk_size}, {concurrency}, "llm")
+seconds = time.perf_counter() - start
+
+stats = service.get_vector_store().stats() if hasattr(service.get_vector_store(), "stats") else {{}}
+print("RESULT " + json.dumps({{"seconds": seconds, "qps": len(queries) / seconds,
+                               "embedding_calls": registry.embedding_api_seconds.total - embedding_calls,
+                               "search_batches": stats.get("batches", 0),
+                               "avg_search_batch": stats.get("avg_batch_size", 0.0)}}))
+"""
+
+# %%
+def make_queries(count: int, path: str = RAG_DATA_PATH) -> List[str]:
+    """카탈로그 제목과 장르 / OTT 조합으로 세 분기가 섞인 서로 다른 쿼리를 만듭니다. (임베딩 캐시 적중 방지)"""
+    titles = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            title = json.loads(line).get("title_ko")
+            if title:
+                titles.append(title)
+    broad = [f"{ott} {genre} 영화 추천해줘" for ott in OTTS for genre in GENRES]
+    queries = []
+    for i in range(count):
+        title = titles[i % len(titles)]
+        kind = i % 3
+        if kind == 0:
+            queries.append(f"'{title}' 줄거리 알려줘")
+        elif kind == 1:
+            queries.append(f"'{title}'랑 비슷한 영화 추천해줘")
+        else:
+            queries.append(broad[(i // 3) % len(broad)])
+    return queries
+
+
+def run(queries: List[str], chunk_size: int, concurrency: int, env: Dict[str, str]) -> Dict[str, Any]:
+    """chunk_size=0이면 app.invoke로 하나씩 실행합니다."""
+    script = RUN_SCRIPT.format(chunk_size=chunk_size, concurrency=concurrency)
+    result = subprocess.run([sys.executable, "-c", script], input=json.dumps(queries, ensure_ascii=False),
+                            capture_output=True, text=True, env=env)
+    for line in result.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(f"실행 실패 (chunk_size={chunk_size}):\n{result.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="순차 invoke와 batch_runner의 처리량 / 임베딩 호출 수 비교")
+    parser.add_argument("--queries", type=int, default=64, help="실행할 쿼리 수")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[1, 8, 32], help="batch_runner --chunk-size 값들")
+    parser.add_argument("--concurrency", type=int, default=8, help="batch_runner --concurrency")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="가짜 LLM 응답 지연 (초)")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="가짜 임베딩 응답 지연 (초)")
+    parser.add_argument("--search-window-ms", type=float, default=20.0, help="SEARCH_BATCH_WINDOW_MS")
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries)
+    base_env = {**os.environ, "SERVICE_BACKEND": "fake", "METRICS_LOG_PATH": "",
+                "FAKE_LLM_LATENCY": str(args.llm_latency), "FAKE_EMBEDDING_LATENCY": str(args.embedding_latency)}
+
+    print(f"{'mode':20s} {'seconds':>9s} {'queries/s':>10s} {'embed calls':>12s} {'search batches':>15s} {'avg batch':>10s}")
+    modes = [("serial invoke", 0)] + [(f"batch chunk={size}", size) for size in args.chunk_sizes]
+    for name, chunk_size in modes:
+        env = {**base_env, "SEARCH_BATCH_WINDOW_MS": str(args.search_window_ms) if chunk_size else "0",
+               "SEARCH_BATCH_SIZE": str(args.concurrency)}
+        result = run(queries, chunk_size, args.concurrency, env)
+        print(f"{name:20s} {result['seconds']:9.2f} {result['qps']:10.2f} {result['embedding_calls']:12d} "
+              f"{result['search_batches']:15d} {result['avg_search_batch']:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
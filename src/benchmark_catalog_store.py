@@ -0,0 +1,101 @@
+# benchmark_catalog_store.py
+"""
+카탈로그 조회를 rag_data.jsonl(전체 파싱 후 dict) 방식과 catalog_store.CatalogStore(mmap 열 단위) 방식으로 비교합니다.
+
+    - 시작 비용: JSONL 전체 파싱 vs 저장소 열기 (빌드 시간은 따로)
+    - 메모리: 로드 후 파이썬 힙 증가량 (tracemalloc, mmap 페이지는 OS 페이지 캐시라 포함되지 않음)
+    - tmdb_id 조회: dict vs 해시 테이블 (랜덤 tmdb_id --lookups개)
+    - 컬럼 검색: "특정 배우 출연 작품" 전체 레코드 순회 vs rows_with (values 배열 비교)
+
+--copies N이면 rag_data.jsonl을 tmdb_id만 바꿔 N배로 늘린 임시 파일로 측정합니다. (큰 카탈로그에서의 차이)
+
+실행 방법:
+    python benchmark_catalog_store.py
+    python benchmark_catalog_store.py --copies 50
+"""
+
+# %%
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+from catalog import RAG_DATA_PATH, iter_records
+from catalog_store import CatalogStore, build_catalog_store
+
+
+def measure(fn: Callable) -> Tuple[object, float, float]:
+    """(결과, 시간 ms, 파이썬 힙 증가 MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current / 1e6
+
+
+def make_scaled_source(copies: int, directory: str) -> str:
+    path = os.path.join(directory, "rag_data.jsonl")
+    records = list(iter_records(RAG_DATA_PATH))
+    with open(path, "w", encoding="utf-8") as f:
+        for copy in range(copies):
+            for record in records:
+                f.write(json.dumps({**record, "tmdb_id": record["tmdb_id"] * 1000 + copy}, ensure_ascii=False) + "\n")
+    return path
+
+# %%
+def main():
+    parser = argparse.ArgumentParser(description="JSONL vs 열 단위 mmap 카탈로그 저장소 시작 / 조회 / 검색 비용")
+    parser.add_argument("--copies", type=int, default=1)
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--scans", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = RAG_DATA_PATH if args.copies == 1 else make_scaled_source(args.copies, directory)
+        store_path = os.path.join(directory, "catalog")
+        _, build_ms, _ = measure(lambda: build_catalog_store(source, store_path,
+                                                           tmdb_path="", wikidata_path=""))
+
+        # 저장소를 먼저 엶 (큰 dict가 이미 힙에 있으면 GC / tracemalloc 비용이 섞임)
+        store, open_ms, open_mb = measure(lambda: CatalogStore.open(store_path))
+        records, jsonl_ms, jsonl_mb = measure(lambda: {r["tmdb_id"]: r for r in iter_records(source)})
+        print(f"--- {len(records)}개 작품 (원본 {os.path.getsize(source) / 1e6:.1f}MB), 저장소 빌드 {build_ms:.0f}ms ---")
+
+        rng = random.Random(0)
+        ids = rng.choices(list(records), k=args.lookups)
+        start = time.perf_counter()
+        for tmdb_id in ids:
+            records[tmdb_id]["title_ko"]
+        dict_us = (time.perf_counter() - start) / len(ids) * 1e6
+        start = time.perf_counter()
+        for tmdb_id in ids:
+            store.by_tmdb_id(tmdb_id)["title_ko"]
+        store_us = (time.perf_counter() - start) / len(ids) * 1e6
+
+        casts = rng.choices(store.distinct("cast"), k=args.scans)
+        dict_scan, store_scan = [], []
+        for name in casts:
+            start = time.perf_counter()
+            expected = [r["tmdb_id"] for r in records.values() if name in (r.get("cast") or [])]
+            dict_scan.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            rows = store.rows_with("cast", name)
+            store_scan.append((time.perf_counter() - start) * 1000)
+            assert sorted(int(store.column("tmdb_id")[row]) for row in rows) == sorted(expected)
+
+    print(f"\n{'':22s} {'jsonl + dict':>14s} {'catalog store':>14s}")
+    print(f"{'시작 (ms)':22s} {jsonl_ms:14.1f} {open_ms:14.1f}")
+    print(f"{'파이썬 힙 (MB)':22s} {jsonl_mb:14.1f} {open_mb:14.2f}")
+    print(f"{'tmdb_id 조회 (us)':22s} {dict_us:14.2f} {store_us:14.2f}")
+    print(f"{'배우 검색 p50 (ms)':22s} {statistics.median(dict_scan):14.3f} {statistics.median(store_scan):14.3f}")
+
+
+if __name__ == "__main__":
+    main()
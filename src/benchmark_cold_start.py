@@ -0,0 +1,110 @@
+# benchmark_cold_start.py
+"""
+엔트리 포인트의 import 시간(python -X importtime)과 콜드 스타트 단계별 시간을 측정합니다.
+각 측정은 새 프로세스에서 실행합니다. (이미 import된 모듈의 영향 없음)
+    - import 프로파일: 엔트리 포인트별 전체 import 시간과 최상위 패키지별 self 시간 상위 N개
+    - 콜드 스타트: import main_graph → build_graph() → warmup() → 첫 요청
+      (기본은 SERVICE_BACKEND=fake라서 API 키 / Chroma 없이 실행됩니다)
+
+실행 방법:
+    python benchmark_cold_start.py
+    python benchmark_cold_start.py --entry main_graph answer_cache ingest --top 15
+    python benchmark_cold_start.py --backend openai      # 실제 서비스 초기화 (OPENAI_API_KEY, chromaDB 필요)
+"""
+
+# %%
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+DEFAULT_ENTRIES = ["main_graph", "answer_cache", "ingest"]
+IMPORTTIME_PATTERN = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+COLD_START_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from main_graph import build_graph
+import_s = time.perf_counter() - start
+
+start = time.perf_counter()
+app = build_graph()
+build_s = time.perf_counter() - start
+
+start = time.perf_counter()
+import main_graph
+if {warmup} and hasattr(main_graph, "warmup"):
+    main_graph.warmup()
+warmup_s = time.perf_counter() - start
+
+start = time.perf_counter()
+app.invoke({{"query": {query!r}}})
+first_s = time.perf_counter() - start
+
+start = time.perf_counter()
+app.invoke({{"query": {query!r}}})
+second_s = time.perf_counter() - start
+print("RESULT " + json.dumps({{"import": import_s, "build_graph": build_s, "warmup": warmup_s,
+                               "first_request": first_s, "second_request": second_s}}))
+"""
+
+# %%
+def profile_import(entry: str, env: Dict[str, str]) -> Tuple[float, List[Tuple[str, float]]]:
+    """(전체 import 시간 ms, 최상위 패키지별 self 시간 ms 내림차순)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {entry}"],
+                            capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {entry} 실패:\n{result.stderr[-2000:]}")
+
+    total_ms = 0.0
+    by_package: Dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        by_package[module.split(".")[0]] += int(self_us) / 1000
+        if module == entry and len(indent) <= 1:
+            total_ms = int(cumulative_us) / 1000
+    return total_ms, sorted(by_package.items(), key=lambda item: item[1], reverse=True)
+
+
+def measure_cold_start(query: str, env: Dict[str, str], warmup: bool) -> Dict[str, float]:
+    script = COLD_START_SCRIPT.format(query=query, warmup=warmup)
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env)
+    for line in result.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(f"콜드 스타트 측정 실패:\n{result.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="엔트리 포인트 import 시간 / 콜드 스타트 단계별 시간")
+    parser.add_argument("--entry", nargs="+", default=DEFAULT_ENTRIES, help="import 프로파일을 볼 모듈")
+    parser.add_argument("--top", type=int, default=10, help="패키지별 self 시간 상위 N개")
+    parser.add_argument("--backend", choices=["fake", "openai"], default="fake", help="SERVICE_BACKEND")
+    parser.add_argument("--query", default="'승부' 줄거리 알려줘", help="첫 요청에 사용할 질의")
+    parser.add_argument("--no-warmup", action="store_true", help="warmup() 없이 첫 요청 측정")
+    args = parser.parse_args()
+
+    env = {**os.environ, "SERVICE_BACKEND": args.backend, "METRICS_LOG_PATH": "",
+           "FAKE_LLM_LATENCY": "0", "FAKE_EMBEDDING_LATENCY": "0"}
+
+    for entry in args.entry:
+        total_ms, packages = profile_import(entry, env)
+        print(f"\n--- import {entry}: {total_ms:.0f}ms ---")
+        for package, self_ms in packages[:args.top]:
+            print(f"  {package:32s} {self_ms:8.1f}ms")
+
+    timings = measure_cold_start(args.query, env, warmup=not args.no_warmup)
+    print(f"\n--- 콜드 스타트 (SERVICE_BACKEND={args.backend}) ---")
+    for stage, seconds in timings.items():
+        print(f"  {stage:16s} {seconds * 1000:9.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
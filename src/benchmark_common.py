@@ -0,0 +1,22 @@
+# benchmark_common.py
+"""
+benchmark_*.py 스크립트들이 같이 쓰는 측정 도구.
+(다른 벤치마크 스크립트의 내부 함수를 import하지 않도록 여기에 둠)
+"""
+
+# %%
+from typing import List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """정렬 후 가장 가까운 위치의 값 (보간 없음)"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def clear_embedding_cache(embedding) -> None:
+    """매 질의를 처음 보는 질의처럼 측정하기 위해 CachedEmbeddings의 메모리 / SQLite 캐시를 비웁니다."""
+    with embedding._lock, embedding._conn:
+        embedding._memory.clear()
+        embedding._conn.execute("DELETE FROM embedding_cache")
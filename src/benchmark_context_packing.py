@@ -0,0 +1,68 @@
+# benchmark_context_packing.py
+"""
+generate_answer에 넣는 컨텍스트의 토큰 수를 rag_text 전체(기존)와 context_packing.pack_context(예산별)로 비교합니다.
+SERVICE_BACKEND=fake로 benchmark_suite.SUITE_QUERIES를 실행한 최종 state(검색 문서 + QueryDetails)를 사용하므로 API 호출이 없습니다.
+
+    - 분기별 평균 컨텍스트 토큰 (기존 / 패킹 후)과 줄어든 비율, 포함된 문서 수
+    - 1,000요청당 입력 토큰 비용 차이 (instrumentation.LLM_INPUT_PRICE_PER_1M 기준)
+
+실행 방법:
+    python benchmark_context_packing.py
+    python benchmark_context_packing.py --budgets 500 1000 1500 3000
+"""
+
+# %%
+import argparse
+import os
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+
+def main():
+    parser = argparse.ArgumentParser(description="컨텍스트 패킹 전후 generate_answer 컨텍스트 토큰 수 비교")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[800, 1500, 3000], help="CONTEXT_TOKEN_BUDGET 값들")
+    args = parser.parse_args()
+
+    # service.py가 import되기 전에 가짜 백엔드를 선택
+    os.environ["SERVICE_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY"] = "0"
+    os.environ["FAKE_EMBEDDING_LATENCY"] = "0"
+    os.environ["METRICS_LOG_PATH"] = ""
+
+    from benchmark_suite import SUITE_QUERIES
+    from context_packing import pack_context
+    from instrumentation import LLM_INPUT_PRICE_PER_1M
+    from main_graph import build_graph
+    from query_analysis import route_query_type
+
+    app = build_graph()
+    states = [app.invoke({"query": query}) for query, _ in SUITE_QUERIES]
+
+    print(f"\n{'budget':>7s} {'branch':24s} {'n':>3s} {'original':>9s} {'packed':>8s} {'saved':>7s} {'docs':>9s} {'pack(ms)':>9s}")
+    for budget in args.budgets:
+        rows: Dict[str, List] = defaultdict(list)
+        for state in states:
+            start = time.perf_counter()
+            packed = pack_context(state["context"], state, budget=budget)
+            elapsed = (time.perf_counter() - start) * 1000
+            rows[route_query_type(state)].append((packed, elapsed))
+
+        total_original = total_packed = 0
+        for branch, items in rows.items():
+            original = statistics.mean(p.original_tokens for p, _ in items)
+            packed_tokens = statistics.mean(p.tokens for p, _ in items)
+            docs = f"{sum(p.docs for p, _ in items)}/{sum(p.total_docs for p, _ in items)}"
+            pack_ms = statistics.median(ms for _, ms in items)
+            total_original += sum(p.original_tokens for p, _ in items)
+            total_packed += sum(p.tokens for p, _ in items)
+            print(f"{budget:7d} {branch:24s} {len(items):3d} {original:9.0f} {packed_tokens:8.0f} "
+                  f"{1 - packed_tokens / original if original else 0:7.0%} {docs:>9s} {pack_ms:9.2f}")
+        saved_per_request = (total_original - total_packed) / len(states)
+        print(f"{'':7s} → 요청당 {saved_per_request:.0f} tokens 절약, 1,000요청당 입력 비용 "
+              f"${saved_per_request * 1000 * LLM_INPUT_PRICE_PER_1M / 1_000_000:.3f} 절약")
+
+
+if __name__ == "__main__":
+    main()
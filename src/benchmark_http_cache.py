@@ -0,0 +1,154 @@
+# benchmark_http_cache.py
+"""
+로컬 fake TMDB / Wikipedia 서버로 수집 파이프라인(tmdb_ingest → rag_text_builder)을 http_cache 모드별로 다시 실행해 봅니다.
+fake 서버는 TMDB 응답에 ETag, Wikipedia 응답에 Last-Modified를 붙이고 조건부 요청에는 304를 돌려줍니다. (실제 API는 호출하지 않음)
+
+    - 처음 실행: 캐시가 비어 있음 (모든 요청이 네트워크)
+    - 다시 실행: TTL 안 → 요청 0번 (rag_text 구성만 바꾼 경우)
+    - 재검증: HTTP_CACHE_MODE=refresh → 모든 요청이 조건부 요청, 바뀐 것이 없으면 304 (본문 전송 없음)
+    - offline: 서버를 끈 뒤 저장된 응답만으로 다시 만든 rag_data.jsonl이 처음 실행 결과와 같은지 확인
+
+실행 방법:
+    python benchmark_http_cache.py --items 300 --latency 0.05
+"""
+
+# %%
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+from benchmark_tmdb_ingest import PATH_PATTERN, fake_details, fake_section, make_seeds
+from http_cache import HttpCache
+from rag_text_builder import WikipediaClient, build_rag_data
+from tmdb_ingest import TMDBClient, run_ingest
+
+LAST_MODIFIED = "Wed, 01 Oct 2025 00:00:00 GMT"
+
+# %%
+# --- 1. fake TMDB + Wikipedia 서버 ---
+
+def start_fake_server(latency: float) -> tuple:
+    """(server, base_url, 카운터). /3/... 는 TMDB(ETag), /wiki/summary/... 는 Wikipedia(Last-Modified)"""
+    counter = {"requests": 0, "not_modified": 0, "body_bytes": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: Optional[Dict[str, Any]], headers: Dict[str, str]):
+            payload = b"" if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+            with lock:
+                counter["body_bytes"] += len(payload)
+                counter["not_modified"] += status == 304
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _tmdb(self, path: str, query: str):
+            match = PATH_PATTERN.match(path)
+            if not match:
+                return self._send(404, {"status_message": "not found"}, {})
+            item_type, tmdb_id = match.group(1), int(match.group(2))
+            body = fake_details(item_type, tmdb_id)
+            append = parse_qs(query).get("append_to_response", [""])[0]
+            for name in filter(None, append.split(",")):
+                body[name] = fake_section(item_type, tmdb_id, name)
+            etag = '"{}"'.format(hashlib.sha1(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest())
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, None, {"ETag": etag})
+            self._send(200, body, {"ETag": etag})
+
+        def _wikipedia(self, title: str):
+            number = int("".join(ch for ch in title if ch.isdigit()) or 0)
+            if number % 5 == 0:
+                return self._send(404, {"title": "Not found."}, {})
+            if self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+                return self._send(304, None, {"Last-Modified": LAST_MODIFIED})
+            page_type = "disambiguation" if number % 7 == 0 else "standard"
+            self._send(200, {"type": page_type, "extract": f"《{title}》은 대한민국의 작품이다. " * 3},
+                       {"Last-Modified": LAST_MODIFIED})
+
+        def do_GET(self):
+            time.sleep(latency)
+            with lock:
+                counter["requests"] += 1
+            url = urlparse(self.path)
+            if url.path.startswith("/wiki/summary/"):
+                return self._wikipedia(unquote(url.path[len("/wiki/summary/"):]))
+            self._tmdb(url.path, url.query)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", counter
+
+# %%
+# --- 2. 파이프라인 한 번 ---
+
+def run_pipeline(seeds, base_url: str, cache: HttpCache, directory: str, workers: int, rate: float) -> Dict[str, Any]:
+    """tmdb_data.jsonl을 지우고 처음부터 보강 → rag_data.jsonl 생성. (시간, rag_data.jsonl 내용 해시)"""
+    tmdb_path = os.path.join(directory, "tmdb_data.jsonl")
+    rag_path = os.path.join(directory, "rag_data.jsonl")
+    if os.path.exists(tmdb_path):
+        os.remove(tmdb_path)
+    start = time.perf_counter()
+    tmdb = TMDBClient(api_key="fake", base_url=f"{base_url}/3", workers=workers, rate=rate, cache=cache)
+    ingest_stats = run_ingest(seeds, tmdb, tmdb_path, workers=workers, show_progress=False)
+    wiki = WikipediaClient(endpoint=f"{base_url}/wiki/summary/", workers=workers, rate=rate, cache=cache)
+    rag_stats = build_rag_data(tmdb_path, rag_path, wiki, workers=workers, show_progress=False)
+    elapsed = time.perf_counter() - start
+    # tmdb_data.jsonl은 완료 순서대로 쓰이므로 줄 순서는 실행마다 다름 → 정렬 후 비교
+    with open(rag_path, "rb") as f:
+        digest = hashlib.sha256(b"".join(sorted(f))).hexdigest()
+    return {"elapsed_s": elapsed, "done": ingest_stats["done"], "rag": rag_stats["done"],
+            "errors": ingest_stats["errors"], "digest": digest}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="http_cache 모드별 수집 파이프라인 재실행 시간 / 요청 수")
+    parser.add_argument("--items", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake 서버 응답 지연 (초)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=200, help="초당 최대 요청 수")
+    args = parser.parse_args()
+
+    server, base_url, counter = start_fake_server(args.latency)
+    seeds = make_seeds(args.items)
+    print(f"--- fake TMDB / Wikipedia 서버: {base_url}, 작품 {args.items}개 (작품당 TMDB 1번 + Wikipedia 1번) ---")
+    print(f"{'':10s} {'시간(s)':>9s} {'요청':>6s} {'304':>6s} {'본문(KB)':>9s} {'캐시 적중':>9s}  rag_data 일치")
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache_dir = os.path.join(directory, "http_cache")
+        reference = None
+        for label, mode in (("처음 실행", "default"), ("다시 실행", "default"),
+                            ("재검증", "refresh"), ("offline", "offline")):
+            if mode == "offline":
+                server.shutdown()
+                server.server_close()
+            cache = HttpCache(cache_dir, mode=mode)
+            before = dict(counter)
+            result = run_pipeline(seeds, base_url, cache, directory, args.workers, args.rate)
+            reference = reference or result["digest"]
+            print(f"{label:10s} {result['elapsed_s']:9.2f} {counter['requests'] - before['requests']:6d} "
+                  f"{counter['not_modified'] - before['not_modified']:6d} "
+                  f"{(counter['body_bytes'] - before['body_bytes']) / 1e3:9.1f} "
+                  f"{cache.counters['hits'] + cache.counters['revalidated']:9d}  "
+                  f"{'O' if result['digest'] == reference else 'X'} (오류 {result['errors']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmark_hybrid_retrieval.py
+"""
+검색 방식(RETRIEVAL_MODE)별 recall@k / 지연 / 임베딩 API 호출 비율을 비교합니다.
+    - dense : vector_store.as_retriever() (기존 방식)
+    - hybrid: BM25 + dense RRF, 인물 이름 / 제목이 그대로 있는 질의는 BM25만
+    - sparse: BM25만
+평가 질의는 benchmark_rag_query.EVAL_SET과 rag_data.jsonl에서 만든 질의(출연 배우 이름 / 줄거리 일부)입니다.
+
+실행 방법:
+    python benchmark_hybrid_retrieval.py                           # OPENAI_API_KEY 필요 (dense 품질은 실제 임베딩으로만 의미 있음)
+    python benchmark_hybrid_retrieval.py --stub --embedding-dim 3072   # stub 임베딩 서버로 지연 / 호출 비율만 확인
+"""
+
+# %%
+import argparse
+import os
+import random
+import re
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from benchmark_common import clear_embedding_cache, percentile
+from benchmark_rag_query import EVAL_SET
+from catalog import load_records
+
+# %%
+def make_catalog_queries(count: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """(질의, 정답 title_ko) - 절반은 출연 배우 이름 질의, 절반은 줄거리 일부 질의"""
+    rng = random.Random(seed)
+    records = [r for r in load_records() if r.get('title_ko') and r.get('rag_text')]
+    queries: List[Tuple[str, str]] = []
+    for record in rng.sample(records, min(count, len(records))):
+        cast = record.get('cast') or []
+        overview = re.sub(r"\s+", " ", record.get('overview') or "")
+        if len(queries) % 2 == 0 and len(cast) >= 2:
+            queries.append((f"{cast[0]} {cast[1]} 나오는 작품", record['title_ko']))
+        elif len(overview) >= 40:
+            start = rng.randrange(0, max(1, len(overview) - 40))
+            queries.append((overview[start:start + 40], record['title_ko']))
+    return queries
+
+
+def evaluate(retriever, embedding, queries: List[Tuple[str, str]], k: int) -> Dict[str, float]:
+    hits = 0
+    embedding_calls = 0
+    latencies: List[float] = []
+    for query, expected in queries:
+        clear_embedding_cache(embedding)
+        misses = embedding.misses
+        start = time.perf_counter()
+        docs = retriever.invoke(query, k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        embedding_calls += int(embedding.misses > misses)
+        hits += int(expected in [doc.metadata.get('title_ko') for doc in docs[:k]])
+    n = len(queries)
+    return {
+        f"recall@{k}": hits / n,
+        "embed_ratio": embedding_calls / n,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dense / hybrid / sparse 검색 recall@k, 지연 비교")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--catalog-queries", type=int, default=100, help="rag_data.jsonl에서 만드는 질의 수")
+    parser.add_argument("--stub", action="store_true", help="load_test.py의 stub 임베딩 서버 사용")
+    parser.add_argument("--embedding-dim", type=int, default=3072, help="--stub일 때 컬렉션의 임베딩 차원")
+    parser.add_argument("--embedding-latency", type=float, default=0.1, help="--stub일 때 임베딩 응답 지연 (초)")
+    args = parser.parse_args()
+
+    if args.stub:
+        from load_test import start_stub_server
+        os.environ["OPENAI_BASE_URL"] = start_stub_server(0.0, args.embedding_latency, args.embedding_dim, 0)
+        os.environ["OPENAI_API_KEY"] = "stub-key"
+    os.environ["EMBEDDING_CACHE_PATH"] = ":memory:"
+    # 같은 질의를 반복해도 매번 실제 검색을 측정 (retrieval_cache.py)
+    os.environ["RETRIEVAL_CACHE_ENABLED"] = "0"
+
+    import service
+    from sparse_index import HybridRetriever
+
+    if args.stub:
+        # stub 서버는 토큰 길이 제한이 없으므로 tiktoken 토크나이저(첫 실행 시 다운로드)를 건너뜀
+        service.embedding.underlying.check_embedding_ctx_length = False
+
+    retrievers = {
+        "dense": service.vector_store.as_retriever(search_kwargs={'k': args.k}),
+        "hybrid": HybridRetriever(vector_store=service.vector_store, k=args.k, mode="hybrid"),
+        "sparse": HybridRetriever(vector_store=service.vector_store, k=args.k, mode="sparse"),
+    }
+    # BM25 색인은 한 번 만들어서 공유
+    retrievers["hybrid"].sparse_index
+    retrievers["sparse"]._sparse_index = retrievers["hybrid"]._sparse_index
+
+    query_sets = {
+        "eval_set": list(EVAL_SET),
+        "catalog": make_catalog_queries(args.catalog_queries),
+    }
+    for name, queries in query_sets.items():
+        print(f"\n--- {name} ({len(queries)}개 질의) ---")
+        print(f"{'mode':8s} {f'recall@{args.k}':>9s} {'임베딩호출':>8s} {'p50(ms)':>9s} {'p95(ms)':>9s}")
+        for mode, retriever in retrievers.items():
+            result = evaluate(retriever, service.embedding, queries, args.k)
+            print(f"{mode:8s} {result[f'recall@{args.k}']:9.2f} {result['embed_ratio']:8.0%} "
+                  f"{result['p50_ms']:9.1f} {result['p95_ms']:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
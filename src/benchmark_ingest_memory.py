@@ -0,0 +1,158 @@
+# benchmark_ingest_memory.py
+"""
+합성 카탈로그(기본 10만 작품)로 rag_data.jsonl → Document → 임베딩 배치 경로의 최대 메모리(peak RSS)를 비교합니다.
+    - notebook: data_structuring.ipynb 방식 (pandas + MultiLabelBinarizer 원핫 DataFrame → to_dict → Document 리스트 전체 생성)
+    - stream:   ingest.py 방식 (한 줄씩 읽어서 Document 생성 → 고정 크기 배치)
+두 방식 모두 배치마다 가짜 임베딩(DeterministicFakeEmbedding)까지만 수행하고 결과는 버립니다. (OpenAI / Chroma 호출 없음)
+각 방식은 별도 프로세스에서 실행해서 서로의 메모리 사용량이 섞이지 않도록 합니다.
+
+실행 방법:
+    python benchmark_ingest_memory.py --items 100000
+"""
+
+# %%
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+GENRES = ["드라마", "코미디", "액션", "스릴러", "범죄", "로맨스", "공포", "SF", "판타지", "애니메이션",
+          "다큐멘터리", "가족", "음악", "미스터리", "전쟁", "역사", "모험", "서부", "TV 영화", "Reality"]
+OTTS = ["Netflix", "Netflix Standard with Ads", "Disney Plus", "TVING", "wavve", "Coupang Play", "Watcha"]
+
+# %%
+# --- 1. 합성 카탈로그 ---
+
+def make_record(i: int, rng: random.Random) -> Dict[str, Any]:
+    """rag_data.jsonl과 같은 필드 구성의 가짜 레코드 (rag_text 길이도 실제 평균 500자 정도로 맞춤)"""
+    cast = [f"배우{rng.randrange(5000)}" for _ in range(10)]
+    directors = [f"감독{rng.randrange(1500)}"]
+    genres = rng.sample(GENRES, rng.randint(1, 3))
+    otts = rng.sample(OTTS, rng.randint(0, 2))
+    overview = f"작품 {i}의 줄거리. " * 25
+    rag_text = (f"[제목] 작품{i}\n[영문 제목] Title {i}\n[줄거리] {overview}\n[장르] {', '.join(genres)}\n"
+                f"[출연] {', '.join(cast)}\n[감독] {', '.join(directors)}\n[OTT] {', '.join(otts)}")
+    return {
+        "qid": f"Q{i}", "imdb_id": f"tt{i:07d}", "tmdb_id": 100000 + i, "type": "movie",
+        "title_ko": f"작품{i}", "title_en": f"Title {i}", "year": 1980 + i % 45, "overview": overview,
+        "genres": genres, "poster_path": f"/p{i}.jpg", "backdrop_path": f"/b{i}.jpg",
+        "runtime_min": 80 + i % 70 if i % 10 else None, "cast": cast, "directors": directors,
+        "writers": directors, "ott_streaming_kr": otts, "ott_rent_kr": [], "ott_buy_kr": [],
+        "keywords": [f"keyword{rng.randrange(300)}" for _ in range(3)], "rating_kr": rng.choice(["12", "15", "18", "ALL"]),
+        "rag_text": rag_text,
+    }
+
+
+def write_synthetic_catalog(path: str, count: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps(make_record(i, rng), ensure_ascii=False) + "\n")
+
+# %%
+# --- 2. 측정 대상 (자식 프로세스에서 실행) ---
+
+def run_notebook(path: str, embedding, batch_size: int) -> int:
+    """data_structuring.ipynb의 셀을 그대로 옮긴 경로"""
+    import pandas as pd
+    from langchain_core.documents import Document
+    from sklearn.preprocessing import MultiLabelBinarizer
+
+    df = pd.read_json(path, lines=True)
+    df = df[['title_ko', 'year', 'genres', 'runtime_min', 'cast', 'directors', 'ott_streaming_kr', 'rag_text', 'rating_kr']]
+    df = df.fillna({'runtime_min': ''})
+    df['casts'] = df['cast'].apply(lambda x: ', '.join(x) if isinstance(x, list) else '')
+    df['director'] = df['directors'].apply(lambda x: ', '.join(x) if isinstance(x, list) else '')
+    mlb = MultiLabelBinarizer()
+    ott_df = pd.DataFrame(mlb.fit_transform(df['ott_streaming_kr']), columns=mlb.classes_, index=df.index).add_prefix('ott_')
+    genre_df = pd.DataFrame(mlb.fit_transform(df['genres']), columns=mlb.classes_, index=df.index).add_prefix('genre_')
+    df = pd.concat([df, genre_df, ott_df], axis=1)
+    df = df.drop(columns=['cast', 'directors', 'ott_streaming_kr', 'genres'])
+
+    documents = []
+    for record in df.to_dict(orient='records'):
+        page_content = record.pop('rag_text', None)
+        metadata = {key: (None if pd.isna(value) else value) for key, value in record.items()}
+        documents.append(Document(page_content=str(page_content), metadata=metadata))
+
+    for i in range(0, len(documents), batch_size):
+        embedding.embed_documents([doc.page_content for doc in documents[i:i + batch_size]])
+    return len(documents)
+
+
+def run_stream(path: str, embedding, batch_size: int) -> int:
+    """ingest.py 경로 (iter_documents → batched)"""
+    from ingest import batched, iter_documents
+
+    count = 0
+    for batch in batched(iter_documents(path), batch_size):
+        embedding.embed_documents([text for _, text, _ in batch])
+        count += len(batch)
+    return count
+
+
+def peak_rss_mb() -> float:
+    # Linux의 ru_maxrss 단위는 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def worker(mode: str, path: str, batch_size: int, dim: int):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    # 두 방식이 같은 라이브러리를 import한 상태에서 시작하도록 먼저 모두 import
+    import pandas  # noqa: F401
+    import sklearn.preprocessing  # noqa: F401
+    import ingest  # noqa: F401
+
+    embedding = DeterministicFakeEmbedding(size=dim)
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    count = (run_notebook if mode == "notebook" else run_stream)(path, embedding, batch_size)
+    print(json.dumps({
+        "mode": mode, "documents": count, "elapsed_s": round(time.perf_counter() - start, 2),
+        "baseline_mb": round(baseline, 1), "peak_mb": round(peak_rss_mb(), 1),
+    }))
+
+# %%
+def main():
+    parser = argparse.ArgumentParser(description="rag_data.jsonl 인덱싱 경로별 peak RSS 비교")
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=64, help="가짜 임베딩 차원")
+    parser.add_argument("--modes", nargs="+", default=["notebook", "stream"], choices=["notebook", "stream"])
+    parser.add_argument("--worker", choices=["notebook", "stream"], help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return worker(args.worker, args.input, args.batch_size, args.dim)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rag_data.jsonl")
+        write_synthetic_catalog(path, args.items)
+        print(f"합성 카탈로그: {args.items}개 작품, {os.path.getsize(path) / 1024 / 1024:.1f}MB")
+
+        results = []
+        for mode in args.modes:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", mode, "--input", path,
+                 "--batch-size", str(args.batch_size), "--dim", str(args.dim)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print("\n--- 요약 ---")
+    print(f"{'mode':10s} {'docs':>8s} {'time(s)':>8s} {'import(MB)':>11s} {'peak(MB)':>9s} {'증가분(MB)':>10s}")
+    for r in results:
+        print(f"{r['mode']:10s} {r['documents']:8d} {r['elapsed_s']:8.2f} {r['baseline_mb']:11.1f} "
+              f"{r['peak_mb']:9.1f} {r['peak_mb'] - r['baseline_mb']:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmark_parallel_retrieval.py
+"""
+build_graph(parallel_retrieval=False / True)의 노드별 실행 시간과 분기별 전체 시간(wall-clock)을 비교합니다.
+load_test.py의 stub OpenAI 서버를 사용하므로 실제 OpenAI API는 호출하지 않습니다.
+    - 노드 시간: stream_mode="debug"의 task 시작 / task_result 시각 차이
+    - 분기 시간: 쿼리 입력부터 generate_answer 완료까지
+
+실행 방법:
+    python benchmark_parallel_retrieval.py --repeat 5 --llm-latency 0.5 --embedding-dim 3072
+"""
+
+# %%
+import argparse
+import os
+import statistics
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from benchmark_common import clear_embedding_cache
+from load_test import start_stub_server
+
+# fast-path(규칙 기반 쿼리 분석)로 분석되는 질문만 사용해서 stub LLM 응답과 관계없이 분기가 고정되도록 함
+BENCHMARK_QUERIES: List[str] = [
+    "'승부사' 줄거리 알려줘",                  # specific: 제목이 확실하지 않음 → 벡터 검색 + 제목 후보
+    "넷플릭스 액션 영화 추천해줘",              # broad: 필터 후보가 많음 → 쿼리 생성 ∥ 원본 쿼리 필터 검색
+    "이병헌 나오는 넷플릭스 드라마 추천",
+    "봉준호 감독 넷플릭스 영화 추천해줘",        # broad: 필터 후보가 k개 이하 → 쿼리 생성 생략
+    "이병헌 나오는 넷플릭스 스릴러 추천",
+]
+
+# %%
+def run_with_timing(app, query: str) -> Tuple[str, float, Dict[str, float]]:
+    """(실행된 분기, 전체 시간 ms, 노드별 시간 ms)를 반환합니다."""
+    branch = "unknown"
+    started: Dict[str, datetime] = {}
+    node_ms: Dict[str, float] = {}
+    start = time.perf_counter()
+    for event in app.stream({"query": query}, stream_mode="debug"):
+        name = event["payload"].get("name")
+        timestamp = datetime.fromisoformat(event["timestamp"])
+        if event["type"] == "task":
+            started[name] = timestamp
+            if name.startswith("format_state_"):
+                branch = name[len("format_state_"):]
+        elif event["type"] == "task_result" and name in started:
+            node_ms[name] = (timestamp - started[name]).total_seconds() * 1000
+    return branch, (time.perf_counter() - start) * 1000, node_ms
+
+
+def evaluate(app, embedding, repeat: int) -> Tuple[Dict[str, List[float]], Dict[str, List[float]]]:
+    """분기별 전체 시간 목록과 노드별 시간 목록을 모읍니다."""
+    branch_ms: Dict[str, List[float]] = defaultdict(list)
+    node_ms: Dict[str, List[float]] = defaultdict(list)
+    for _ in range(repeat):
+        for query in BENCHMARK_QUERIES:
+            clear_embedding_cache(embedding)
+            branch, total, nodes = run_with_timing(app, query)
+            branch_ms[branch].append(total)
+            for name, elapsed in nodes.items():
+                node_ms[name].append(elapsed)
+    return branch_ms, node_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="병렬 검색(parallel_retrieval) 전후 노드별 / 분기별 지연 비교")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stub LLM 응답 지연 (초)")
+    parser.add_argument("--embedding-latency", type=float, default=0.1, help="stub 임베딩 응답 지연 (초)")
+    parser.add_argument("--embedding-dim", type=int, default=3072, help="컬렉션의 임베딩 차원과 같아야 함")
+    args = parser.parse_args()
+
+    base_url = start_stub_server(args.llm_latency, args.embedding_latency, args.embedding_dim, 0)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "stub-key"
+    os.environ["EMBEDDING_CACHE_PATH"] = ":memory:"
+    # 같은 질의를 반복해도 매번 실제 검색을 측정 (retrieval_cache.py)
+    os.environ["RETRIEVAL_CACHE_ENABLED"] = "0"
+    from main_graph import build_graph
+    import service
+
+    # stub 서버는 토큰 길이 제한이 없으므로 tiktoken 토크나이저(첫 실행 시 다운로드)를 건너뜀
+    service.embedding.underlying.check_embedding_ctx_length = False
+
+    results = {}
+    for parallel in (False, True):
+        app = build_graph(parallel_retrieval=parallel)
+        # 워밍업 (인덱스 로드, 커넥션 생성)
+        for query in BENCHMARK_QUERIES:
+            app.invoke({"query": query})
+        results[parallel] = evaluate(app, service.embedding, args.repeat)
+
+    print("\n--- 분기별 전체 시간 (p50, ms) ---")
+    print(f"{'branch':10s} {'before':>9s} {'after':>9s}")
+    for branch in sorted(set(results[False][0]) | set(results[True][0])):
+        before = results[False][0].get(branch)
+        after = results[True][0].get(branch)
+        print(f"{branch:10s} {statistics.median(before) if before else float('nan'):9.1f} "
+              f"{statistics.median(after) if after else float('nan'):9.1f}")
+
+    print("\n--- 노드별 시간 (p50, ms / 실행 횟수) ---")
+    print(f"{'node':34s} {'before':>14s} {'after':>14s}")
+    for name in sorted(set(results[False][1]) | set(results[True][1])):
+        cells = []
+        for parallel in (False, True):
+            values = results[parallel][1].get(name)
+            cells.append(f"{statistics.median(values):8.1f} /{len(values):3d}" if values else f"{'-':>14s}")
+        print(f"{name:34s} {cells[0]:>14s} {cells[1]:>14s}")
+
+
+if __name__ == "__main__":
+    main()
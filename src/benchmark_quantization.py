@@ -0,0 +1,111 @@
+# benchmark_quantization.py
+"""
+NumpyVectorStore의 압축 검색 색인(NUMPY_INDEX_DIM / NUMPY_QUANTIZATION / NUMPY_RESCORE_CANDIDATES)별
+검색 색인 메모리, 질의 지연(p50), 전체 정밀도(float32, 전체 차원) 검색 대비 recall@k를 비교합니다.
+질의 벡터는 저장된 임베딩에 노이즈를 더해 만들기 때문에 임베딩 API를 호출하지 않습니다.
+
+    - index MB : 검색할 때 메모리에 있어야 하는 크기 (압축 코드 + scale, 압축하지 않으면 전체 벡터)
+                 재채점용 전체 벡터는 스냅샷(load)에서 memmap으로 열어 후보 행만 읽으므로 포함하지 않음
+    - 차원 축소(앞 N차원)는 text-embedding-3 계열(Matryoshka 학습)의 임베딩에서만 의미가 있음
+      (--source fake의 해시 임베딩은 차원마다 독립이라 축소하면 recall이 크게 떨어짐)
+
+실행 방법:
+    python benchmark_quantization.py                      # ./db/chromaDB2 컬렉션의 임베딩
+    python benchmark_quantization.py --source fake        # rag_data.jsonl + 해시 임베딩 (API / Chroma 불필요)
+    python benchmark_quantization.py --dims 0 1024 256 --candidates 0 20 50
+"""
+
+# %%
+import argparse
+import os
+import statistics
+import time
+from typing import List, Set
+
+import numpy as np
+
+from benchmark_common import percentile
+from benchmark_vector_store import CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY
+from numpy_vector_store import NumpyVectorStore
+
+
+def load_base_store(source: str, persist_directory: str, collection_name: str) -> NumpyVectorStore:
+    """비교 기준이 되는 전체 정밀도(float32) 스토어"""
+    if source == "fake":
+        os.environ["FAKE_EMBEDDING_LATENCY"] = "0"
+        from fake_services import HashingEmbeddings, build_local_vector_store
+        return build_local_vector_store(HashingEmbeddings())
+
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    # 질의 벡터를 직접 넘기므로 임베딩 함수는 호출되지 않음
+    chroma_store = Chroma(
+        embedding_function=DeterministicFakeEmbedding(size=1),
+        persist_directory=persist_directory,
+        collection_name=collection_name
+    )
+    return NumpyVectorStore.from_chroma(chroma_store, dtype="float32", quantization="none", index_dim=0)
+
+
+def index_bytes(store: NumpyVectorStore) -> int:
+    if store._data.codes is None:
+        return store._data.vectors.nbytes
+    return store._data.codes.nbytes + (store._data.code_scales.nbytes if store._data.code_scales is not None else 0)
+
+
+def recall(results: List[Set[int]], truth: List[Set[int]]) -> float:
+    return statistics.mean(len(r & t) / max(len(t), 1) for r, t in zip(results, truth))
+
+# %%
+def main():
+    parser = argparse.ArgumentParser(description="압축 검색 색인(차원 축소 / int8 / binary + 재채점) 메모리 / 지연 / recall 비교")
+    parser.add_argument("--source", choices=["chroma", "fake"], default="chroma")
+    parser.add_argument("--persist-directory", default=CHROMA_PERSIST_DIRECTORY)
+    parser.add_argument("--collection-name", default=CHROMA_COLLECTION_NAME)
+    parser.add_argument("--dims", type=int, nargs="+", default=[0, 1024, 512, 256], help="NUMPY_INDEX_DIM 값들 (0: 전체)")
+    parser.add_argument("--quantizations", nargs="+", default=["none", "int8", "binary"])
+    parser.add_argument("--candidates", type=int, nargs="+", default=[0, 50], help="NUMPY_RESCORE_CANDIDATES 값들 (0: 재채점 없음)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--noise", type=float, default=0.05)
+    args = parser.parse_args()
+
+    base = load_base_store(args.source, args.persist_directory, args.collection_name)
+    vectors = np.asarray(base._data.vectors, dtype=np.float32)
+    print(f"--- {args.source}: {vectors.shape[0]}개 x {vectors.shape[1]}차원, "
+          f"전체 정밀도 {vectors.nbytes / 1e6:.2f}MB ---")
+
+    # 저장된 (정규화된) 임베딩에 상대 크기 args.noise의 가우시안 노이즈를 더해 질의 생성
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, vectors.shape[0], size=args.queries)
+    noise = rng.normal(0, 1, size=(args.queries, vectors.shape[1])).astype(np.float32)
+    queries = vectors[rows] + args.noise * noise / np.sqrt(vectors.shape[1])
+    truth = [{row for row, _ in result} for result in base._search_rows(base._data, base._normalize(queries), args.k)]
+
+    print(f"\n{'dim':>5s} {'quant':>7s} {'rescore':>7s} {'index MB':>9s} {'ratio':>6s} {'p50':>9s} {'p99':>9s} {'recall@' + str(args.k):>9s}")
+    for dim in args.dims:
+        if dim and dim >= vectors.shape[1]:
+            continue
+        for quantization in args.quantizations:
+            for candidates in args.candidates:
+                if quantization == "none" and not dim and candidates:
+                    continue  # 압축하지 않으면 재채점할 것이 없음
+                store = NumpyVectorStore(base.embedding, base._data.ids, base._data.texts, base._data.metadatas,
+                                         vectors, dtype="float32", quantization=quantization, index_dim=dim,
+                                         rescore_candidates=candidates, normalized=True)
+                normalized = store._normalize(queries)
+                timings, results = [], []
+                for query in normalized:
+                    start = time.perf_counter()
+                    result = store._search_rows(store._data, query[None, :], args.k)[0]
+                    timings.append((time.perf_counter() - start) * 1000)
+                    results.append({row for row, _ in result})
+                size = index_bytes(store)
+                print(f"{dim or vectors.shape[1]:5d} {quantization:>7s} {candidates or '-':>7} {size / 1e6:9.2f} "
+                      f"{vectors.nbytes / size:5.1f}x {statistics.median(timings):7.3f}ms "
+                      f"{percentile(timings, 99):7.3f}ms {recall(results, truth):9.3f}")
+
+
+if __name__ == "__main__":
+    main()
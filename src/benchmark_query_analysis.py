@@ -0,0 +1,117 @@
+# benchmark_query_analysis.py
+"""
+규칙 기반 쿼리 분석(fast-path)과 LLM 구조화 출력(get_query_analysis_chain())을
+고정된 쿼리 셋으로 비교합니다.
+
+실행 방법:
+    python benchmark_query_analysis.py              # 두 경로 모두 측정 (OPENAI_API_KEY 필요)
+    python benchmark_query_analysis.py --fast-only  # LLM 호출 없이 fast-path만 측정
+"""
+
+# %%
+import argparse
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from benchmark_common import percentile
+from fast_query_analysis import analyze_query_locally, FAST_PATH_THRESHOLD
+
+# %%
+BENCHMARK_QUERIES: List[str] = [
+    "영화 '승부'에 대해 알려줘",
+    "영화 '승부'랑 비슷한 거 추천해줘",
+    "'파묘' 줄거리 알려줘",
+    "'기생충'이랑 비슷한 영화 추천해줘",
+    "넷플릭스 액션 영화 추천해줘",
+    "넷플 공상과학 영화 추천",
+    "티빙에서 볼만한 코미디 추천해줘",
+    "왓챠 스릴러 영화 추천해줘",
+    "이병헌 나오는 넷플릭스 드라마 추천",
+    "봉준호 감독 영화 추천해줘",
+    "2019년 범죄 영화 추천해줘",
+    "이병헌 나오는 2020년 이후 드라마 장르 넷플릭스 작품 추천해줘",
+    "이병헌이랑 유아인이 나오는 2020년 이후 공상과학 액션 영화 찾아줘. 넷플릭스에 있으면 좋겠어.",
+    "좀비 나오는 영화 추천해줘",
+    "바둑 두는 영화 뭐 있어?",
+    "요즘 볼만한 거 없을까",
+]
+
+COMPARED_FIELDS = ['status', 'title', 'year', 'casts', 'director', 'genre', 'ott']
+
+# %%
+def _normalize(details: Dict) -> Dict:
+    """필드 비교를 위해 리스트는 정렬하고 Enum은 값으로 바꿉니다."""
+    normalized = {}
+    for key in COMPARED_FIELDS:
+        value = details.get(key)
+        if isinstance(value, list):
+            value = sorted(v.value if hasattr(v, 'value') else str(v) for v in value) or None
+        normalized[key] = value
+    return normalized
+
+
+def run_fast_path(queries: List[str]) -> List[Tuple[Dict, float, float]]:
+    """(분석 결과, confidence, 소요 시간 ms) 목록을 반환합니다."""
+    analyze_query_locally(queries[0])  # 카탈로그 사전 로드는 측정에서 제외
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        details, confidence = analyze_query_locally(query)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        results.append((details.model_dump(), confidence, elapsed_ms))
+    return results
+
+
+def run_llm_path(queries: List[str]) -> List[Tuple[Dict, float]]:
+    """(분석 결과, 소요 시간 ms) 목록을 반환합니다."""
+    from query_analysis import get_query_analysis_chain
+
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        response = get_query_analysis_chain().invoke({"query": query})
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        results.append((response.model_dump(), elapsed_ms))
+    return results
+
+# %%
+def main():
+    parser = argparse.ArgumentParser(description="fast-path vs LLM 쿼리 분석 벤치마크")
+    parser.add_argument("--fast-only", action="store_true", help="LLM 경로는 측정하지 않음")
+    args = parser.parse_args()
+
+    fast_results = run_fast_path(BENCHMARK_QUERIES)
+    llm_results = None if args.fast_only else run_llm_path(BENCHMARK_QUERIES)
+
+    hits = 0
+    agreements = 0
+    for i, query in enumerate(BENCHMARK_QUERIES):
+        details, confidence, fast_ms = fast_results[i]
+        hit = confidence >= FAST_PATH_THRESHOLD
+        hits += hit
+        line = f"[{'HIT ' if hit else 'MISS'}] conf={confidence:.2f} fast={fast_ms:6.2f}ms"
+        if llm_results:
+            llm_details, llm_ms = llm_results[i]
+            same = _normalize(details) == _normalize(llm_details)
+            agreements += hit and same
+            line += f" llm={llm_ms:8.1f}ms match={'Y' if same else 'N'}"
+        print(f"{line} | {query}")
+
+    fast_times = [r[2] for r in fast_results]
+    print("\n--- 요약 ---")
+    print(f"threshold: {FAST_PATH_THRESHOLD}")
+    print(f"fast-path 적중률: {hits}/{len(BENCHMARK_QUERIES)} ({hits / len(BENCHMARK_QUERIES):.0%})")
+    print(f"fast-path 지연: p50={statistics.median(fast_times):.2f}ms p99={percentile(fast_times, 99):.2f}ms")
+    if llm_results:
+        llm_times = [r[1] for r in llm_results]
+        print(f"LLM 지연:       p50={statistics.median(llm_times):.1f}ms p99={percentile(llm_times, 99):.1f}ms")
+        print(f"적중한 쿼리 중 LLM 결과와 일치: {agreements}/{hits}")
+        # 적중한 쿼리는 LLM 대신 fast-path 시간만 소요됨
+        blended = [fast_times[i] if fast_results[i][1] >= FAST_PATH_THRESHOLD else fast_times[i] + llm_times[i]
+                   for i in range(len(BENCHMARK_QUERIES))]
+        print(f"fast-path 적용 시 평균 분석 지연: {statistics.mean(blended):.1f}ms (LLM만: {statistics.mean(llm_times):.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
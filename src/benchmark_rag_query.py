@@ -0,0 +1,110 @@
+# benchmark_rag_query.py
+"""
+specific_search 분기의 RAG 쿼리 생성 방식(build_graph(rag_query_mode=...))을
+고정된 평가 셋으로 비교합니다.
+    - 검색 품질: 정답 작품이 검색 결과 1위 / 상위 3개 안에 있는 비율 (hit@1, hit@3)
+    - 지연: 쿼리 입력부터 retrieve_specific 완료까지 걸린 시간 (답변 생성 제외)
+
+실행 방법:
+    python benchmark_rag_query.py                       # llm / template / combined 모두 측정 (OPENAI_API_KEY 필요)
+    python benchmark_rag_query.py --modes template      # 특정 모드만 측정
+    python benchmark_rag_query.py --no-fast-path        # 규칙 기반 쿼리 분석을 끄고 항상 LLM으로 분석
+"""
+
+# %%
+import argparse
+import os
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from benchmark_common import percentile
+
+# (질문, 정답 작품의 title_ko) - 모두 특정 작품 정보 검색(status='search') 질문
+EVAL_SET: List[Tuple[str, str]] = [
+    ("영화 '승부'에 대해 알려줘", "승부"),
+    ("'승부' 감독이 누구야?", "승부"),
+    ("이병헌이랑 유아인 나온 바둑 영화 줄거리 알려줘", "승부"),
+    ("'부산행' 출연진 알려줘", "부산행"),
+    ("공유 나오는 좀비 영화 부산행 줄거리가 뭐야?", "부산행"),
+    ("영화 '정이' 감독 누구야?", "정이"),
+    ("'협상'에 누가 나와?", "협상"),
+    ("손예진 현빈 나온 협상 영화 내용 알려줘", "협상"),
+    ("'암수살인' 줄거리 알려줘", "암수살인"),
+    ("김윤석 주지훈 나오는 암수살인 정보 알려줘", "암수살인"),
+    ("'블랙머니' 어떤 영화야?", "블랙머니"),
+    ("'보통사람' 출연 배우 알려줘", "보통사람"),
+    ("'쎄시봉' 감독이 누구야?", "쎄시봉"),
+    ("'남매의 여름밤' 줄거리 알려줘", "남매의 여름밤"),
+    ("마동석 나온 '두 남자' 어떤 영화야?", "두 남자"),
+    ("'봉이 김선달' 정보 알려줘", "봉이 김선달"),
+]
+
+# %%
+def run_until_retrieval(app, query: str) -> Tuple[List, str, float]:
+    """
+    그래프를 stream으로 실행하다가 검색 노드가 끝나면 중단합니다.
+    (검색된 문서, 실행된 분기, 소요 시간 ms)를 반환합니다.
+    """
+    start = time.perf_counter()
+    branch = "unknown"
+    for chunk in app.stream({"query": query}, stream_mode="updates"):
+        for node_name, update in chunk.items():
+            if node_name.startswith("format_state_"):
+                branch = node_name[len("format_state_"):]
+            if node_name in ("retrieve_specific", "lookup_title_specific", "retrieve_similar_items", "retrieve_filtered"):
+                elapsed = (time.perf_counter() - start) * 1000
+                return (update or {}).get('context', []), branch, elapsed
+    return [], branch, (time.perf_counter() - start) * 1000
+
+
+def evaluate_mode(mode: str) -> Dict[str, float]:
+    from main_graph import build_graph
+
+    app = build_graph(rag_query_mode=mode)
+    hit1 = hit3 = misrouted = 0
+    latencies = []
+
+    print(f"\n=== rag_query_mode={mode} ===")
+    for query, expected in EVAL_SET:
+        docs, branch, elapsed = run_until_retrieval(app, query)
+        titles = [doc.metadata.get('title_ko') for doc in docs]
+        latencies.append(elapsed)
+        hit1 += int(titles[:1] == [expected])
+        hit3 += int(expected in titles[:3])
+        misrouted += int(branch != "specific")
+        mark = "O" if expected in titles[:3] else "X"
+        print(f"[{mark}] {elapsed:8.1f}ms  {branch:8s}  {query}  ->  {titles}")
+
+    n = len(EVAL_SET)
+    return {
+        "hit@1": hit1 / n,
+        "hit@3": hit3 / n,
+        "misrouted": misrouted,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG 쿼리 생성 방식별 검색 품질 / 지연 비교")
+    parser.add_argument("--modes", nargs="+", default=["llm", "template", "combined"],
+                        choices=["llm", "template", "combined"])
+    parser.add_argument("--no-fast-path", action="store_true", help="규칙 기반 쿼리 분석(fast-path)을 끔")
+    args = parser.parse_args()
+
+    if args.no_fast_path:
+        # fast_query_analysis가 import되기 전에 설정해야 적용됨
+        os.environ["FAST_QUERY_ANALYSIS_THRESHOLD"] = "2"
+
+    results = {mode: evaluate_mode(mode) for mode in args.modes}
+
+    print("\n--- 요약 ---")
+    print(f"{'mode':10s} {'hit@1':>6s} {'hit@3':>6s} {'misroute':>9s} {'p50(ms)':>9s} {'p95(ms)':>9s}")
+    for mode, result in results.items():
+        print(f"{mode:10s} {result['hit@1']:6.2f} {result['hit@3']:6.2f} {result['misrouted']:9d} "
+              f"{result['p50_ms']:9.1f} {result['p95_ms']:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmark_retrieval_cache.py
+"""
+retrieval_cache.CachedVectorStore의 임계값(RETRIEVAL_CACHE_THRESHOLD)별 적중률과 정확도를 측정합니다.
+SERVICE_BACKEND=fake(해시 임베딩 + rag_data.jsonl 로컬 벡터 스토어)로 실행되므로 API 호출이 없습니다.
+
+    - 작품마다 표현만 조금 다른 RAG 쿼리 여러 개(LLM이 사용자마다 다르게 만든 rag_query를 흉내)를 순서대로 검색
+    - 적중률: 캐시에서 결과를 가져온 비율 (= 줄어든 벡터 검색 비율)
+    - 일치율: 캐시 적중 결과의 top-k 문서 집합이 실제 검색 결과와 같은 비율 (overlap: 겹치는 문서 비율 평균)
+    - 지연: 캐시 적중 / 미스(임베딩 + 실제 검색) p50
+
+실행 방법:
+    python benchmark_retrieval_cache.py
+    python benchmark_retrieval_cache.py --thresholds 0.9 0.95 0.97 0.99 --items 200
+"""
+
+# %%
+import argparse
+import os
+import random
+import statistics
+import time
+from typing import Dict, List
+
+from benchmark_common import clear_embedding_cache, percentile
+from catalog import RAG_DATA_PATH
+from ingest import iter_documents
+
+
+def make_query_variants(rag_text: str) -> List[str]:
+    """같은 작품을 찾는, 표현만 조금씩 다른 RAG 쿼리들"""
+    lines = [line for line in rag_text.splitlines() if line.strip()][:6]
+    base = "\n".join(lines)
+    return [
+        base,
+        "\n".join(line for line in lines if not line.startswith("[영문 제목]")),
+        " ".join(lines),
+        base + "\n[추천] 비슷한 분위기의 작품",
+    ]
+
+# %%
+def run(cached_store, raw_store, queries: List[str], k: int) -> Dict[str, float]:
+    hits = agree = 0
+    overlap = 0.0
+    hit_ms: List[float] = []
+    miss_ms: List[float] = []
+    for query in queries:
+        before = cached_store.cache.hits
+        start = time.perf_counter()
+        docs = cached_store.similarity_search(query, k=k)
+        elapsed = (time.perf_counter() - start) * 1000
+        if cached_store.cache.hits > before:
+            hits += 1
+            hit_ms.append(elapsed)
+            expected = raw_store.similarity_search(query, k=k)
+            agree += int({d.id for d in docs} == {d.id for d in expected})
+            overlap += len({d.id for d in docs} & {d.id for d in expected}) / max(len(expected), 1)
+        else:
+            miss_ms.append(elapsed)
+    return {
+        "hit_rate": hits / len(queries),
+        "agreement": agree / hits if hits else 1.0,
+        "overlap": overlap / hits if hits else 1.0,
+        "hit_p50_ms": statistics.median(hit_ms) if hit_ms else 0.0,
+        "miss_p50_ms": statistics.median(miss_ms) if miss_ms else 0.0,
+        "miss_p99_ms": percentile(miss_ms, 99) if miss_ms else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="검색 결과 캐시 임계값별 적중률 / 일치율 / 지연")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.9, 0.95, 0.97, 0.99])
+    parser.add_argument("--items", type=int, default=150, help="쿼리를 만들 작품 수")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="가짜 임베딩 응답 지연 (초)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # service.py가 import되기 전에 가짜 백엔드 / 캐시 없는 벡터 스토어를 선택
+    os.environ["SERVICE_BACKEND"] = "fake"
+    os.environ["FAKE_EMBEDDING_LATENCY"] = str(args.embedding_latency)
+    os.environ["RETRIEVAL_CACHE_ENABLED"] = "0"
+    os.environ["METRICS_LOG_PATH"] = ""
+
+    import service
+    from retrieval_cache import CachedVectorStore, RetrievalCache
+
+    raw_store = service.get_vector_store()
+    rng = random.Random(args.seed)
+    documents = [text for _, text, _ in iter_documents(RAG_DATA_PATH)]
+    queries = [variant for text in rng.sample(documents, min(args.items, len(documents)))
+               for variant in make_query_variants(text)]
+    # 여러 사용자의 요청이 섞여 들어오는 것처럼 순서를 섞음
+    rng.shuffle(queries)
+    print(f"--- 쿼리 {len(queries)}개 (작품 {len(queries) // 4}개 x 표현 4개), k={args.k} ---")
+
+    print(f"\n{'threshold':>9s} {'hit rate':>9s} {'agreement':>10s} {'overlap':>8s} {'hit p50':>9s} {'miss p50':>9s} {'miss p99':>9s}")
+    for threshold in args.thresholds:
+        clear_embedding_cache(service.get_embedding())
+        cached_store = CachedVectorStore(raw_store, RetrievalCache(threshold=threshold))
+        result = run(cached_store, raw_store, queries, args.k)
+        print(f"{threshold:9.2f} {result['hit_rate']:9.1%} {result['agreement']:10.1%} {result['overlap']:8.1%} "
+              f"{result['hit_p50_ms']:8.2f}ms {result['miss_p50_ms']:8.2f}ms {result['miss_p99_ms']:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# benchmark_server.py
+"""
+server.py의 요청 합치기(singleflight)와 백프레셔를 측정합니다.
+SERVICE_BACKEND=fake(가짜 LLM / 해시 임베딩)로 서버를 같은 프로세스의 uvicorn 스레드에 띄우므로 API 호출이 없습니다.
+
+    - 인기 질문 burst: --requests개의 동시 요청 중 --duplicate-ratio만큼이 같은 질문 (신작 공개 직후 같은 작품 질문이 몰리는 상황)
+    - SERVER_COALESCE=0 / 1 각각 그래프 실행 수, 응답 p50 / p99, 처리량, 429 수
+    - --queue-size를 줄이면 대기열이 가득 찼을 때 429로 바로 거절되는 비율을 볼 수 있음
+
+실행 방법:
+    python benchmark_server.py
+    python benchmark_server.py --requests 200 --duplicate-ratio 0.8 --workers 8 --queue-size 16
+"""
+
+# %%
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+from benchmark_common import percentile
+
+
+async def burst(url: str, queries: List[str], timeout: float) -> Dict[str, float]:
+    import httpx
+
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def one(client, query: str) -> None:
+        start = time.perf_counter()
+        response = await client.post(f"{url}/query", json={"query": query, "timeout": timeout})
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=len(queries))
+    async with httpx.AsyncClient(timeout=timeout + 5, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[one(client, query) for query in queries])
+        elapsed = time.perf_counter() - start
+    return {
+        "ok": statuses.get(200, 0),
+        "rejected": statuses.get(429, 0),
+        "timeouts": statuses.get(504, 0),
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p99": percentile(latencies, 99) if latencies else 0.0,
+        "qps": statuses.get(200, 0) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG 서버 요청 합치기 / 백프레셔 측정")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.7, help="인기 질문(같은 질문) 비율")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="가짜 LLM 응답 지연 (초)")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    # service.py가 import되기 전에 가짜 백엔드를 선택
+    os.environ["SERVICE_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["FAKE_EMBEDDING_LATENCY"] = "0"
+    os.environ["METRICS_LOG_PATH"] = ""
+
+    import uvicorn
+
+    from answer_cache import CachedRagApp
+    from load_test import LOAD_TEST_QUERIES
+    from main_graph import build_graph, warmup
+    from server import RagServer
+
+    graph = build_graph()
+    warmup()
+    trending = LOAD_TEST_QUERIES[0]
+    n_duplicates = int(args.requests * args.duplicate_ratio)
+    # 나머지는 서로 다른 질문 (번호를 붙여 정규화 후에도 달라지도록)
+    queries = [trending] * n_duplicates + [
+        f"{LOAD_TEST_QUERIES[1 + i % (len(LOAD_TEST_QUERIES) - 1)]} {i}" for i in range(args.requests - n_duplicates)
+    ]
+
+    print(f"\n--- 동시 요청 {args.requests}개 (같은 질문 {n_duplicates}개), workers={args.workers}, "
+          f"queue={args.queue_size}, LLM 지연 {args.llm_latency}s ---")
+    print(f"{'coalesce':>8s} {'ok':>5s} {'429':>5s} {'504':>5s} {'graph runs':>10s} {'p50':>8s} {'p99':>8s} {'qps':>7s}")
+    for port_offset, coalesce in enumerate((False, True)):
+        # 답변 캐시는 모드마다 새로 (앞 모드의 답변이 남지 않도록)
+        server = RagServer(CachedRagApp(graph), workers=args.workers, queue_size=args.queue_size,
+                           deadline=args.timeout, coalesce=coalesce)
+        uv = uvicorn.Server(uvicorn.Config(server, host="127.0.0.1", port=args.port + port_offset,
+                                           log_level="warning", lifespan="off"))
+        threading.Thread(target=uv.run, daemon=True).start()
+        while not uv.started:
+            time.sleep(0.05)
+
+        result = asyncio.run(burst(f"http://127.0.0.1:{args.port + port_offset}", queries, args.timeout))
+        uv.should_exit = True
+        print(f"{'on' if coalesce else 'off':>8s} {result['ok']:5d} {result['rejected']:5d} {result['timeouts']:5d} "
+              f"{server.counters['executions']:10d} {result['p50']:7.2f}s {result['p99']:7.2f}s {result['qps']:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# benchmark_suite.py
+"""
+API 호출 없이(SERVICE_BACKEND=fake) 그래프 세 분기의 지연 / 처리량 / 메모리를 측정하고 기준값(baseline)과 비교합니다.
+    - 가짜 LLM(지연만 흉내) / 해시 임베딩 / rag_data.jsonl로 만든 로컬 벡터 스토어 (fake_services.py)
+    - 고정된 질의 세트(SUITE_QUERIES)로 specific_search / similar_recommendation / broad_recommendation을 모두 실행
+    - 순차 실행: 분기별 end-to-end p50 / p99, 노드별 p50 (instrumentation.track_request로 수집)
+    - 동시 실행: N개 클라이언트(app.ainvoke)의 QPS와 요청 지연 p50 / p99
+    - 메모리: 그래프 빌드 후 / 전체 실행 후 peak RSS
+    - 확인: rag_query_mode별로 answer_cache.CachedRagApp을 거친 실행이 그래프 직접 실행과 같은 rag_query를 쓰는지
+
+기준값과 비교해 허용 범위(--tolerance)를 넘게 느려진 항목이 있거나 확인에 실패하면 종료 코드 1을 반환합니다.
+
+실행 방법:
+    python benchmark_suite.py                      # benchmark_baseline.json과 비교
+    python benchmark_suite.py --save-baseline      # 현재 결과를 기준값으로 저장 (성능 변경을 의도한 PR에서 함께 커밋)
+"""
+
+# %%
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from benchmark_common import clear_embedding_cache, percentile
+
+BASELINE_PATH = "./benchmark_baseline.json"
+
+# (질의, 기대하는 분기) - 규칙 기반 fast-path로 분석되는 질의와 LLM 분석을 거치는 질의를 함께 포함
+SUITE_QUERIES: List[Tuple[str, str]] = [
+    ("'승부' 줄거리 알려줘", "specific_search"),
+    ("'승부사' 줄거리 알려줘", "specific_search"),
+    ("영화 기생충 감독이 누구야?", "specific_search"),
+    ("바둑 영화 정보 찾아줘", "specific_search"),
+    ("기생충이랑 비슷한 영화 추천해줘", "similar_recommendation"),
+    ("'승부' 같은 영화 추천", "similar_recommendation"),
+    ("'헌트'랑 비슷한 분위기 작품 있어?", "similar_recommendation"),
+    ("넷플릭스 액션 영화 추천해줘", "broad_recommendation"),
+    ("봉준호 감독 넷플릭스 영화 추천해줘", "broad_recommendation"),
+    ("이병헌 나오는 넷플릭스 드라마 추천", "broad_recommendation"),
+    ("요즘 볼만한 따뜻한 가족 영화 있어?", "broad_recommendation"),
+]
+
+
+def _peak_rss_mb() -> float:
+    # Linux: KB 단위
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# %%
+# --- 1. 측정 ---
+
+def run_sequential(app, embedding, repeat: int) -> Tuple[Dict[str, List[float]], Dict[str, List[float]], Dict[str, int]]:
+    """분기별 전체 시간, 노드별 시간, 기대와 다른 분기로 실행된 질의 수를 모읍니다."""
+    from instrumentation import track_request
+
+    branch_ms: Dict[str, List[float]] = defaultdict(list)
+    node_ms: Dict[str, List[float]] = defaultdict(list)
+    mismatches: Dict[str, int] = defaultdict(int)
+    for _ in range(repeat):
+        for query, expected in SUITE_QUERIES:
+            clear_embedding_cache(embedding)
+            start = time.perf_counter()
+            with track_request(query) as request:
+                app.invoke({"query": query})
+            branch_ms[request.branch].append((time.perf_counter() - start) * 1000)
+            for name, stats in request.nodes.items():
+                node_ms[name].append(stats.wall_ms)
+            if request.branch != expected:
+                mismatches[query] += 1
+    return branch_ms, node_ms, mismatches
+
+
+async def run_concurrent(app, requests: int, concurrency: int) -> Tuple[float, List[float]]:
+    """concurrency개의 클라이언트가 질의 세트를 나눠서 계속 보냅니다. (QPS, 요청별 지연 ms)"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(SUITE_QUERIES[i % len(SUITE_QUERIES)][0])
+    latencies: List[float] = []
+
+    async def client():
+        while not queue.empty():
+            query = queue.get_nowait()
+            start = time.perf_counter()
+            await app.ainvoke({"query": query})
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start), latencies
+
+
+def collect(args) -> Dict[str, Any]:
+    from main_graph import build_graph
+    import service
+
+    app = build_graph()
+    # 워밍업 (제목 / 메타데이터 / BM25 색인 로드)
+    for query, _ in SUITE_QUERIES:
+        app.invoke({"query": query})
+    rss_after_build = _peak_rss_mb()
+
+    branch_ms, node_ms, mismatches = run_sequential(app, service.embedding, args.repeat)
+    clear_embedding_cache(service.embedding)
+    qps, latencies = asyncio.run(run_concurrent(app, args.requests, args.concurrency))
+
+    for query, count in mismatches.items():
+        print(f"[경고] 기대와 다른 분기로 실행됨 ({count}회): {query}")
+
+    return {
+        "config": {
+            "llm_latency": args.llm_latency, "embedding_latency": args.embedding_latency,
+            "repeat": args.repeat, "requests": args.requests, "concurrency": args.concurrency,
+        },
+        "metrics": {
+            **{f"branch.{b}.p50_ms": statistics.median(v) for b, v in branch_ms.items()},
+            **{f"branch.{b}.p99_ms": percentile(v, 99) for b, v in branch_ms.items()},
+            **{f"node.{n}.p50_ms": statistics.median(v) for n, v in node_ms.items()},
+            "concurrent.qps": qps,
+            "concurrent.p50_ms": statistics.median(latencies),
+            "concurrent.p99_ms": percentile(latencies, 99),
+            "memory.build_peak_rss_mb": rss_after_build,
+            "memory.peak_rss_mb": _peak_rss_mb(),
+        },
+    }
+
+def check_cached_rag_query() -> List[str]:
+    """
+    CachedRagApp은 그래프 밖에서 쿼리를 먼저 분석하므로, 분석기가 그래프와 다르면
+    (예: combined 모드에서 rag_query가 빠짐) 캐시를 거친 요청만 다른 검색 쿼리를 씁니다.
+    specific_search 질의마다 두 실행의 rag_query를 비교해서 다른 (모드, 질의)를 반환합니다.
+    """
+    from answer_cache import CachedRagApp, InMemoryAnswerCache
+    from main_graph import RAG_QUERY_MODES, build_graph
+
+    failures = []
+    for mode in RAG_QUERY_MODES:
+        app = build_graph(rag_query_mode=mode)
+        cached_app = CachedRagApp(app, InMemoryAnswerCache())
+        for query, route in SUITE_QUERIES:
+            if route != "specific_search":
+                continue
+            direct = app.invoke({"query": query}).get("rag_query")
+            cached = cached_app.invoke({"query": query}).get("rag_query")
+            if direct != cached:
+                failures.append(f"{mode}: {query} (직접 {direct!r} / 캐시 경유 {cached!r})")
+    return failures
+
+# %%
+# --- 2. 기준값 비교 ---
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta_ms: float) -> List[str]:
+    """기준값 대비 tolerance(비율) 이상 나빠진 항목 이름을 반환합니다. (ms 항목은 min_delta_ms 미만의 차이는 무시)"""
+    if result["config"] != baseline.get("config"):
+        print(f"[경고] 기준값과 실행 설정이 다릅니다: {baseline.get('config')}")
+
+    regressions = []
+    print(f"\n{'metric':52s} {'baseline':>10s} {'current':>10s} {'change':>8s}")
+    for name in sorted(set(result["metrics"]) | set(baseline["metrics"])):
+        current = result["metrics"].get(name)
+        before = baseline["metrics"].get(name)
+        if current is None or before is None:
+            print(f"{name:52s} {before if before is not None else '-':>10} "
+                  f"{f'{current:.1f}' if current is not None else '-':>10s}")
+            continue
+        change = (current - before) / before if before else 0.0
+        # qps는 높을수록, 나머지(지연 / 메모리)는 낮을수록 좋음
+        worse = -change if name.endswith("qps") else change
+        regressed = worse > tolerance and not (name.endswith("_ms") and abs(current - before) < min_delta_ms)
+        if regressed:
+            regressions.append(name)
+        print(f"{name:52s} {before:10.1f} {current:10.1f} {change:+8.1%}{'  <-- 회귀' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 LLM / 임베딩으로 그래프 세 분기의 지연 / 처리량 / 메모리 회귀 확인")
+    parser.add_argument("--repeat", type=int, default=3, help="순차 실행 시 질의 세트 반복 횟수")
+    parser.add_argument("--requests", type=int, default=110, help="동시 실행 시 전체 요청 수")
+    parser.add_argument("--concurrency", type=int, default=10, help="동시 클라이언트 수")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="가짜 LLM 응답 지연 (초)")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="가짜 임베딩 응답 지연 (초)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="현재 결과를 --baseline 파일에 저장")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="허용하는 악화 비율")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="이보다 작은 지연 차이는 회귀로 보지 않음")
+    args = parser.parse_args()
+
+    # service.py가 import되기 전에 가짜 백엔드를 선택
+    os.environ["SERVICE_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["FAKE_EMBEDDING_LATENCY"] = str(args.embedding_latency)
+    os.environ["METRICS_LOG_PATH"] = ""
+    # 반복 실행에서도 검색 노드 지연을 그대로 측정 (retrieval_cache.py)
+    os.environ["RETRIEVAL_CACHE_ENABLED"] = "0"
+
+    result = collect(args)
+    failures = check_cached_rag_query()
+    for failure in failures:
+        print(f"[실패] 답변 캐시를 거친 실행의 rag_query가 다름 - {failure}")
+    if failures:
+        sys.exit(1)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\n--- 기준값 저장: {args.baseline} ---")
+        for name, value in sorted(result["metrics"].items()):
+            print(f"{name:52s} {value:10.1f}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"기준값 파일이 없습니다: {args.baseline} (--save-baseline으로 먼저 생성)")
+        sys.exit(2)
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(result, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"\n--- 성능 회귀 {len(regressions)}건 (허용 범위 {args.tolerance:.0%}) ---")
+        sys.exit(1)
+    print("\n--- 성능 회귀 없음 ---")
+
+
+if __name__ == "__main__":
+    main()
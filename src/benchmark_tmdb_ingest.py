@@ -0,0 +1,193 @@
+# benchmark_tmdb_ingest.py
+"""
+로컬 fake TMDB 서버를 띄워 놓고
+기존 노트북 방식(작품당 5번의 순차 요청 + sleep 0.05)과 tmdb_ingest의 처리량(items/sec)을 비교합니다.
+fake 서버는 응답 지연과 429 / 503 오류를 일정 비율로 섞어서 돌려줍니다. (실제 TMDB API는 호출하지 않음)
+
+실행 방법:
+    python benchmark_tmdb_ingest.py --items 500 --latency 0.05 --failure-rate 0.02
+"""
+
+# %%
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from http_cache import HttpCache
+from tmdb_ingest import RATING_APPEND, TMDBClient, load_processed_ids, parse_title, run_ingest
+
+# %%
+# --- 1. fake TMDB 서버 ---
+
+def fake_section(item_type: str, tmdb_id: int, name: str) -> Dict[str, Any]:
+    """append_to_response / 개별 엔드포인트에 공통으로 쓰는 가짜 응답."""
+    if name == "credits":
+        return {
+            "cast": [{"name": f"배우{(tmdb_id + i) % 97}"} for i in range(12)],
+            "crew": [{"name": f"감독{tmdb_id % 31}", "job": "Director"}, {"name": f"작가{tmdb_id % 17}", "job": "Writer"}],
+        }
+    if name == "watch/providers":
+        return {"results": {"KR": {"flatrate": [{"provider_name": "Netflix"}], "rent": [], "buy": []}}}
+    if name == "keywords":
+        keywords = [{"name": f"keyword{tmdb_id % 13}"}, {"name": f"keyword{tmdb_id % 7}"}]
+        return {"keywords": keywords} if item_type == "movie" else {"results": keywords}
+    if name == "release_dates":
+        return {"results": [{"iso_3166_1": "KR", "release_dates": [{"certification": "15"}]}]}
+    if name == "content_ratings":
+        return {"results": [{"iso_3166_1": "KR", "rating": "15"}]}
+    raise KeyError(name)
+
+
+def fake_details(item_type: str, tmdb_id: int) -> Dict[str, Any]:
+    details = {
+        "id": tmdb_id,
+        "overview": f"작품 {tmdb_id}의 줄거리",
+        "genres": [{"name": "드라마"}, {"name": "액션" if tmdb_id % 2 else "코미디"}],
+        "poster_path": f"/poster{tmdb_id}.jpg",
+        "backdrop_path": f"/backdrop{tmdb_id}.jpg",
+    }
+    if item_type == "movie":
+        details["runtime"] = 90 + tmdb_id % 60
+    else:
+        details["episode_run_time"] = [60]
+    return details
+
+
+PATH_PATTERN = re.compile(r"^(?:/3)?/(movie|tv)/(\d+)(?:/(.+))?$")
+
+
+def start_fake_tmdb_server(latency: float, failure_rate: float, seed: int = 0) -> tuple:
+    """별도 스레드에서 fake TMDB 서버를 실행하고 (base_url, 요청 카운터)를 반환합니다."""
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    counter = {"requests": 0, "failures": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            time.sleep(latency)
+            with rng_lock:
+                counter["requests"] += 1
+                fail = rng.random() < failure_rate
+                status = rng.choice([429, 503]) if fail else 200
+                if fail:
+                    counter["failures"] += 1
+            if status == 429:
+                return self._send(429, {"status_message": "rate limit"}, {"Retry-After": "0"})
+            if status == 503:
+                return self._send(503, {"status_message": "unavailable"})
+
+            match = PATH_PATTERN.match(url.path)
+            if not match:
+                return self._send(404, {"status_message": "not found"})
+            item_type, tmdb_id, section = match.group(1), int(match.group(2)), match.group(3)
+            if section:
+                return self._send(200, fake_section(item_type, tmdb_id, section))
+
+            body = fake_details(item_type, tmdb_id)
+            append = parse_qs(url.query).get("append_to_response", [""])[0]
+            for name in filter(None, append.split(",")):
+                body[name] = fake_section(item_type, tmdb_id, name)
+            self._send(200, body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/3", counter
+
+# %%
+# --- 2. 기존 노트북 방식 (비교 기준) ---
+
+def run_legacy(seeds: List[Dict[str, Any]], base_url: str) -> Dict[str, Any]:
+    """data_preprocessing.ipynb처럼 작품마다 엔드포인트별로 순차 요청하고 0.05초 대기합니다."""
+    done = errors = 0
+    start = time.perf_counter()
+    for seed in seeds:
+        item_type, tmdb_id = seed['type'], seed['tmdb_id']
+        base_path = f"{base_url}/{item_type}/{tmdb_id}"
+        try:
+            data = requests.get(base_path, params={"language": "ko-KR"}, timeout=10).json()
+            for name in ["credits", "watch/providers", "keywords", RATING_APPEND[item_type]]:
+                data[name] = requests.get(f"{base_path}/{name}", timeout=10).json()
+            parse_title(seed, data)
+            done += 1
+        except Exception:
+            # 노트북 방식은 재시도 없이 건너뜀
+            errors += 1
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    return {"done": done, "errors": errors, "elapsed_s": round(elapsed, 2), "items_per_sec": round(done / elapsed, 2)}
+
+# %%
+def make_seeds(count: int) -> List[Dict[str, Any]]:
+    return [
+        {"qid": f"Q{i}", "imdb_id": f"tt{i:07d}", "tmdb_id": 100000 + i, "type": "movie" if i % 3 else "tv",
+         "title_ko": f"작품{i}", "title_en": f"Title {i}", "year": 2000 + i % 25}
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fake TMDB 서버로 데이터 보강 처리량 비교")
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--legacy-items", type=int, default=50, help="기존 방식은 느리므로 일부만 측정")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake 서버 응답 지연 (초)")
+    parser.add_argument("--failure-rate", type=float, default=0.02, help="429 / 503 응답 비율")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=200, help="초당 최대 요청 수")
+    args = parser.parse_args()
+
+    base_url, counter = start_fake_tmdb_server(args.latency, args.failure_rate)
+    print(f"fake TMDB 서버: {base_url}")
+    seeds = make_seeds(args.items)
+
+    legacy = run_legacy(seeds[:args.legacy_items], base_url)
+    print(f"기존 방식 (작품 {args.legacy_items}개): {legacy}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, "tmdb_data.jsonl")
+        # 응답 캐시는 임시 디렉터리에 (db/http_cache에 fake 응답이 섞이지 않도록)
+        cache = HttpCache(os.path.join(tmp, "http_cache"))
+        client = TMDBClient(api_key="fake", base_url=base_url, workers=args.workers, rate=args.rate, cache=cache)
+
+        # 절반만 처리한 뒤 중단된 상황을 만들고, 전체를 다시 실행해서 이어하기 확인
+        half = run_ingest(seeds[:args.items // 2], client, output_path, workers=args.workers, show_progress=False)
+        before = counter["requests"]
+        resumed = run_ingest(seeds, client, output_path, workers=args.workers, show_progress=False)
+        resumed_requests = counter["requests"] - before
+        saved = len(load_processed_ids(output_path))
+
+    print(f"tmdb_ingest 1차 (작품 {args.items // 2}개): {half}")
+    print(f"tmdb_ingest 이어하기 (전체 {args.items}개): {resumed}")
+    print(f"이어하기 요청 수: {resumed_requests} (남은 작품 {args.items - args.items // 2}개 + 재시도), 저장된 작품: {saved}")
+    print(f"\n처리량: 기존 {legacy['items_per_sec']} items/s → tmdb_ingest {resumed['items_per_sec']} items/s "
+          f"(x{resumed['items_per_sec'] / max(legacy['items_per_sec'], 1e-9):.1f})")
+
+
+if __name__ == "__main__":
+    main()
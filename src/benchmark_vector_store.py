@@ -0,0 +1,97 @@
+# benchmark_vector_store.py
+"""
+Chroma 컬렉션과 NumpyVectorStore의 top-k 검색 지연(p50/p99)을 비교합니다.
+질의 벡터는 저장된 임베딩에 노이즈를 더해 만들기 때문에 임베딩 API를 호출하지 않습니다.
+
+실행 방법:
+    python benchmark_vector_store.py --queries 200 --k 3
+"""
+
+# %%
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from benchmark_common import percentile
+from numpy_vector_store import NumpyVectorStore
+
+CHROMA_PERSIST_DIRECTORY = './db/chromaDB2'
+CHROMA_COLLECTION_NAME = 'movie_rag_collection'
+
+# %%
+def _measure(name: str, fn: Callable[[List[float]], list], queries: np.ndarray) -> List[List[str]]:
+    fn(queries[0].tolist())  # warm-up
+    timings, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        docs = fn(query.tolist())
+        timings.append((time.perf_counter() - start) * 1000)
+        results.append([doc.page_content for doc in docs])
+    print(f"{name:<28} p50={statistics.median(timings):7.3f}ms  p99={percentile(timings, 99):7.3f}ms")
+    return results
+
+
+def _overlap(a: List[List[str]], b: List[List[str]]) -> float:
+    scores = [len(set(x) & set(y)) / max(1, len(x)) for x, y in zip(a, b)]
+    return statistics.mean(scores) if scores else 0.0
+
+# %%
+def main():
+    parser = argparse.ArgumentParser(description="Chroma vs NumpyVectorStore 검색 지연 비교")
+    parser.add_argument("--persist-directory", default=CHROMA_PERSIST_DIRECTORY)
+    parser.add_argument("--collection-name", default=CHROMA_COLLECTION_NAME)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--noise", type=float, default=0.05)
+    args = parser.parse_args()
+
+    # 질의 벡터를 직접 넘기므로 임베딩 함수는 호출되지 않음 (차원 정보만 사용)
+    start = time.perf_counter()
+    chroma_store = Chroma(
+        embedding_function=DeterministicFakeEmbedding(size=1),
+        persist_directory=args.persist_directory,
+        collection_name=args.collection_name
+    )
+    print(f"Chroma 초기화: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    start = time.perf_counter()
+    numpy_store = NumpyVectorStore.from_chroma(chroma_store)
+    print(f"NumpyVectorStore 로드 (Chroma에서 복사): {(time.perf_counter() - start) * 1000:.1f}ms "
+          f"({numpy_store._data.vectors.shape[0]}개, {numpy_store._data.vectors.nbytes / 1e6:.1f}MB)")
+    numpy_fp16 = NumpyVectorStore(numpy_store.embedding, numpy_store._data.ids, numpy_store._data.texts,
+                                  numpy_store._data.metadatas, numpy_store._data.vectors, dtype="float16")
+
+    # 저장된 임베딩(원본 스케일)에 상대 크기 args.noise의 가우시안 노이즈를 더해 질의 생성
+    rng = np.random.default_rng(0)
+    base = np.asarray(chroma_store.get(include=['embeddings'])['embeddings'], dtype=np.float32)
+    rows = rng.integers(0, base.shape[0], size=args.queries)
+    noise = rng.normal(0, 1, size=(args.queries, base.shape[1])).astype(np.float32)
+    scale = np.linalg.norm(base[rows], axis=1, keepdims=True) / np.sqrt(base.shape[1])
+    queries = base[rows] + args.noise * scale * noise
+
+    print(f"\n--- top-{args.k}, 필터 없음 ---")
+    chroma_results = _measure("chroma", lambda q: chroma_store.similarity_search_by_vector(q, k=args.k), queries)
+    numpy_results = _measure("numpy float32", lambda q: numpy_store.similarity_search_by_vector(q, k=args.k), queries)
+    fp16_results = _measure("numpy float16", lambda q: numpy_fp16.similarity_search_by_vector(q, k=args.k), queries)
+    print(f"chroma 대비 top-{args.k} 일치율: float32={_overlap(chroma_results, numpy_results):.3f} "
+          f"float16={_overlap(chroma_results, fp16_results):.3f}")
+
+    where = {"genre_드라마": {"$eq": 1}}
+    print(f"\n--- top-{args.k}, 필터 {where} ---")
+    _measure("chroma", lambda q: chroma_store.similarity_search_by_vector(q, k=args.k, filter=where), queries)
+    _measure("numpy float32", lambda q: numpy_store.similarity_search_by_vector(q, k=args.k, filter=where), queries)
+
+    print(f"\n--- 배치 검색 ({args.queries}개 질의를 한 번에) ---")
+    start = time.perf_counter()
+    numpy_store.similarity_search_by_vectors(queries, k=args.k)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"numpy batch: 총 {elapsed:.2f}ms (질의당 {elapsed / args.queries:.4f}ms)")
+
+
+if __name__ == "__main__":
+    main()
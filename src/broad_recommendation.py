@@ -1,14 +1,19 @@
 # broad_recommendation.py
 
 # %%
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Literal, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document
 
 from state import AgentState
-# retriever가 아닌 vector_store를 직접 임포트하여 filter 기능 사용
-from service import llm, vector_store 
+# 메타데이터 역색인은 vector_store로 만들고, 검색은 retriever(dense / hybrid)에 후보 ids를 넘겨서 수행
+from service import RETRIEVER_K, get_llm, get_vector_store, get_retriever
+from ingest import current_index_version
+from metadata_index import MetadataIndex
+
+BROAD_TOP_K = RETRIEVER_K
 
 # %%
 # --- Node 2: 광범위 추천 RAG 쿼리 생성 ---
@@ -26,26 +31,39 @@ broad_rag_prompt_template = """
 """
 
 broad_rag_prompt = ChatPromptTemplate.from_template(broad_rag_prompt_template)
-broad_rag_chain = broad_rag_prompt | llm | StrOutputParser()
+@lru_cache(maxsize=None)
+def get_broad_rag_chain():
+    return broad_rag_prompt | get_llm() | StrOutputParser()
 
-def generate_broad_rag_query(state: AgentState) -> AgentState:
-    """
-    (플로우 2단계)
-    'rag_context' (검색 조건)를 기반으로
-    광범위한 추천을 위한 RAG 쿼리를 생성하여 'rag_query'에 덮어씌웁니다.
-    """
+# generate_broad_rag_query / agenerate_broad_rag_query 공통 전후 처리 (체인 호출만 다름)
+def _broad_rag_query_input(state: AgentState) -> dict:
     print("--- RAG: 광범위 추천 쿼리 생성 중 ---")
     rag_context = state.get('rag_context')
 
     if not rag_context or rag_context == " - (No specific query details provided) -":
         print("경고: rag_context가 비어있어 원본 쿼리로 쿼리 생성 시도.")
         rag_context = state.get('query')
+    return {"rag_context": rag_context}
 
-    new_rag_query = broad_rag_chain.invoke({"rag_context": rag_context})
-    
+
+def _broad_rag_query_output(new_rag_query: str) -> AgentState:
     print(f"--- 생성된 광범위 추천 쿼리 (rag_query로 업데이트): {new_rag_query} ---")
     return {"rag_query": new_rag_query}
 
+
+def generate_broad_rag_query(state: AgentState) -> AgentState:
+    """
+    (플로우 2단계)
+    'rag_context' (검색 조건)를 기반으로
+    광범위한 추천을 위한 RAG 쿼리를 생성하여 'rag_query'에 덮어씌웁니다.
+    """
+    return _broad_rag_query_output(get_broad_rag_chain().invoke(_broad_rag_query_input(state)))
+
+
+async def agenerate_broad_rag_query(state: AgentState) -> AgentState:
+    """generate_broad_rag_query의 비동기 버전"""
+    return _broad_rag_query_output(await get_broad_rag_chain().ainvoke(_broad_rag_query_input(state)))
+
 # %%
 # --- Node 3: 메타데이터 필터링을 통한 검색 ---
 
@@ -94,11 +112,24 @@ def _build_metadata_filter(state: AgentState) -> Optional[Dict[str, Any]]:
     return {"$and": filter_list}
 
 
-def retrieve_with_filter(state: AgentState) -> AgentState:
+@lru_cache(maxsize=1)
+def _metadata_index_for(index_version: Optional[int]) -> MetadataIndex:
+    print(f"--- 메타데이터 역색인 생성 중 (index_version {index_version}) ---")
+    return MetadataIndex.from_vector_store(get_vector_store())
+
+
+def get_metadata_index() -> MetadataIndex:
     """
-    (플로우 3단계)
-    'rag_query' (semantic)와 state의 세부 정보 (metadata filter)를
-    모두 사용하여 RAG 문서를 검색합니다.
+    컬렉션 메타데이터로 만든 역색인을 재사용합니다.
+    벡터 스토어가 검색하는 컬렉션 버전(index_version)이 바뀌면 다시 만듭니다. (새로 인덱싱한 작품도 후보에 들어가도록)
+    """
+    return _metadata_index_for(current_index_version(get_vector_store()))
+
+
+def _filtered_search(state: AgentState) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    retrieve_with_filter / aretrieve_with_filter가 retriever에 넘길 (쿼리, search_kwargs).
+    메타데이터 조건에 맞는 문서가 하나도 없으면 None (벡터 검색을 하지 않음)
     """
     print("--- RAG: 메타데이터 필터링으로 검색 중 ---")
     
@@ -107,25 +138,82 @@ def retrieve_with_filter(state: AgentState) -> AgentState:
         print("경고: RAG 쿼리가 없어 원본 쿼리로 시맨틱 검색 시도.")
         rag_query = state['query']
 
-    # 1. 메타데이터 필터 생성
-    metadata_filter = _build_metadata_filter(state)
+    # 1. 역색인으로 조건(casts, director, genre, ott, year)에 맞는 후보 문서 ID 계산
+    candidate_ids = get_metadata_index().candidate_ids(state)
     
-    search_kwargs = {'k': 3} # service.py의 기본값
+    search_kwargs = {'k': BROAD_TOP_K}
     
-    if metadata_filter:
-        print(f"--- 적용된 메타데이터 필터: {metadata_filter} ---")
-        search_kwargs['filter'] = metadata_filter
+    if candidate_ids is not None:
+        print(f"--- 적용된 메타데이터 필터: {_build_metadata_filter(state)} (후보 {len(candidate_ids)}개) ---")
+        
+        # 조건에 맞는 문서가 없으면 벡터 검색(임베딩 호출)을 건너뜀
+        if not candidate_ids:
+            print("--- 조건에 맞는 문서가 없어 벡터 검색을 건너뜁니다 ---")
+            return None
         
-        # 필터가 있으면 vector_store.similarity_search 사용
-        docs = vector_store.similarity_search(
-            query=rag_query,
-            **search_kwargs
-        )
+        # 후보 문서들 안에서만 유사도 계산 (Chroma / NumpyVectorStore / HybridRetriever 모두 ids 지원)
+        search_kwargs['ids'] = candidate_ids
     else:
         print("--- 메타데이터 필터 없음. 시맨틱 검색만 수행 ---")
-        docs = vector_store.similarity_search(
-            query=rag_query,
-            **search_kwargs
-        )
-    
-    return {'context': docs}
\ No newline at end of file
+
+    return rag_query, search_kwargs
+
+
+def retrieve_with_filter(state: AgentState) -> AgentState:
+    """
+    (플로우 3단계)
+    'rag_query' (semantic)와 state의 세부 정보 (metadata filter)를
+    모두 사용하여 RAG 문서를 검색합니다.
+    """
+    search = _filtered_search(state)
+    if search is None:
+        return {'context': []}
+    rag_query, search_kwargs = search
+    return {'context': get_retriever().invoke(rag_query, **search_kwargs)}
+
+
+async def aretrieve_with_filter(state: AgentState) -> AgentState:
+    """retrieve_with_filter의 비동기 버전"""
+    search = _filtered_search(state)
+    if search is None:
+        return {'context': []}
+    rag_query, search_kwargs = search
+    return {'context': await get_retriever().ainvoke(rag_query, **search_kwargs)}
+
+
+# %%
+# --- Node 3 (병렬): 원본 쿼리로 메타데이터 필터 검색 ---
+# PARALLEL_RETRIEVAL이 켜져 있으면 generate_broad_rag_query(LLM)가 쿼리를 만드는 동안
+# 원본 쿼리로 먼저 같은 필터 검색을 수행합니다. 결과는 prefetched_context에 두었다가
+# broad 쿼리 검색 결과 뒤에 붙이고 BROAD_TOP_K개로 자릅니다. (main_graph의 merge_prefetched_context)
+
+def route_broad_retrieval(state: AgentState) -> Literal['filter_only', 'generate']:
+    """
+    'filter_only': 메타데이터 필터 후보가 BROAD_TOP_K개 이하 → 어떤 쿼리로 검색해도 결과 집합이 같으므로
+                   broad 쿼리 생성(LLM)을 건너뛰고 원본 쿼리 필터 검색만 수행
+    'generate'   : broad 쿼리 생성 → 필터 검색 (원본 쿼리 필터 검색은 병렬로 함께 실행)
+    """
+    candidate_ids = get_metadata_index().candidate_ids(state)
+    if candidate_ids is not None and len(candidate_ids) <= BROAD_TOP_K:
+        return 'filter_only'
+    return 'generate'
+
+
+def retrieve_with_filter_on_query(state: AgentState) -> AgentState:
+    """retrieve_with_filter를 rag_query 대신 원본 쿼리로 실행합니다."""
+    return retrieve_with_filter({**state, 'rag_query': state['query']})
+
+
+async def aretrieve_with_filter_on_query(state: AgentState) -> AgentState:
+    """retrieve_with_filter_on_query의 비동기 버전"""
+    return await aretrieve_with_filter({**state, 'rag_query': state['query']})
+
+
+def prefetch_with_filter_on_query(state: AgentState) -> AgentState:
+    """retrieve_with_filter_on_query의 결과를 prefetched_context로 (broad 쿼리 검색과 병렬 실행)"""
+    return {'prefetched_context': retrieve_with_filter_on_query(state)['context']}
+
+
+async def aprefetch_with_filter_on_query(state: AgentState) -> AgentState:
+    """prefetch_with_filter_on_query의 비동기 버전"""
+    return {'prefetched_context': (await aretrieve_with_filter_on_query(state))['context']}
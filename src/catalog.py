@@ -0,0 +1,90 @@
+# catalog.py
+
+# %%
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Mapping, Sequence
+
+from langchain_core.documents import Document
+
+RAG_DATA_PATH = './output/rag_data.jsonl'
+# 1이면 조회(load_records / records_by_tmdb_id)는 rag_data.jsonl 대신 열 단위 mmap 저장소(catalog_store.py)에서 읽음
+CATALOG_STORE_ENABLED = os.getenv("CATALOG_STORE_ENABLED", "1") == "1"
+
+# %%
+def iter_records(path: str = RAG_DATA_PATH) -> Iterator[Dict]:
+    """rag_data.jsonl을 한 줄씩 읽어서 레코드를 하나씩 돌려줍니다. (파일 전체를 메모리에 올리지 않음)"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # 형식이 깨진 줄은 무시
+                continue
+
+
+@lru_cache(maxsize=None)
+def get_catalog_store(path: str = RAG_DATA_PATH):
+    """
+    rag_data.jsonl로 만든 catalog_store.CatalogStore를 mmap으로 엽니다.
+    저장소는 ingest.py / `python catalog_store.py`에서만 빌드합니다. (서버 워커 여러 개가 동시에 빌드하지 않도록)
+    CATALOG_STORE_ENABLED=0이거나 저장소가 없거나 원본보다 오래됐으면 None (호출하는 쪽은 JSONL을 읽음)
+    """
+    if not CATALOG_STORE_ENABLED:
+        return None
+    from catalog_store import CATALOG_STORE_PATH, CatalogStore, is_stale
+
+    store_path = CATALOG_STORE_PATH if path == RAG_DATA_PATH else f"{os.path.splitext(path)[0]}.catalog"
+    if is_stale(store_path, path):
+        if os.path.exists(path):
+            print(f"--- 카탈로그 저장소가 없거나 오래됨: {path}를 직접 읽음 "
+                  f"(python catalog_store.py --input {path} --output {store_path}) ---")
+        return None
+    return CatalogStore.open(store_path)
+
+
+@lru_cache(maxsize=None)
+def load_records(path: str = RAG_DATA_PATH) -> Sequence[Mapping[str, Any]]:
+    """
+    ingest 단계에서 생성된 카탈로그의 전체 레코드. (프로세스 내에서 캐시되므로 여러 모듈이 공유)
+    카탈로그 저장소를 쓰면 레코드는 dict처럼 읽히는 지연 객체이고, 필드는 읽을 때 mmap에서 디코딩됩니다.
+    """
+    store = get_catalog_store(path)
+    if store is not None:
+        return store.records()
+    return tuple(iter_records(path))
+
+
+@lru_cache(maxsize=None)
+def records_by_tmdb_id(path: str = RAG_DATA_PATH) -> Mapping[int, Mapping[str, Any]]:
+    """tmdb_id → 레코드. (tmdb_id로 작품을 O(1) 조회할 때 사용)"""
+    store = get_catalog_store(path)
+    if store is not None:
+        return store.index()
+    return {record['tmdb_id']: record for record in load_records(path) if record.get('tmdb_id') is not None}
+
+
+def record_to_document(record: Mapping[str, Any]) -> Document:
+    """
+    rag_data.jsonl 레코드를 벡터 스토어에 저장된 것과 같은 형식의 Document로 변환합니다.
+    (ingest 노트북과 같은 metadata 구성: casts / director는 콤마 문자열, genre_ / ott_ 원핫 컬럼)
+    벡터 스토어를 거치지 않고 작품 문서를 바로 만들 때 사용합니다.
+    """
+    metadata: Dict[str, Any] = {
+        'tmdb_id': record.get('tmdb_id'),
+        'title_ko': record.get('title_ko'),
+        'year': record.get('year'),
+        'runtime_min': record.get('runtime_min') if record.get('runtime_min') is not None else '',
+        'rating_kr': record.get('rating_kr'),
+        'casts': ', '.join(record.get('cast') or []),
+        'director': ', '.join(record.get('directors') or []),
+    }
+    for genre in record.get('genres') or []:
+        metadata[f"genre_{genre}"] = 1
+    for ott in record.get('ott_streaming_kr') or []:
+        metadata[f"ott_{ott}"] = 1
+    return Document(page_content=str(record.get('rag_text')), metadata=metadata)
@@ -0,0 +1,406 @@
+# catalog_store.py
+"""
+작품 카탈로그(rag_data.jsonl)를 열 단위(columnar) 배열 파일로 저장하고 mmap으로 여는 저장소.
+JSON을 한 줄씩 다시 파싱하지 않고, 필요한 행 / 필드만 디스크에서 읽습니다.
+
+    CATALOG_STORE_PATH/ (기본 ./output/catalog)
+        meta.json                  행 수, 컬럼 스키마, 원본 파일 크기 / 수정 시각 (바뀌면 catalog.py는 JSONL을 읽음)
+        strings.bin / .offsets.npy 모든 문자열을 중복 없이 정렬해 이어 붙인 UTF-8 (interning, 문자열 ID = 정렬 순서)
+        {int 컬럼}.npy             tmdb_id / year / runtime_min (없으면 -1)
+        {문자열 컬럼}.npy          문자열 ID (int32, 없으면 -1)
+        {리스트 컬럼}.offsets.npy  행 i의 값 = values[offsets[i]:offsets[i+1]]  (cast / genres / ott_* ...)
+        {리스트 컬럼}.values.npy   문자열 ID
+        {리스트 컬럼}.rows.npy     values와 같은 길이의 행 번호 (값 → 행 벡터 검색용)
+        tmdb_id.slots.npy          tmdb_id → 행 번호 open addressing 해시 테이블 (O(1) 조회)
+
+    store = CatalogStore.open()
+    store.by_tmdb_id(760497)                  # CatalogRecord (dict처럼 record.get('title_ko'), 필드는 읽을 때 디코딩)
+    store.rows_with('cast', '이병헌')         # 이병헌이 출연한 행 번호 배열 (values 배열 비교 한 번)
+    store.column('year') >= 2020              # int 컬럼은 mmap 배열 그대로
+
+tmdb_data.jsonl / wikidata.csv는 같은 tmdb_id 행의 빈 필드를 채우는 데만 사용합니다.
+(rag_text가 없는 작품은 검색 대상이 아니므로 행으로 넣지 않음)
+
+실행 방법:
+    python catalog_store.py                   # ./output/rag_data.jsonl → ./output/catalog
+"""
+
+# %%
+import argparse
+import csv
+import json
+import os
+import shutil
+import time
+import uuid
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from catalog import RAG_DATA_PATH, iter_records
+
+# %%
+# --- 1. 설정 / 스키마 ---
+CATALOG_STORE_PATH = os.getenv("CATALOG_STORE_PATH", "./output/catalog")
+TMDB_DATA_PATH = './output/tmdb_data.jsonl'
+WIKIDATA_PATH = './data/wikidata.csv'
+
+FORMAT_VERSION = 1
+INT_COLUMNS = {"tmdb_id": np.int64, "year": np.int32, "runtime_min": np.int32}
+STRING_COLUMNS = ["qid", "imdb_id", "type", "title_ko", "title_en", "overview",
+                  "poster_path", "backdrop_path", "rating_kr", "rag_text"]
+LIST_COLUMNS = ["genres", "cast", "directors", "writers",
+                "ott_streaming_kr", "ott_rent_kr", "ott_buy_kr", "keywords"]
+# rag_data.jsonl 레코드의 키 순서
+FIELD_ORDER = ["qid", "imdb_id", "tmdb_id", "type", "title_ko", "title_en", "year", "overview", "genres",
+               "poster_path", "backdrop_path", "runtime_min", "cast", "directors", "writers",
+               "ott_streaming_kr", "ott_rent_kr", "ott_buy_kr", "keywords", "rating_kr", "rag_text"]
+# wikidata.csv 컬럼 → 레코드 키
+WIKIDATA_FIELDS = {"item": "qid", "imdbID": "imdb_id"}
+
+NULL = -1
+
+
+def _source_stamp(path: str) -> Optional[List[int]]:
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _is_missing(value: Any) -> bool:
+    # pandas로 만든 파일에는 빈 값이 NaN(float)으로 들어 있음
+    return value is None or value == "" or (isinstance(value, float) and value != value)
+
+
+def _slot(tmdb_id: int, mask: int) -> int:
+    return (tmdb_id * 0x9E3779B1) & mask
+
+# %%
+# --- 2. 빌드 ---
+
+def _fill_sources(tmdb_path: str, wikidata_path: str) -> Dict[int, Dict[str, Any]]:
+    """tmdb_id → 보조 필드. 먼저 읽은 파일(tmdb_data.jsonl)의 값이 우선"""
+    extra: Dict[int, Dict[str, Any]] = {}
+    if os.path.exists(tmdb_path):
+        for record in iter_records(tmdb_path):
+            if record.get('tmdb_id') is not None:
+                extra[int(record['tmdb_id'])] = record
+    if os.path.exists(wikidata_path):
+        with open(wikidata_path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                try:
+                    tmdb_id = int(row.get("tmdbID") or "")
+                except ValueError:
+                    continue
+                fields = extra.setdefault(tmdb_id, {})
+                for column, key in WIKIDATA_FIELDS.items():
+                    if _is_missing(fields.get(key)) and row.get(column):
+                        fields[key] = row[column]
+    return extra
+
+
+def build_catalog_store(source: str = RAG_DATA_PATH, path: str = CATALOG_STORE_PATH,
+                        tmdb_path: str = TMDB_DATA_PATH, wikidata_path: str = WIKIDATA_PATH) -> None:
+    start = time.perf_counter()
+    extra = _fill_sources(tmdb_path, wikidata_path)
+
+    ints: Dict[str, List[int]] = {name: [] for name in INT_COLUMNS}
+    strings: Dict[str, List[Optional[str]]] = {name: [] for name in STRING_COLUMNS}
+    lists: Dict[str, List[List[str]]] = {name: [] for name in LIST_COLUMNS}
+    for record in iter_records(source):
+        if record.get('tmdb_id') is not None:
+            fill = extra.get(int(record['tmdb_id']), {})
+            record = {**record, **{k: v for k, v in fill.items()
+                                   if _is_missing(record.get(k)) and not _is_missing(v)}}
+        for name in INT_COLUMNS:
+            value = record.get(name)
+            ints[name].append(NULL if _is_missing(value) else int(value))
+        for name in STRING_COLUMNS:
+            value = record.get(name)
+            # 빈 문자열은 그대로 유지 (None / NaN만 값 없음)
+            strings[name].append(None if value is None or value != value else str(value))
+        for name in LIST_COLUMNS:
+            lists[name].append([str(v) for v in record.get(name) or [] if not _is_missing(v)])
+    n_rows = len(ints["tmdb_id"])
+
+    # 문자열 interning: 전체 문자열을 정렬해 ID를 매김 (정렬돼 있으므로 문자열 → ID는 이진 탐색)
+    table = sorted({s for values in strings.values() for s in values if s is not None}
+                   | {s for values in lists.values() for row in values for s in row})
+    string_id = {s: i for i, s in enumerate(table)}
+    encoded = [s.encode("utf-8") for s in table]
+
+    # 임시 / 이전 디렉터리 이름은 프로세스마다 다르게 (동시에 빌드해도 서로의 디렉터리를 지우지 않도록)
+    suffix = f"{os.getpid()}.{uuid.uuid4().hex[:8]}"
+    tmp = f"{path}.{suffix}.tmp"
+    os.makedirs(tmp)
+    with open(os.path.join(tmp, "strings.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(os.path.join(tmp, "strings.offsets.npy"),
+            np.concatenate([[0], np.cumsum([len(b) for b in encoded], dtype=np.int64)]).astype(np.int64))
+
+    for name, dtype in INT_COLUMNS.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(ints[name], dtype=dtype))
+    for name in STRING_COLUMNS:
+        ids = [NULL if s is None else string_id[s] for s in strings[name]]
+        np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(ids, dtype=np.int32))
+    for name in LIST_COLUMNS:
+        lengths = [len(row) for row in lists[name]]
+        np.save(os.path.join(tmp, f"{name}.offsets.npy"),
+                np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]).astype(np.int64))
+        np.save(os.path.join(tmp, f"{name}.values.npy"),
+                np.asarray([string_id[s] for row in lists[name] for s in row], dtype=np.int32))
+        np.save(os.path.join(tmp, f"{name}.rows.npy"),
+                np.repeat(np.arange(n_rows, dtype=np.int32), lengths))
+
+    # tmdb_id → 행 번호: 2배 크기의 linear probing 해시 테이블 (같은 tmdb_id가 여러 번이면 첫 행)
+    size = 1 << max(1, (2 * n_rows - 1).bit_length())
+    slots = np.full(size, NULL, dtype=np.int32)
+    for row, tmdb_id in enumerate(ints["tmdb_id"]):
+        if tmdb_id == NULL:
+            continue
+        slot = _slot(tmdb_id, size - 1)
+        while slots[slot] != NULL and ints["tmdb_id"][slots[slot]] != tmdb_id:
+            slot = (slot + 1) & (size - 1)
+        if slots[slot] == NULL:
+            slots[slot] = row
+    np.save(os.path.join(tmp, "tmdb_id.slots.npy"), slots)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "rows": n_rows,
+        "strings": len(table),
+        "int_columns": list(INT_COLUMNS),
+        "string_columns": STRING_COLUMNS,
+        "list_columns": LIST_COLUMNS,
+        "sources": {p: _source_stamp(p) for p in (source, tmdb_path, wikidata_path)},
+    }
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    # 다 쓴 뒤에 디렉터리를 교체 (읽는 쪽이 반쯤 쓴 파일을 보지 않도록)
+    old = f"{path}.{suffix}.old"
+    if os.path.exists(path):
+        os.replace(path, old)
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        # 그 사이 다른 프로세스가 같은 원본으로 만든 저장소를 먼저 넣었으면 그것을 사용
+        shutil.rmtree(tmp, ignore_errors=True)
+    shutil.rmtree(old, ignore_errors=True)
+    print(f"--- 카탈로그 저장소 생성: {n_rows}개 작품, 문자열 {len(table)}개 → {path} "
+          f"({(time.perf_counter() - start) * 1000:.0f}ms) ---")
+
+
+def is_stale(path: str = CATALOG_STORE_PATH, source: str = RAG_DATA_PATH) -> bool:
+    """저장소가 없거나, 빌드 뒤에 원본 파일(rag_data.jsonl 등)이 바뀌었으면 True"""
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return True
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("version") != FORMAT_VERSION:
+        return True
+    sources = meta.get("sources", {})
+    if source not in sources:
+        return True
+    # 원본이 없으면 (저장소만 배포한 경우) 그대로 사용
+    return any(stamp is not None and _source_stamp(p) not in (None, stamp) for p, stamp in sources.items())
+
+# %%
+# --- 3. 읽기 ---
+
+class CatalogRecord(Mapping):
+    """카탈로그 한 행. dict처럼 읽을 수 있고, 필드는 처음 읽을 때 디코딩합니다. (값이 없는 스칼라 필드는 키가 없음)"""
+
+    __slots__ = ("_store", "row")
+
+    def __init__(self, store: "CatalogStore", row: int):
+        self._store = store
+        self.row = row
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._store.value(self.row, key)
+        if value is None and key not in LIST_COLUMNS:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key in FIELD_ORDER
+                if key in LIST_COLUMNS or self._store.value(self.row, key) is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"CatalogRecord(row={self.row}, tmdb_id={self.get('tmdb_id')}, title_ko={self.get('title_ko')!r})"
+
+
+class CatalogRecords(Sequence):
+    """전체 행의 지연(lazy) 시퀀스. (catalog.load_records가 반환)"""
+
+    def __init__(self, store: "CatalogStore"):
+        self._store = store
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._store.record(row) for row in range(len(self))[index]]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._store.record(index)
+
+
+class CatalogIndex(Mapping):
+    """tmdb_id → CatalogRecord. (catalog.records_by_tmdb_id가 반환)"""
+
+    def __init__(self, store: "CatalogStore"):
+        self._store = store
+
+    def __getitem__(self, tmdb_id: int) -> CatalogRecord:
+        record = self._store.by_tmdb_id(tmdb_id)
+        if record is None:
+            raise KeyError(tmdb_id)
+        return record
+
+    def __contains__(self, tmdb_id: object) -> bool:
+        return self._store.row_of(tmdb_id) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        ids = self._store.column("tmdb_id")
+        for row in range(len(ids)):
+            # 같은 tmdb_id가 여러 행이면 해시 테이블에 있는 첫 행만
+            if ids[row] != NULL and self._store.row_of(int(ids[row])) == row:
+                yield int(ids[row])
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class CatalogStore:
+    def __init__(self, path: str = CATALOG_STORE_PATH):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self._rows = self.meta["rows"]
+        self._blob = np.memmap(os.path.join(path, "strings.bin"), dtype=np.uint8, mode="r") \
+            if os.path.getsize(os.path.join(path, "strings.bin")) else np.zeros(0, dtype=np.uint8)
+        self._string_offsets = self._load("strings.offsets")
+        self._columns: Dict[str, np.ndarray] = {
+            name: self._load(name) for name in [*self.meta["int_columns"], *self.meta["string_columns"]]
+        }
+        self._lists = {
+            name: (self._load(f"{name}.offsets"), self._load(f"{name}.values"), self._load(f"{name}.rows"))
+            for name in self.meta["list_columns"]
+        }
+        self._slots = self._load("tmdb_id.slots")
+        self.string = lru_cache(maxsize=65536)(self._decode)
+
+    @classmethod
+    def open(cls, path: str = CATALOG_STORE_PATH) -> "CatalogStore":
+        return cls(path)
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return self._rows
+
+    # --- 문자열 표 ---
+    def _decode(self, string_id: int) -> str:
+        start, end = self._string_offsets[string_id], self._string_offsets[string_id + 1]
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+    def string_id(self, value: str) -> Optional[int]:
+        """문자열 → ID (정렬된 표에서 이진 탐색, 없으면 None)"""
+        low, high = 0, len(self._string_offsets) - 1
+        while low < high:
+            mid = (low + high) // 2
+            if self.string(mid) < value:
+                low = mid + 1
+            else:
+                high = mid
+        return low if low < len(self._string_offsets) - 1 and self.string(low) == value else None
+
+    # --- 행 조회 ---
+    def row_of(self, tmdb_id: Any) -> Optional[int]:
+        """tmdb_id → 행 번호 (해시 테이블, O(1))"""
+        try:
+            tmdb_id = int(tmdb_id)
+        except (TypeError, ValueError):
+            return None
+        ids = self._columns["tmdb_id"]
+        mask = len(self._slots) - 1
+        slot = _slot(tmdb_id, mask)
+        while True:
+            row = int(self._slots[slot])
+            if row == NULL:
+                return None
+            if ids[row] == tmdb_id:
+                return row
+            slot = (slot + 1) & mask
+
+    def value(self, row: int, field: str) -> Any:
+        if field in self._lists:
+            offsets, values, _ = self._lists[field]
+            return [self.string(int(i)) for i in values[offsets[row]:offsets[row + 1]]]
+        column = self._columns.get(field)
+        if column is None:
+            return None
+        value = int(column[row])
+        if value == NULL:
+            return None
+        return value if field in INT_COLUMNS else self.string(value)
+
+    def record(self, row: int) -> CatalogRecord:
+        return CatalogRecord(self, row)
+
+    def by_tmdb_id(self, tmdb_id: Any) -> Optional[CatalogRecord]:
+        row = self.row_of(tmdb_id)
+        return None if row is None else CatalogRecord(self, row)
+
+    def records(self) -> CatalogRecords:
+        return CatalogRecords(self)
+
+    def index(self) -> CatalogIndex:
+        return CatalogIndex(self)
+
+    # --- 컬럼 검색 (벡터화) ---
+    def column(self, name: str) -> np.ndarray:
+        """int 컬럼은 값(없으면 -1), 문자열 컬럼은 문자열 ID 배열 (mmap, 복사 없음)"""
+        return self._columns[name]
+
+    def rows_with(self, field: str, value: Any) -> np.ndarray:
+        """field 값이 value인 (리스트 컬럼이면 value를 포함하는) 행 번호 배열"""
+        if field in INT_COLUMNS:
+            return np.flatnonzero(self._columns[field] == int(value))
+        string_id = self.string_id(str(value))
+        if string_id is None:
+            return np.zeros(0, dtype=np.int64)
+        if field in self._lists:
+            _, values, rows = self._lists[field]
+            return np.unique(rows[values == string_id]).astype(np.int64)
+        return np.flatnonzero(self._columns[field] == string_id)
+
+    def distinct(self, field: str) -> List[str]:
+        """리스트 / 문자열 컬럼에 나오는 값 목록 (정렬 순서)"""
+        ids = self._lists[field][1] if field in self._lists else self._columns[field]
+        return [self.string(int(i)) for i in np.unique(ids) if i != NULL]
+
+# %%
+def main():
+    parser = argparse.ArgumentParser(description="rag_data.jsonl → 열 단위 mmap 카탈로그 저장소")
+    parser.add_argument("--input", default=RAG_DATA_PATH)
+    parser.add_argument("--output", default=CATALOG_STORE_PATH)
+    args = parser.parse_args()
+    build_catalog_store(args.input, args.output)
+
+
+if __name__ == "__main__":
+    main()
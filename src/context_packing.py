@@ -0,0 +1,193 @@
+# context_packing.py
+"""
+generate_answer 프롬프트에 넣을 컨텍스트를 토큰 예산 안에서 만듭니다.
+검색된 문서의 rag_text 전체(줄거리, 키워드, 출연진 전체, 추가 요약)를 그대로 넣지 않고
+    - [제목] / [장르] / [줄거리] / [주요 출연진] / [감독] ... 섹션으로 나눈 뒤
+    - 분기(route_query_type)와 QueryDetails(casts / director / info / year / ott)에 필요한 필드만 남기고
+    - 출연진은 앞에서 CONTEXT_MAX_CASTS명, 추천 분기의 줄거리는 CONTEXT_OVERVIEW_CHARS자까지 자른 뒤
+    - CONTEXT_TOKEN_BUDGET을 넘으면 덜 중요한 필드(DROP_ORDER)부터 빼고, 그래도 넘으면 뒤쪽 문서를 뺍니다.
+토큰 수는 tiktoken(CONTEXT_TOKENIZER)으로 세고, 인코딩을 불러올 수 없으면 글자 수로 추정합니다.
+줄어든 토큰 수는 instrumentation에 요청 / 노드별로 기록됩니다. (context_tokens / context_tokens_saved)
+"""
+
+# %%
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from instrumentation import record_context_packing
+from query_analysis import route_query_type
+from state import AgentState
+
+# %%
+# --- 1. 설정 ---
+CONTEXT_PACKING = os.getenv("CONTEXT_PACKING", "1") == "1"           # 0이면 rag_text 전체를 그대로 사용
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "o200k_base")      # gpt-5 / gpt-4o 계열 인코딩
+CONTEXT_MAX_CASTS = int(os.getenv("CONTEXT_MAX_CASTS", "5"))
+CONTEXT_OVERVIEW_CHARS = int(os.getenv("CONTEXT_OVERVIEW_CHARS", "300"))
+
+DOC_SEPARATOR = "\n\n---\n\n"
+SECTION_PATTERN = re.compile(r"^\[([^\]]+)\]\s?(.*)$")
+
+# 분기별로 항상 넣는 필드 (출력 순서)
+ROUTE_FIELDS: Dict[str, List[str]] = {
+    # 특정 작품 질문: 감독 / 출연진 / 줄거리 등 무엇을 물을지 모르므로 추가 요약까지 포함
+    "specific_search": ["제목", "장르", "줄거리", "주요 출연진", "감독", "추가 요약"],
+    # 추천: 작품을 소개할 정도의 정보만
+    "similar_recommendation": ["제목", "장르", "줄거리", "감독"],
+    "broad_recommendation": ["제목", "장르", "줄거리"],
+}
+# QueryDetails에 값이 있으면 추가로 넣는 필드 (year / ott는 rag_text에 없으므로 metadata에서 가져옴)
+DETAIL_FIELDS: Dict[str, str] = {
+    "casts": "주요 출연진",
+    "director": "감독",
+    "info": "키워드",
+    "year": "개봉 연도",
+    "ott": "OTT",
+}
+FIELD_ORDER = ["제목", "개봉 연도", "장르", "OTT", "줄거리", "키워드", "주요 출연진", "감독", "추가 요약"]
+# 예산을 넘을 때 먼저 빼는 필드
+DROP_ORDER = ["추가 요약", "키워드", "주요 출연진", "감독", "OTT", "개봉 연도", "줄거리"]
+# 추천 분기에서 줄거리를 자르는 분기
+TRIM_OVERVIEW_ROUTES = ("similar_recommendation", "broad_recommendation")
+
+# %%
+# --- 2. 토큰 수 ---
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(CONTEXT_TOKENIZER)
+    except Exception as e:
+        # 인코딩 파일은 처음 사용할 때 내려받으므로 네트워크가 없으면 실패할 수 있음
+        print(f"--- tiktoken 인코딩({CONTEXT_TOKENIZER})을 불러오지 못해 글자 수로 토큰 수를 추정합니다: {type(e).__name__} ---")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # 영문 / 숫자는 약 4글자당 1토큰, 한글은 약 1글자당 1토큰
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+# %%
+# --- 3. rag_text 섹션 ---
+
+def parse_sections(text: str) -> Dict[str, str]:
+    """'[라벨] 값' 줄로 시작하는 섹션을 {라벨: 값}으로 나눕니다. (라벨 없는 줄은 앞 섹션에 이어 붙임)"""
+    sections: Dict[str, str] = {}
+    label: Optional[str] = None
+    for line in text.splitlines():
+        match = SECTION_PATTERN.match(line)
+        if match:
+            label = match.group(1).strip()
+            sections[label] = match.group(2).strip()
+        elif label is not None and line.strip():
+            sections[label] += "\n" + line.strip()
+    return sections
+
+
+def _trim_overview(text: str, max_chars: int) -> str:
+    """max_chars 안에서 문장 단위로 자릅니다. (첫 문장이 더 길면 글자 수로 자름)"""
+    if len(text) <= max_chars:
+        return text
+    kept = ""
+    for sentence in re.split(r"(?<=[.!?…])\s+", text):
+        if len(kept) + len(sentence) + 1 > max_chars:
+            break
+        kept = f"{kept} {sentence}" if kept else sentence
+    return (kept or text[:max_chars]) + " …"
+
+
+def _metadata_fields(metadata: Dict[str, Any]) -> Dict[str, str]:
+    fields: Dict[str, str] = {}
+    if metadata.get("year"):
+        fields["개봉 연도"] = str(metadata["year"])
+    otts = [key[len("ott_"):] for key, value in metadata.items() if key.startswith("ott_") and value]
+    if otts:
+        fields["OTT"] = ", ".join(otts)
+    return fields
+
+
+def select_fields(doc: Document, route: str, state: AgentState) -> Dict[str, str]:
+    """분기와 QueryDetails에 필요한 필드만 골라 FIELD_ORDER 순서로 반환합니다."""
+    sections = {**parse_sections(doc.page_content), **_metadata_fields(doc.metadata or {})}
+    wanted = set(ROUTE_FIELDS.get(route, ROUTE_FIELDS["specific_search"]))
+    wanted.update(label for key, label in DETAIL_FIELDS.items() if state.get(key))
+
+    fields: Dict[str, str] = {}
+    for label in FIELD_ORDER:
+        value = sections.get(label)
+        if label not in wanted or not value:
+            continue
+        if label == "주요 출연진":
+            value = ", ".join(value.split(", ")[:CONTEXT_MAX_CASTS])
+        elif label == "줄거리" and route in TRIM_OVERVIEW_ROUTES:
+            value = _trim_overview(value, CONTEXT_OVERVIEW_CHARS)
+        fields[label] = value
+    return fields
+
+
+def render_fields(fields: Dict[str, str]) -> str:
+    return "\n".join(f"[{label}] {value}" for label, value in fields.items())
+
+# %%
+# --- 4. 예산 안에서 패킹 ---
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    original_tokens: int
+    docs: int
+    total_docs: int
+
+
+def _fit(fields: Dict[str, str], budget: int) -> Tuple[str, int]:
+    """예산을 넘으면 DROP_ORDER 순서로 필드를 뺍니다. 제목 / 장르만 남아도 넘으면 ("", 0)"""
+    fields = dict(fields)
+    text = render_fields(fields)
+    tokens = count_tokens(text)
+    for label in DROP_ORDER:
+        if tokens <= budget:
+            break
+        if fields.pop(label, None) is not None:
+            text = render_fields(fields)
+            tokens = count_tokens(text)
+    return (text, tokens) if tokens <= budget else ("", 0)
+
+
+def pack_context(docs: List[Document], state: AgentState, budget: int = CONTEXT_TOKEN_BUDGET) -> PackedContext:
+    """검색 순서(관련도 순)대로 문서를 예산 안에 채웁니다."""
+    original = DOC_SEPARATOR.join(doc.page_content for doc in docs)
+    original_tokens = count_tokens(original)
+    if not CONTEXT_PACKING:
+        return PackedContext(original, original_tokens, original_tokens, len(docs), len(docs))
+
+    route = route_query_type(state)
+    separator_tokens = count_tokens(DOC_SEPARATOR)
+    parts: List[str] = []
+    used = 0
+    for doc in docs:
+        remaining = budget - used - (separator_tokens if parts else 0)
+        text, tokens = _fit(select_fields(doc, route, state), remaining)
+        if not text:
+            break
+        used += tokens + (separator_tokens if parts else 0)
+        parts.append(text)
+
+    packed = PackedContext(DOC_SEPARATOR.join(parts), used, original_tokens, len(parts), len(docs))
+    record_context_packing(packed.original_tokens, packed.tokens)
+    saved = packed.original_tokens - packed.tokens
+    print(f"--- 컨텍스트 패킹 ({route}): {packed.original_tokens} → {packed.tokens} tokens "
+          f"(-{saved / packed.original_tokens if packed.original_tokens else 0:.0%}), "
+          f"문서 {packed.docs}/{packed.total_docs} ---")
+    return packed
@@ -0,0 +1,177 @@
+# embedding_cache.py
+
+# %%
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from instrumentation import record_embedding
+
+# %%
+# --- 1. 설정 ---
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./db/embedding_cache.sqlite")
+EMBEDDING_CACHE_MEMORY_SIZE = int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "4096"))
+
+# %%
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings 객체를 감싸는 content-hash 기반 임베딩 캐시.
+    - 1차: 크기가 제한된 메모리 LRU
+    - 2차: SQLite에 float32 BLOB으로 저장 (프로세스를 재시작해도 유지)
+    query 시점(embed_query)과 ingest 시점(embed_documents)이 같은 캐시를 공유하므로
+    내용이 바뀌지 않은 rag_text는 다시 인덱싱해도 API를 호출하지 않습니다.
+    """
+
+    def __init__(self, underlying: Embeddings, path: str = EMBEDDING_CACHE_PATH,
+                 memory_size: int = EMBEDDING_CACHE_MEMORY_SIZE, namespace: Optional[str] = None):
+        self.underlying = underlying
+        self.memory_size = memory_size
+        # 모델/차원이 바뀌면 다른 벡터가 나오므로 키에 포함
+        self.namespace = namespace or "{}:{}".format(
+            getattr(underlying, 'model', type(underlying).__name__),
+            getattr(underlying, 'dimensions', None) or "",
+        )
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                " key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+            )
+
+    # --- 내부 유틸 ---
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """메모리 → SQLite 순서로 찾아서 발견된 벡터만 반환합니다."""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                else:
+                    missing.append(key)
+
+            # SQLite 변수 개수 제한을 피하기 위해 나눠서 조회
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self._remember(key, vector)
+                    found[key] = vector
+        return found
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        with self._lock, self._conn:
+            rows = []
+            for key, values in items.items():
+                vector = np.asarray(values, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, vector.shape[0], vector.tobytes()))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, dim, vector) VALUES (?, ?, ?)", rows
+            )
+
+    def _split(self, texts: List[str]):
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        # 같은 배치 안의 중복 텍스트는 한 번만 요청
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        self._count(hits=len(texts) - sum(1 for key in keys if key not in found), misses=len(missing))
+        return keys, found, missing
+
+    def _count(self, hits: int = 0, misses: int = 0) -> None:
+        # 여러 스레드 / 코루틴에서 호출되므로 두 카운터를 락 안에서 함께 갱신
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    # --- Embeddings 인터페이스 ---
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._split(texts)
+        if missing:
+            start = time.perf_counter()
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            record_embedding(len(texts), len(texts) - len(missing), time.perf_counter() - start)
+            new_items = dict(zip(missing.keys(), vectors))
+            self._store(new_items)
+            found.update({key: np.asarray(v, dtype=np.float32) for key, v in new_items.items()})
+        else:
+            record_embedding(len(texts), len(texts), None)
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        found = self._lookup([key])
+        if key in found:
+            self._count(hits=1)
+            record_embedding(1, 1, None)
+            return found[key].tolist()
+        self._count(misses=1)
+        start = time.perf_counter()
+        vector = self.underlying.embed_query(text)
+        record_embedding(1, 0, time.perf_counter() - start)
+        self._store({key: vector})
+        return list(vector)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._split(texts)
+        if missing:
+            start = time.perf_counter()
+            vectors = await self.underlying.aembed_documents(list(missing.values()))
+            record_embedding(len(texts), len(texts) - len(missing), time.perf_counter() - start)
+            new_items = dict(zip(missing.keys(), vectors))
+            self._store(new_items)
+            found.update({key: np.asarray(v, dtype=np.float32) for key, v in new_items.items()})
+        else:
+            record_embedding(len(texts), len(texts), None)
+        return [found[key].tolist() for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        found = self._lookup([key])
+        if key in found:
+            self._count(hits=1)
+            record_embedding(1, 1, None)
+            return found[key].tolist()
+        self._count(misses=1)
+        start = time.perf_counter()
+        vector = await self.underlying.aembed_query(text)
+        record_embedding(1, 0, time.perf_counter() - start)
+        self._store({key: vector})
+        return list(vector)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
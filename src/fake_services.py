@@ -0,0 +1,190 @@
+# fake_services.py
+"""
+API 호출 없이 그래프를 실행하기 위한 가짜 LLM / 임베딩과 로컬 벡터 스토어. (SERVICE_BACKEND=fake)
+    - FakeChatModel    : 지연(FAKE_LLM_LATENCY)만 흉내 내는 결정적(deterministic) 채팅 모델
+                         구조화 출력(with_structured_output)은 fast_query_analysis의 규칙 기반 분석 결과를 반환
+    - HashingEmbeddings: 글자 bigram feature hashing 임베딩 (같은 텍스트 → 같은 벡터, 글자가 겹치는 텍스트끼리 유사)
+    - build_local_vector_store: output/rag_data.jsonl로 만든 NumpyVectorStore (Chroma / OpenAI 불필요)
+
+benchmark_suite.py가 이 백엔드로 그래프 전체의 지연 / 처리량 회귀를 확인합니다.
+"""
+
+# %%
+import asyncio
+import hashlib
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from catalog import RAG_DATA_PATH
+from fast_query_analysis import analyze_query_locally
+from ingest import iter_documents
+from numpy_vector_store import NumpyVectorStore
+from sparse_index import tokenize
+
+# %%
+# --- 1. 설정 ---
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))             # 응답 하나당 (초)
+FAKE_EMBEDDING_LATENCY = float(os.getenv("FAKE_EMBEDDING_LATENCY", "0.1"))  # 임베딩 요청 하나당 (초)
+FAKE_EMBEDDING_DIM = int(os.getenv("FAKE_EMBEDDING_DIM", "256"))
+# 스트리밍 응답을 나누는 청크 수
+FAKE_STREAM_CHUNKS = 8
+
+# 쿼리 분석 프롬프트(query_analysis.py)에서 사용자 쿼리 부분
+USER_QUERY_PATTERN = re.compile(r"\*\*사용자 쿼리:\*\*\s*(.+?)\s*\n---", re.S)
+
+# %%
+# --- 2. 가짜 LLM ---
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(m.content if isinstance(m.content, str) else str(m.content) for m in messages)
+
+
+def _usage(prompt: str, completion: str) -> dict:
+    # 대략적인 토큰 수 (글자 4개 ≈ 1토큰), instrumentation의 토큰 / 비용 집계 확인용
+    input_tokens, output_tokens = len(prompt) // 4 + 1, len(completion) // 4 + 1
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    latency초 뒤에 마지막 메시지의 끝부분(최대 200자, 프롬프트 뒤쪽의 쿼리 / state 정보)을 그대로 돌려주는 채팅 모델.
+    응답이 입력에 따라 결정되므로 같은 쿼리는 항상 같은 검색 결과 / 답변을 만듭니다.
+    """
+
+    latency: float = FAKE_LLM_LATENCY
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        last = messages[-1].content if messages else ""
+        last = last if isinstance(last, str) else str(last)
+        return "fake 응답: " + " ".join(last.split())[-200:]
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        content = self._respond(messages)
+        message = AIMessage(content=content, usage_metadata=_usage(_prompt_text(messages), content))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[ChatGenerationChunk]:
+        content = self._respond(messages)
+        size = max(1, len(content) // FAKE_STREAM_CHUNKS + 1)
+        chunks = [ChatGenerationChunk(message=AIMessageChunk(content=content[i:i + size]))
+                  for i in range(0, len(content), size)]
+        # OpenAI stream_usage처럼 마지막 청크에 토큰 사용량
+        chunks.append(ChatGenerationChunk(message=AIMessageChunk(
+            content="", usage_metadata=_usage(_prompt_text(messages), content))))
+        return chunks
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        chunks = self._chunks(messages)
+        for chunk in chunks:
+            time.sleep(self.latency / len(chunks))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        chunks = self._chunks(messages)
+        for chunk in chunks:
+            await asyncio.sleep(self.latency / len(chunks))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, **kwargs):
+        """
+        LLM 호출(지연 / 콜백)은 그대로 거친 뒤, 프롬프트의 사용자 쿼리를 규칙 기반으로 분석해 schema 객체를 반환합니다.
+        (QueryDetailsWithRagQuery이면 rag_query에 원본 쿼리를 넣음)
+        """
+        def build(prompt_value) -> Any:
+            text = prompt_value.to_string() if hasattr(prompt_value, "to_string") else str(prompt_value)
+            match = USER_QUERY_PATTERN.search(text)
+            query = match.group(1) if match else text
+            details, _ = analyze_query_locally(query)
+            data = details.model_dump()
+            if "rag_query" in schema.model_fields:
+                data["rag_query"] = query
+            return schema(**data)
+
+        def parse(prompt_value):
+            self.invoke(prompt_value)
+            return build(prompt_value)
+
+        async def aparse(prompt_value):
+            await self.ainvoke(prompt_value)
+            return build(prompt_value)
+
+        return RunnableLambda(parse, afunc=aparse, name="FakeStructuredOutput")
+
+# %%
+# --- 3. 해시 임베딩 ---
+
+class HashingEmbeddings(Embeddings):
+    """
+    sparse_index.tokenize의 글자 bigram을 sha1으로 dim 차원에 signed feature hashing한 뒤 L2 정규화합니다.
+    프로세스 / 실행과 관계없이 같은 텍스트는 같은 벡터가 됩니다. (Python hash()는 실행마다 달라서 사용하지 않음)
+    """
+
+    def __init__(self, dim: int = FAKE_EMBEDDING_DIM, latency: float = FAKE_EMBEDDING_LATENCY):
+        self.dim = dim
+        self.latency = latency
+        self.model = "fake-hashing"
+        self.dimensions = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            digest = hashlib.sha1(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dim
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self._embed(text)
+
+# %%
+# --- 4. 로컬 벡터 스토어 ---
+
+def build_local_vector_store(embedding: Embeddings, path: str = RAG_DATA_PATH) -> NumpyVectorStore:
+    """rag_data.jsonl을 ingest.py와 같은 문서 ID / metadata로 읽어 NumpyVectorStore를 만듭니다."""
+    ids, texts, metadatas = [], [], []
+    for doc_id, text, metadata in iter_documents(path):
+        ids.append(doc_id)
+        texts.append(text)
+        metadatas.append(metadata)
+    vectors = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+    print(f"--- 로컬 벡터 스토어 생성: {len(ids)}개 문서 ---")
+    return NumpyVectorStore(embedding, ids, texts, metadatas, vectors)
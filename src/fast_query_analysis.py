@@ -0,0 +1,283 @@
+# fast_query_analysis.py
+
+# %%
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from schemas import AllowedGenres, AllowedOTTs, QueryDetails
+from catalog import load_records
+
+# %%
+# --- 1. 설정 ---
+# 규칙 기반 분석 결과의 confidence가 이 값 이상일 때만 LLM 호출을 건너뜁니다.
+FAST_PATH_THRESHOLD = float(os.getenv("FAST_QUERY_ANALYSIS_THRESHOLD", "0.8"))
+
+# --- 2. 한국어 별칭 사전 ---
+GENRE_ALIASES: Dict[str, AllowedGenres] = {
+    "공상과학": AllowedGenres.SF,
+    "에스에프": AllowedGenres.SF,
+    "sf": AllowedGenres.SF,
+    "sci-fi": AllowedGenres.SF,
+    "액션": AllowedGenres.액션,
+    "어드벤처": AllowedGenres.모험,
+    "모험": AllowedGenres.모험,
+    "호러": AllowedGenres.공포,
+    "공포": AllowedGenres.공포,
+    "로맨스": AllowedGenres.로맨스,
+    "멜로": AllowedGenres.로맨스,
+    "코미디": AllowedGenres.코미디,
+    "코믹": AllowedGenres.코미디,
+    "스릴러": AllowedGenres.스릴러,
+    "범죄": AllowedGenres.범죄,
+    "느와르": AllowedGenres.범죄,
+    "미스터리": AllowedGenres.미스터리,
+    "추리": AllowedGenres.미스터리,
+    "판타지": AllowedGenres.판타지,
+    "애니메이션": AllowedGenres.애니메이션,
+    "애니": AllowedGenres.애니메이션,
+    "다큐멘터리": AllowedGenres.다큐멘터리,
+    "다큐": AllowedGenres.다큐멘터리,
+    "가족": AllowedGenres.가족,
+    "역사": AllowedGenres.역사,
+    "사극": AllowedGenres.역사,
+    "전쟁": AllowedGenres.전쟁,
+    "음악": AllowedGenres.음악,
+    "뮤지컬": AllowedGenres.음악,
+    "드라마": AllowedGenres.드라마,
+    "리얼리티": AllowedGenres.REALITY,
+}
+
+OTT_ALIASES: Dict[str, AllowedOTTs] = {
+    "넷플릭스": AllowedOTTs.NETFLIX,
+    "넷플": AllowedOTTs.NETFLIX,
+    "디즈니플러스": AllowedOTTs.DISNEY_PLUS,
+    "디즈니+": AllowedOTTs.DISNEY_PLUS,
+    "디즈니": AllowedOTTs.DISNEY_PLUS,
+    "디플": AllowedOTTs.DISNEY_PLUS,
+    "티빙": AllowedOTTs.TVING,
+    "왓챠": AllowedOTTs.WATCHA,
+    "웨이브": AllowedOTTs.WAVVE,
+    "필름박스": AllowedOTTs.FILMBOX_PLUS,
+}
+
+# Enum 값 자체도 그대로 인식 (예: "Netflix", "SF")
+for _genre in AllowedGenres:
+    GENRE_ALIASES.setdefault(_genre.value.lower(), _genre)
+for _ott in AllowedOTTs:
+    OTT_ALIASES.setdefault(_ott.value.lower(), _ott)
+
+# --- 3. 의도(status) 판단용 단서 ---
+RECOMMEND_CUES = ("추천", "비슷한", "유사한", "비슷한 거", "볼만한", "볼 만한", "뭐 볼까", "골라줘")
+SEARCH_CUES = ("알려줘", "대해", "정보", "줄거리", "누구", "언제", "몇 년", "무슨 내용", "어떤 내용", "찾아줘", "검색")
+
+# 연도 범위 표현은 QueryDetails(year: int)로 표현할 수 없으므로 LLM에 넘깁니다.
+YEAR_RANGE_CUES = ("이후", "이전", "부터", "까지", "년대", "최근")
+
+YEAR_PATTERN = re.compile(r"((?:19|20)\d{2})\s*년?")
+QUOTED_PATTERN = re.compile(r"['\"‘’“”「」『』<>《》]\s*([^'\"‘’“”「」『』<>《》]+?)\s*['\"‘’“”「」『』<>《》]")
+
+# 남은 토큰이 이 목록에 있으면 '정보가 없는 단어'로 보고 무시합니다.
+FILLER_WORDS = {
+    "영화", "드라마", "작품", "시리즈", "장르", "추천", "추천해줘", "추천해", "추천좀", "알려줘", "알려", "줘", "해줘",
+    "대해", "대해서", "좀", "거", "것", "뭐", "뭐가", "있어", "있나", "있는", "나오는", "나온", "출연한", "출연하는",
+    "찾아줘", "보여줘", "비슷한", "유사한", "볼만한", "볼", "만한", "같은", "싶어", "보고", "정보", "줄거리",
+    "감독", "감독이", "감독의", "감독한", "배우", "주연", "에서", "볼수", "수", "있는거", "하는", "로", "으로",
+    "정도", "중에", "중", "그", "이", "한", "어떤", "내용", "뭐야", "무슨", "누구", "언제", "개봉", "작", "편",
+}
+
+PARTICLE_SUFFIXES = ("이랑", "에서", "으로", "하고", "에게", "이나", "랑", "과", "와", "이", "가", "은", "는", "을", "를", "에", "의", "도", "로", "만")
+
+TOKEN_SPLIT_PATTERN = re.compile(r"[\s,.!?~·/()\[\]'\"‘’“”「」『』<>《》]+")
+
+# %%
+# --- 4. 카탈로그 사전 (rag_data.jsonl 기반) ---
+
+@lru_cache(maxsize=1)
+def _load_vocabulary() -> Tuple[Dict[str, str], Dict[str, str], Dict[str, str]]:
+    """
+    rag_data.jsonl에서 제목, 출연진, 감독 사전을 만듭니다.
+    key는 소문자로 정규화한 표기, value는 원래 표기입니다.
+    """
+    titles: Dict[str, str] = {}
+    casts: Dict[str, str] = {}
+    directors: Dict[str, str] = {}
+
+    for record in load_records():
+        for key in ('title_ko', 'title_en'):
+            title = record.get(key)
+            if isinstance(title, str) and title:
+                titles.setdefault(title.lower(), record.get('title_ko') or title)
+        for name in record.get('cast') or []:
+            if isinstance(name, str) and name:
+                casts.setdefault(name.lower(), name)
+        for name in record.get('directors') or []:
+            if isinstance(name, str) and name:
+                directors.setdefault(name.lower(), name)
+
+    return titles, casts, directors
+
+
+def _find_spans(text: str, vocab: Dict[str, str], min_len: int,
+                taken: List[Tuple[int, int]]) -> List[Tuple[int, int, str]]:
+    """
+    text 안에서 vocab에 있는 표현을 가장 긴 것부터(왼쪽→오른쪽) 겹치지 않게 찾습니다.
+    이미 다른 필드로 인식된 구간(taken)과 겹치는 매칭은 제외합니다.
+    """
+    if not vocab:
+        return []
+    max_len = max(len(k) for k in vocab)
+    spans: List[Tuple[int, int, str]] = []
+    i = 0
+    while i < len(text):
+        matched = False
+        for length in range(min(max_len, len(text) - i), min_len - 1, -1):
+            end = i + length
+            piece = text[i:end]
+            if piece in vocab and not any(s < end and i < e for s, e in taken):
+                spans.append((i, end, vocab[piece]))
+                taken.append((i, end))
+                i = end
+                matched = True
+                break
+        if not matched:
+            i += 1
+    return spans
+
+
+def _residual_tokens(text: str, taken: List[Tuple[int, int]]) -> List[str]:
+    """인식된 구간을 지운 뒤 남은, 의미가 있어 보이는 토큰 목록을 반환합니다."""
+    chars = list(text)
+    for start, end in taken:
+        for idx in range(start, end):
+            chars[idx] = " "
+
+    residual = []
+    for token in TOKEN_SPLIT_PATTERN.split("".join(chars)):
+        if not token or token.isdigit():
+            continue
+        for suffix in PARTICLE_SUFFIXES:
+            if token.endswith(suffix) and token[:-len(suffix)] in FILLER_WORDS:
+                token = token[:-len(suffix)]
+                break
+        if token in FILLER_WORDS or token in PARTICLE_SUFFIXES:
+            continue
+        if any(token.startswith(cue) for cue in ("추천", "알려", "찾아", "보여")):
+            continue
+        residual.append(token)
+    return residual
+
+# %%
+# --- 5. 규칙 기반 분석기 ---
+
+def analyze_query_locally(query: str) -> Tuple[QueryDetails, float]:
+    """
+    LLM 없이 쿼리에서 QueryDetails를 추출합니다.
+    Returns:
+        (QueryDetails, confidence): confidence가 FAST_PATH_THRESHOLD 이상이면 LLM 결과 대신 사용할 수 있습니다.
+    """
+    text = query.lower()
+    taken: List[Tuple[int, int]] = []
+    confidence = 1.0
+
+    # 1) 따옴표로 감싼 제목
+    title: Optional[str] = None
+    titles, casts_vocab, directors_vocab = _load_vocabulary()
+    quoted = QUOTED_PATTERN.search(text)
+    if quoted:
+        quoted_text = quoted.group(1).strip()
+        title = titles.get(quoted_text, query[quoted.start(1):quoted.end(1)].strip())
+        taken.append((quoted.start(), quoted.end()))
+
+    # 2) 연도
+    year: Optional[int] = None
+    year_match = YEAR_PATTERN.search(text)
+    if year_match and not any(s < year_match.end() and year_match.start() < e for s, e in taken):
+        year = int(year_match.group(1))
+        taken.append((year_match.start(), year_match.end()))
+        if any(cue in text for cue in YEAR_RANGE_CUES):
+            confidence *= 0.3
+
+    # 3) OTT / 장르 별칭
+    ott = list(dict.fromkeys(AllowedOTTs(v) for _, _, v in _find_spans(text, {k: v.value for k, v in OTT_ALIASES.items()}, 2, taken)))
+    genre = list(dict.fromkeys(AllowedGenres(v) for _, _, v in _find_spans(text, {k: v.value for k, v in GENRE_ALIASES.items()}, 2, taken)))
+
+    # 4) 인물 (감독 / 출연진)
+    people_vocab = {**casts_vocab, **directors_vocab}
+    casts: List[str] = []
+    directors: List[str] = []
+    for start, end, name in _find_spans(text, people_vocab, 2, taken):
+        following = text[end:end + 4]
+        is_director = name.lower() in directors_vocab and (
+            "감독" in following or name.lower() not in casts_vocab
+        )
+        (directors if is_director else casts).append(name)
+        if end - start <= 2:
+            # 두 글자 이름(예: '공유')은 일반 단어와 겹칠 수 있으므로 확신도를 낮춤
+            confidence *= 0.7
+
+    # 5) 따옴표 없는 제목 (세 글자 이상만 허용)
+    if title is None:
+        title_spans = _find_spans(text, titles, 3, taken)
+        if len(title_spans) == 1:
+            title = title_spans[0][2]
+        elif len(title_spans) > 1:
+            confidence *= 0.3
+
+    # 6) 의도 판단
+    is_recommend = any(cue in text for cue in RECOMMEND_CUES)
+    is_search = any(cue in text for cue in SEARCH_CUES)
+    if is_recommend:
+        status = 'recommend'
+    elif is_search:
+        status = 'search'
+    else:
+        status = 'search' if title else 'recommend'
+        confidence *= 0.4
+
+    # 7) 설명되지 않은 단어가 남아 있으면 (줄거리 키워드 등) LLM이 'info'를 채워야 함
+    residual = _residual_tokens(text, taken)
+    if residual:
+        confidence *= 0.5 ** len(residual)
+
+    details = QueryDetails(
+        status=status,
+        title=title,
+        year=year,
+        casts=casts or None,
+        director=directors or None,
+        genre=genre or None,
+        ott=ott or None,
+    )
+    return details, confidence
+
+# %%
+# --- 6. Fast-path 적중률 카운터 ---
+
+class FastPathStats:
+    """규칙 기반 분석기로 LLM 호출을 건너뛴 비율을 기록합니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+
+fast_path_stats = FastPathStats()
@@ -0,0 +1,283 @@
+# http_cache.py
+"""
+데이터 수집 단계(Wikidata SPARQL / TMDB / Wikipedia 요약)가 공유하는 디스크 HTTP 응답 캐시.
+프롬프트나 rag_text 구성만 바꿨을 때 파이프라인을 다시 돌려도 같은 데이터를 다시 받지 않도록 합니다.
+
+    - 응답 본문은 내용의 sha256을 이름으로 하는 파일에 저장 (content-addressed, 같은 본문은 한 번만 저장)
+    - 요청 키(method + URL + 정렬된 params + 본문, api_key 제외) → 본문 해시 / 상태 코드 / ETag / Last-Modified / 받은 시각은 SQLite
+    - 소스별 TTL 안이면 네트워크 없이 캐시 응답, 지나면 If-None-Match / If-Modified-Since로 재검증 (304면 저장된 본문 재사용)
+    - 200과 404만 저장 (429 / 5xx / 네트워크 오류는 호출하는 쪽에서 재시도)
+
+HTTP_CACHE_MODE
+    default  TTL 안이면 캐시, 지나면 재검증
+    refresh  TTL과 관계없이 항상 재검증
+    offline  네트워크를 쓰지 않고 저장된 응답만 재생 (TTL 무시, 없으면 OfflineCacheMiss)
+    off      캐시를 읽지도 쓰지도 않음
+
+실행 방법:
+    python http_cache.py        # 소스별 저장된 응답 수 / 본문 크기
+"""
+
+# %%
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlencode
+
+import requests
+
+# %%
+# --- 1. 설정 ---
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "./db/http_cache")
+HTTP_CACHE_MODE = os.getenv("HTTP_CACHE_MODE", "default")      # default / refresh / offline / off
+HTTP_CACHE_TIMEOUT = float(os.getenv("HTTP_CACHE_TIMEOUT", "10"))
+
+# 소스별 TTL (초). 카탈로그(SPARQL)와 위키 요약은 거의 바뀌지 않고, TMDB는 OTT 정보가 자주 바뀜
+SOURCE_TTLS = {
+    "wikidata": float(os.getenv("HTTP_CACHE_TTL_WIKIDATA", str(7 * 86400))),
+    "tmdb": float(os.getenv("HTTP_CACHE_TTL_TMDB", str(86400))),
+    "wikipedia": float(os.getenv("HTTP_CACHE_TTL_WIKIPEDIA", str(30 * 86400))),
+}
+DEFAULT_TTL = 86400.0
+
+MODES = ("default", "refresh", "offline", "off")
+CACHEABLE_STATUS = {200, 404}
+SECRET_PARAMS = {"api_key"}                          # 키와 디스크에 남기지 않는 파라미터
+VARY_HEADERS = ("Accept", "Accept-Language")         # 응답 형식이 바뀌는 요청 헤더는 키에 포함
+
+
+class OfflineCacheMiss(Exception):
+    """offline 모드에서 저장된 응답이 없는 요청"""
+
+# %%
+# --- 2. 응답 ---
+
+@dataclass
+class CachedResponse:
+    """requests.Response 대신 돌려주는 응답 (캐시 / 네트워크 공통)"""
+    status_code: int
+    content: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    from_cache: bool = False        # 본문을 캐시에서 읽음 (TTL 안 / offline / 304 재검증)
+    revalidated: bool = False       # 304로 재검증됨
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    @classmethod
+    def from_response(cls, response: requests.Response) -> "CachedResponse":
+        return cls(response.status_code, response.content, _cache_headers(response.headers))
+
+
+def _cache_headers(headers) -> Dict[str, str]:
+    return {name: headers[name] for name in ("ETag", "Last-Modified", "Content-Type") if headers.get(name)}
+
+# %%
+# --- 3. 캐시 ---
+
+class HttpCache:
+    """
+    요청 키 → 저장된 응답. fetch(source, url, ..., send)로 사용합니다.
+    send(headers)는 실제 요청을 보내는 함수로, 호출하는 쪽의 세션 / 요청 수 제한 / 재시도를 그대로 씁니다.
+    (TTL 안의 캐시 응답은 send를 호출하지 않으므로 요청 수 제한 토큰도 쓰지 않음)
+    """
+
+    def __init__(self, path: str = HTTP_CACHE_DIR, mode: str = HTTP_CACHE_MODE,
+                 ttls: Optional[Dict[str, float]] = None):
+        if mode not in MODES:
+            raise ValueError(f"HTTP_CACHE_MODE는 {MODES} 중 하나여야 합니다: {mode}")
+        self.path = path
+        self.mode = mode
+        self.ttls = {**SOURCE_TTLS, **(ttls or {})}
+        self.objects_dir = os.path.join(path, "objects")
+        self.counters = {"hits": 0, "revalidated": 0, "fetched": 0, "uncached": 0}
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, source TEXT NOT NULL, url TEXT NOT NULL, status INTEGER NOT NULL,"
+                " body_hash TEXT NOT NULL, etag TEXT, last_modified TEXT, content_type TEXT,"
+                " fetched_at REAL NOT NULL)"
+            )
+
+    # --- 키 / 본문 저장 ---
+    @staticmethod
+    def key(method: str, url: str, params: Optional[Dict[str, Any]] = None,
+            headers: Optional[Dict[str, str]] = None, data: Optional[Any] = None) -> str:
+        query = urlencode(sorted((k, str(v)) for k, v in (params or {}).items()
+                                 if k not in SECRET_PARAMS and v is not None))
+        vary = "&".join(f"{name}={(headers or {}).get(name, '')}" for name in VARY_HEADERS)
+        if isinstance(data, dict):
+            data = urlencode(sorted(data.items()))
+        body = data if isinstance(data, bytes) else (data or "").encode("utf-8")
+        raw = f"{method.upper()}\0{url}\0{query}\0{vary}\0".encode("utf-8")
+        return hashlib.sha256(raw + body).hexdigest()
+
+    def _object_path(self, body_hash: str) -> str:
+        return os.path.join(self.objects_dir, body_hash[:2], body_hash)
+
+    def _write_body(self, content: bytes) -> str:
+        body_hash = hashlib.sha256(content).hexdigest()
+        path = self._object_path(body_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 같은 본문을 여러 스레드가 동시에 쓸 수 있으므로 임시 파일에 쓴 뒤 교체
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(zlib.compress(content))
+            os.replace(tmp_path, path)
+        return body_hash
+
+    def _read_body(self, body_hash: str) -> Optional[bytes]:
+        try:
+            with open(self._object_path(body_hash), "rb") as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+    # --- 색인 ---
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, body_hash, etag, last_modified, content_type, fetched_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        entry = dict(zip(("status", "body_hash", "etag", "last_modified", "content_type", "fetched_at"), row))
+        entry["content"] = self._read_body(entry["body_hash"])
+        # 본문 파일이 지워졌으면 없는 것으로 취급
+        return entry if entry["content"] is not None else None
+
+    def _store(self, key: str, source: str, url: str, response: CachedResponse) -> None:
+        body_hash = self._write_body(response.content)
+        headers = response.headers
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, source, url, response.status_code, body_hash, headers.get("ETag"),
+                 headers.get("Last-Modified"), headers.get("Content-Type"), time.time()),
+            )
+
+    def _touch(self, key: str, headers: Dict[str, str]) -> None:
+        """304: 본문은 그대로 두고 받은 시각(과 새 검증자)만 갱신"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ?, etag = COALESCE(?, etag),"
+                " last_modified = COALESCE(?, last_modified) WHERE key = ?",
+                (time.time(), headers.get("ETag"), headers.get("Last-Modified"), key),
+            )
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    # --- 요청 ---
+    def _default_send(self, method: str, url: str, params, data) -> Callable[[Dict[str, str]], requests.Response]:
+        if self._session is None:
+            self._session = requests.Session()
+
+        def send(headers: Dict[str, str]) -> requests.Response:
+            return self._session.request(method, url, params=params, data=data, headers=headers,
+                                         timeout=HTTP_CACHE_TIMEOUT)
+        return send
+
+    def fetch(self, source: str, url: str, params: Optional[Dict[str, Any]] = None,
+              headers: Optional[Dict[str, str]] = None, method: str = "GET", data: Optional[Any] = None,
+              send: Optional[Callable[[Dict[str, str]], requests.Response]] = None) -> CachedResponse:
+        """
+        source별 TTL로 캐시를 확인하고, 필요할 때만 send(요청 헤더)로 네트워크 요청을 보냅니다.
+        send가 없으면 requests.Session으로 바로 요청합니다. (재시도 없음)
+        """
+        headers = dict(headers or {})
+        send = send or self._default_send(method, url, params, data)
+        if self.mode == "off":
+            return CachedResponse.from_response(send(headers))
+
+        key = self.key(method, url, params, headers, data)
+        entry = self._lookup(key)
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+            if self.mode == "offline" or (self.mode == "default" and age < self.ttls.get(source, DEFAULT_TTL)):
+                self._count("hits")
+                return self._cached(entry, revalidated=False)
+        elif self.mode == "offline":
+            raise OfflineCacheMiss(f"저장된 응답 없음 ({source}): {url} {params or ''}")
+
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = send(headers)
+        if response.status_code == 304 and entry is not None:
+            self._touch(key, response.headers)
+            self._count("revalidated")
+            return self._cached(entry, revalidated=True)
+
+        result = CachedResponse.from_response(response)
+        if result.status_code in CACHEABLE_STATUS:
+            self._store(key, source, url, result)
+            self._count("fetched")
+        else:
+            self._count("uncached")
+        return result
+
+    @staticmethod
+    def _cached(entry: Dict[str, Any], revalidated: bool) -> CachedResponse:
+        headers = {name: entry[column] for name, column in
+                   (("ETag", "etag"), ("Last-Modified", "last_modified"), ("Content-Type", "content_type"))
+                   if entry[column]}
+        return CachedResponse(entry["status"], entry["content"], headers, from_cache=True, revalidated=revalidated)
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """소스별 저장된 응답 수 / 404 수"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source, COUNT(*), SUM(status = 404) FROM responses GROUP BY source"
+            ).fetchall()
+        return {source: {"responses": count, "not_found": not_found or 0} for source, count, not_found in rows}
+
+
+@lru_cache(maxsize=None)
+def get_http_cache(path: str = HTTP_CACHE_DIR, mode: str = HTTP_CACHE_MODE) -> HttpCache:
+    """프로세스 안에서 (경로, 모드)별로 하나의 캐시를 공유합니다."""
+    return HttpCache(path, mode)
+
+# %%
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="데이터 수집 HTTP 응답 캐시 요약")
+    parser.add_argument("--path", default=HTTP_CACHE_DIR)
+    args = parser.parse_args()
+
+    cache = HttpCache(args.path, mode="offline")
+    object_bytes = sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(cache.objects_dir) for name in names
+    )
+    print(f"--- HTTP 응답 캐시: {args.path} (본문 {object_bytes / 1e6:.1f}MB, 압축 후) ---")
+    for source, stats in sorted(cache.summary().items()):
+        print(f"{source:10s} 응답 {stats['responses']:6d}개 (404 {stats['not_found']}개), "
+              f"TTL {cache.ttls.get(source, DEFAULT_TTL) / 3600:.0f}시간")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+# ingest.py
+"""
+output/rag_data.jsonl을 Chroma 컬렉션(movie_rag_collection)에 증분 반영합니다.
+(data_structuring.ipynb의 전체 재인덱싱을 대체)
+
+    - 문서 ID = tmdb_id (다시 실행해도 중복 문서가 생기지 않음)
+    - metadata의 content_hash(rag_text + metadata의 sha256)를 비교해서 새 문서 / 바뀐 문서만 임베딩 후 upsert
+    - 카탈로그에서 사라진 문서는 삭제
+    - 임베딩은 글자 수 기준으로 나눈 배치를 병렬로 요청
+    - rag_text가 그대로인 문서(metadata만 변경, 예전 UUID ID 문서)는 저장된 임베딩을 재사용
+    - rag_data.jsonl은 한 줄씩 읽어서 INGEST_BATCH_SIZE개씩 처리 (카탈로그 크기와 무관하게 메모리 일정)
+
+실행 방법:
+    python ingest.py             # 변경분 반영
+    python ingest.py --dry-run   # 변경 내역만 출력
+"""
+
+# %%
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from catalog import RAG_DATA_PATH, iter_records, record_to_document
+
+# %%
+# --- 1. 설정 ---
+# 임베딩 요청 한 번에 넣는 최대 글자 수 / 문서 수 (text-embedding-3-large 요청당 토큰 제한보다 충분히 작게)
+EMBED_BATCH_CHARS = int(os.getenv("EMBED_BATCH_CHARS", "60000"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+# Chroma upsert / delete 한 번에 보내는 문서 수
+WRITE_BATCH_SIZE = 500
+# rag_data.jsonl에서 한 번에 메모리에 올려서 처리하는 문서 수
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+
+INDEX_VERSION_PATH = os.getenv("INDEX_VERSION_PATH", "./db/index_version.json")
+# 스냅샷이 아닌 스토어(Chroma)를 쓸 때 컬렉션에서 파생된 캐시 / 색인이 index_version 파일을 다시 읽는 간격 (초)
+INDEX_VERSION_CHECK = float(os.getenv("INDEX_VERSION_CHECK", "5"))
+
+# %%
+# --- 2. 문서 / 해시 ---
+
+def content_hash(text: str, metadata: Dict[str, Any]) -> str:
+    """rag_text와 metadata(content_hash 제외)가 같으면 같은 값."""
+    payload = {k: v for k, v in metadata.items() if k != 'content_hash'}
+    raw = text + "\0" + json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def iter_documents(path: str = RAG_DATA_PATH) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """
+    rag_data.jsonl을 한 줄씩 읽어서 (문서 ID(tmdb_id), rag_text, metadata)를 하나씩 돌려줍니다.
+    metadata는 record_to_document와 같은 구성(장르 / OTT는 값이 있는 컬럼만)이고 content_hash가 포함됩니다.
+    """
+    for record in iter_records(path):
+        if record.get('tmdb_id') is None or not record.get('rag_text'):
+            continue
+        doc = record_to_document(record)
+        # Chroma metadata에는 None을 넣을 수 없음
+        metadata = {k: v for k, v in doc.metadata.items() if v is not None}
+        metadata['content_hash'] = content_hash(doc.page_content, metadata)
+        yield str(record['tmdb_id']), doc.page_content, metadata
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    """items를 size개씩 묶어서 돌려줍니다."""
+    batch: List = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# %%
+# --- 3. 컬렉션 상태 ---
+
+def load_collection_state(collection, page_size: int = WRITE_BATCH_SIZE) -> Tuple[Dict[str, Optional[str]], Dict[str, str]]:
+    """
+    컬렉션을 페이지 단위로 읽어서 다음 두 가지만 만듭니다. (문서 본문 / 임베딩은 보관하지 않음)
+        - 문서 ID → content_hash
+        - content_hash가 없는 예전 문서(UUID ID)의 rag_text 해시 → 문서 ID (임베딩 재사용용)
+    """
+    existing: Dict[str, Optional[str]] = {}
+    legacy: Dict[str, str] = {}
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=['metadatas', 'documents'])
+        if not page['ids']:
+            break
+        for doc_id, metadata, text in zip(page['ids'], page['metadatas'], page['documents']):
+            existing[doc_id] = (metadata or {}).get('content_hash')
+            if existing[doc_id] is None and text:
+                legacy[text_hash(text)] = doc_id
+        offset += len(page['ids'])
+    return existing, legacy
+
+
+def _reusable_embeddings(collection, texts: Dict[str, str], candidates: Dict[str, str]) -> Dict[str, List[float]]:
+    """
+    candidates(새 문서 ID → 같은 rag_text를 가지고 있을 수 있는 저장된 문서 ID)에 저장된 임베딩을
+    rag_text가 실제로 같을 때만 재사용합니다.
+        - metadata만 바뀐 문서 (예: OTT 정보 변경): 자기 자신의 임베딩 재사용
+        - UUID ID로 저장된 기존 컬렉션을 tmdb_id ID로 옮길 때: 같은 내용의 예전 문서 임베딩 재사용
+    """
+    if not candidates:
+        return {}
+    stored = collection.get(ids=list(set(candidates.values())), include=['documents', 'embeddings'])
+    stored_by_id = {doc_id: (text, vector) for doc_id, text, vector in zip(stored['ids'], stored['documents'], stored['embeddings'])}
+    reused: Dict[str, List[float]] = {}
+    for doc_id, stored_id in candidates.items():
+        if stored_id in stored_by_id and stored_by_id[stored_id][0] == texts[doc_id]:
+            reused[doc_id] = list(stored_by_id[stored_id][1])
+    return reused
+
+# %%
+# --- 4. 임베딩 / 반영 ---
+
+def make_embedding_batches(items: List[Tuple[str, str]], max_chars: int = EMBED_BATCH_CHARS,
+                           max_size: int = EMBED_BATCH_SIZE) -> List[List[Tuple[str, str]]]:
+    """(ID, 텍스트) 목록을 글자 수 / 개수 제한에 맞춰 나눕니다."""
+    batches: List[List[Tuple[str, str]]] = []
+    current: List[Tuple[str, str]] = []
+    chars = 0
+    for doc_id, text in items:
+        if current and (chars + len(text) > max_chars or len(current) >= max_size):
+            batches.append(current)
+            current, chars = [], 0
+        current.append((doc_id, text))
+        chars += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def embed_parallel(embedding, items: List[Tuple[str, str]], workers: int = EMBED_WORKERS) -> Dict[str, List[float]]:
+    """배치들을 스레드 풀로 동시에 임베딩합니다."""
+    batches = make_embedding_batches(items)
+    if not batches:
+        return {}
+
+    def run(batch):
+        return list(zip([doc_id for doc_id, _ in batch], embedding.embed_documents([text for _, text in batch])))
+
+    vectors: Dict[str, List[float]] = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for pairs in executor.map(run, batches):
+            vectors.update(pairs)
+    return vectors
+
+
+def bump_index_version(count: int, path: str = INDEX_VERSION_PATH) -> int:
+    """컬렉션 내용이 바뀔 때마다 버전을 올립니다. (컬렉션에서 파생된 캐시 / 스냅샷의 무효화 기준)"""
+    version = read_index_version(path) + 1
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "count": count, "updated_at": time.time()}, f)
+    return version
+
+
+def read_index_info(path: str = INDEX_VERSION_PATH) -> Dict[str, Any]:
+    """{"version": 컬렉션 버전, "count": 마지막 인덱싱 후 문서 수 (모르면 None)}"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {"version": int(data.get("version", 0)), "count": data.get("count")}
+    except (FileNotFoundError, ValueError, json.JSONDecodeError):
+        return {"version": 0, "count": None}
+
+
+def read_index_version(path: str = INDEX_VERSION_PATH) -> int:
+    return read_index_info(path)["version"]
+
+
+_checked_versions: Dict[str, Tuple[float, int]] = {}
+
+
+def current_index_version(vector_store: Any = None, path: str = INDEX_VERSION_PATH) -> Optional[int]:
+    """
+    vector_store가 지금 검색하는 컬렉션의 버전. (검색 결과 캐시 / 메타데이터 역색인 / BM25 색인의 무효화 기준)
+    NumpyVectorStore(스냅샷)면 필요할 때 다시 읽은 뒤 그 스냅샷의 index_version,
+    그 밖의 스토어(Chroma는 항상 최신 컬렉션을 검색)는 INDEX_VERSION_CHECK초마다 다시 읽은 파일 값
+    """
+    refresh = getattr(vector_store, "refresh_index_version", None)
+    if refresh is not None:
+        return refresh()
+    now = time.monotonic()
+    checked = _checked_versions.get(path)
+    if checked is None or now - checked[0] >= INDEX_VERSION_CHECK:
+        checked = _checked_versions[path] = (now, read_index_version(path))
+    return checked[1]
+
+
+def _write_batch(collection, embedding, batch: List[Tuple[str, str, Dict[str, Any]]],
+                 candidates: Dict[str, str], workers: int) -> Tuple[int, List[str]]:
+    """batch를 임베딩(재사용 가능한 것은 재사용) 후 upsert하고 (재사용 개수, 옮겨 간 예전 문서 ID)를 반환합니다."""
+    texts = {doc_id: text for doc_id, text, _ in batch}
+    vectors = _reusable_embeddings(collection, texts, candidates)
+    reused = len(vectors)
+    migrated = [candidates[doc_id] for doc_id in vectors if candidates[doc_id] != doc_id]
+    vectors.update(embed_parallel(embedding, [(doc_id, text) for doc_id, text in texts.items() if doc_id not in vectors], workers))
+
+    for chunk in batched(batch, WRITE_BATCH_SIZE):
+        collection.upsert(
+            ids=[doc_id for doc_id, _, _ in chunk],
+            embeddings=[vectors[doc_id] for doc_id, _, _ in chunk],
+            documents=[text for _, text, _ in chunk],
+            metadatas=[metadata for _, _, metadata in chunk],
+        )
+    return reused, migrated
+
+
+def sync_collection(vector_store, embedding, documents: Iterable[Tuple[str, str, Dict[str, Any]]],
+                    dry_run: bool = False, workers: int = EMBED_WORKERS,
+                    batch_size: int = INGEST_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    documents((문서 ID, rag_text, metadata) 스트림)와 컬렉션의 차이만 반영하고 변경 요약을 반환합니다.
+    documents는 batch_size개씩만 메모리에 올려서 처리합니다.
+    (전체 문서 수에 비례해서 들고 있는 것은 문서 ID / 해시뿐)
+    """
+    start = time.perf_counter()
+    collection = vector_store._collection
+    existing, legacy = load_collection_state(collection)
+    summary: Dict[str, Any] = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0, "reused_embeddings": 0, "embedded": 0}
+    seen: Set[str] = set()
+    removed: Set[str] = set()
+
+    for batch in batched(documents, batch_size):
+        to_write: List[Tuple[str, str, Dict[str, Any]]] = []
+        candidates: Dict[str, str] = {}
+        for doc_id, text, metadata in batch:
+            seen.add(doc_id)
+            if doc_id not in existing:
+                summary["added"] += 1
+                legacy_id = legacy.get(text_hash(text))
+                if legacy_id is not None:
+                    candidates[doc_id] = legacy_id
+            elif existing[doc_id] != metadata['content_hash']:
+                summary["updated"] += 1
+                candidates[doc_id] = doc_id
+            else:
+                summary["unchanged"] += 1
+                continue
+            to_write.append((doc_id, text, metadata))
+
+        if dry_run or not to_write:
+            continue
+        reused, migrated = _write_batch(collection, embedding, to_write, candidates, workers)
+        summary["reused_embeddings"] += reused
+        summary["embedded"] += len(to_write) - reused
+        # 임베딩을 넘겨받은 예전 문서는 바로 삭제 (같은 작품이 두 번 검색되지 않도록)
+        if migrated:
+            collection.delete(ids=migrated)
+            removed.update(migrated)
+
+    deleted = [doc_id for doc_id in existing if doc_id not in seen]
+    summary["deleted"] = len(deleted)
+    if not dry_run:
+        remaining = [doc_id for doc_id in deleted if doc_id not in removed]
+        for chunk in batched(remaining, WRITE_BATCH_SIZE):
+            collection.delete(ids=chunk)
+        if summary["added"] or summary["updated"] or summary["deleted"]:
+            summary["index_version"] = bump_index_version(len(seen))
+
+    summary["elapsed_s"] = round(time.perf_counter() - start, 2)
+    return summary
+
+# %%
+def main():
+    parser = argparse.ArgumentParser(description="rag_data.jsonl → Chroma 증분 인덱싱")
+    parser.add_argument("--input", default=RAG_DATA_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="변경 내역만 출력하고 반영하지 않음")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from langchain_chroma import Chroma
+    from service import embedding, CHROMA_PERSIST_DIRECTORY, CHROMA_COLLECTION_NAME
+    from numpy_vector_store import NUMPY_INDEX_PATH
+
+    vector_store = Chroma(
+        embedding_function=embedding,
+        persist_directory=CHROMA_PERSIST_DIRECTORY,
+        collection_name=CHROMA_COLLECTION_NAME
+    )
+    summary = sync_collection(vector_store, embedding, iter_documents(args.input), args.dry_run, args.workers, args.batch_size)
+
+    print("--- 인덱싱 변경 요약 ---")
+    for key in ("added", "updated", "deleted", "unchanged", "embedded", "reused_embeddings", "index_version", "elapsed_s"):
+        if key in summary:
+            print(f"  {key:18s}: {summary[key]}")
+
+    if "index_version" in summary:
+        # NumpyVectorStore 스냅샷은 index_version이 다르면 다음에 열 때(실행 중인 서버는 검색할 때) 다시 만들어짐
+        print(f"--- NumpyVectorStore 스냅샷({NUMPY_INDEX_PATH})은 index_version {summary['index_version']}으로 다시 만들어집니다 ---")
+        print("--- 유사 작품 이웃 테이블도 갱신하세요: python item_neighbors.py update ---")
+
+    if not args.dry_run and args.input == RAG_DATA_PATH:
+        # 조회용 카탈로그 저장소도 같은 rag_data.jsonl로 다시 빌드 (열 때 다시 빌드하지 않도록)
+        from catalog_store import build_catalog_store
+        build_catalog_store(args.input)
+
+
+if __name__ == "__main__":
+    main()
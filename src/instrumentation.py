@@ -0,0 +1,498 @@
+# instrumentation.py
+"""
+요청 / 노드 단위 지연, 토큰, 비용, 캐시 적중 계측.
+    - build_graph()에 등록된 모든 노드를 감싸서 노드별 실행 시간과 검색 문서 수를 기록
+    - service.llm의 콜백(MetricsCallbackHandler)으로 LLM 호출 시간과 prompt / completion 토큰을 기록
+    - CachedEmbeddings에서 임베딩 API 호출 시간과 캐시 적중 수를 기록
+    - CachedRagApp.invoke / stream 한 번이 하나의 요청 (track_request)
+
+요청이 끝날 때마다 METRICS_LOG_PATH에 JSONL 한 줄을 남기고, 프로세스 누적값은
+render_prometheus()의 Prometheus 텍스트 형식으로 내보냅니다. (METRICS_PORT를 지정하면 /metrics 엔드포인트)
+
+분기별 p50 / p95 / p99 요약:
+    python instrumentation.py summary --log ./db/metrics.jsonl
+"""
+
+# %%
+import argparse
+import contextvars
+import dataclasses
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+
+from streaming import BRANCH_BY_NODE
+
+# %%
+# --- 1. 설정 ---
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_LOG_PATH = os.getenv("METRICS_LOG_PATH", "./db/metrics.jsonl")    # 빈 문자열이면 JSONL 기록 안 함
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))                       # 0이면 /metrics 엔드포인트 없음
+# 비용 계산용 1M 토큰당 가격 (USD)
+LLM_INPUT_PRICE_PER_1M = float(os.getenv("LLM_INPUT_PRICE_PER_1M", "1.25"))
+LLM_OUTPUT_PRICE_PER_1M = float(os.getenv("LLM_OUTPUT_PRICE_PER_1M", "10.0"))
+
+# Prometheus 히스토그램 버킷 (초)
+LATENCY_BUCKETS: Tuple[float, ...] = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BRANCHES = tuple(BRANCH_BY_NODE.values())
+
+# %%
+# --- 2. 요청 / 노드 단위 기록 ---
+
+@dataclass
+class NodeMetrics:
+    calls: int = 0
+    wall_ms: float = 0.0
+    llm_calls: int = 0
+    llm_ms: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    embedding_texts: int = 0
+    embedding_cache_hits: int = 0
+    embedding_api_calls: int = 0
+    embedding_ms: float = 0.0
+    docs: int = 0
+    context_tokens: int = 0          # generate_answer 프롬프트에 넣은 컨텍스트 토큰 (context_packing.py)
+    context_tokens_saved: int = 0    # rag_text 전체 대비 줄어든 토큰
+
+    @property
+    def cost_usd(self) -> float:
+        return (self.prompt_tokens * LLM_INPUT_PRICE_PER_1M
+                + self.completion_tokens * LLM_OUTPUT_PRICE_PER_1M) / 1_000_000
+
+
+class RequestMetrics:
+    """요청 하나(CachedRagApp.invoke / stream 한 번)의 노드별 기록. 병렬 노드가 동시에 갱신하므로 lock으로 보호합니다."""
+
+    def __init__(self, query: str):
+        self.request_id = uuid.uuid4().hex[:12]
+        self.query = query
+        self.branch = "unknown"
+        self.answer_cache_hit = False
+        self.started_at = time.time()
+        self.nodes: Dict[str, NodeMetrics] = {}
+        self.lock = threading.Lock()
+
+    def node(self, name: str) -> NodeMetrics:
+        """lock을 잡은 상태에서 호출해야 합니다."""
+        if name not in self.nodes:
+            self.nodes[name] = NodeMetrics()
+        return self.nodes[name]
+
+    def to_dict(self, total_ms: float) -> Dict[str, Any]:
+        with self.lock:
+            nodes = {name: {**dataclasses.asdict(m), "cost_usd": m.cost_usd} for name, m in self.nodes.items()}
+        totals = {
+            key: sum(node[key] for node in nodes.values())
+            for key in ("llm_calls", "prompt_tokens", "completion_tokens", "embedding_api_calls",
+                        "embedding_cache_hits", "context_tokens", "context_tokens_saved", "cost_usd")
+        }
+        return {
+            "request_id": self.request_id,
+            "ts": self.started_at,
+            "query": self.query,
+            "branch": self.branch,
+            "answer_cache_hit": self.answer_cache_hit,
+            "total_ms": total_ms,
+            **totals,
+            "nodes": nodes,
+        }
+
+
+# 현재 실행 중인 요청 / 노드 (LangGraph는 노드를 실행할 때 contextvars를 복사하므로 병렬 노드에서도 전달됨)
+_current_request: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar("metrics_request", default=None)
+_current_node: contextvars.ContextVar[str] = contextvars.ContextVar("metrics_node", default="(outside_graph)")
+
+
+def _update(update_fn) -> None:
+    """현재 요청 / 노드의 NodeMetrics를 갱신합니다. (요청 밖의 호출은 프로세스 누적값에만 반영)"""
+    request = _current_request.get()
+    if request is None:
+        return
+    with request.lock:
+        update_fn(request.node(_current_node.get()))
+
+# %%
+# --- 3. 프로세스 누적값 (Prometheus) ---
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.total += 1
+        self.sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """노드 / 분기별 지연 히스토그램과 토큰 / 캐시 카운터."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_seconds: Dict[str, _Histogram] = defaultdict(_Histogram)     # branch
+        self.node_seconds: Dict[str, _Histogram] = defaultdict(_Histogram)        # node
+        self.llm_tokens: Dict[Tuple[str, str], int] = defaultdict(int)            # (node, 'prompt' | 'completion')
+        self.llm_cost_usd: Dict[str, float] = defaultdict(float)                  # node
+        self.embedding_texts: Dict[str, int] = defaultdict(int)                   # 'hit' | 'miss'
+        self.embedding_api_seconds = _Histogram()
+        self.answer_cache: Dict[str, int] = defaultdict(int)                      # 'hit' | 'miss'
+        self.retrieved_docs: Dict[str, int] = defaultdict(int)                    # node
+        self.context_tokens: Dict[str, int] = defaultdict(int)                    # 'packed' | 'saved'
+
+    def observe_request(self, branch: str, seconds: float, answer_cache_hit: bool) -> None:
+        with self._lock:
+            self.request_seconds[branch].observe(seconds)
+            self.answer_cache["hit" if answer_cache_hit else "miss"] += 1
+
+    def observe_node(self, node: str, seconds: float, docs: int) -> None:
+        with self._lock:
+            self.node_seconds[node].observe(seconds)
+            self.retrieved_docs[node] += docs
+
+    def observe_llm(self, node: str, prompt_tokens: int, completion_tokens: int, cost_usd: float) -> None:
+        with self._lock:
+            self.llm_tokens[(node, "prompt")] += prompt_tokens
+            self.llm_tokens[(node, "completion")] += completion_tokens
+            self.llm_cost_usd[node] += cost_usd
+
+    def observe_embedding(self, hits: int, misses: int, api_seconds: Optional[float]) -> None:
+        with self._lock:
+            self.embedding_texts["hit"] += hits
+            self.embedding_texts["miss"] += misses
+            if api_seconds is not None:
+                self.embedding_api_seconds.observe(api_seconds)
+
+    def observe_context(self, packed_tokens: int, saved_tokens: int) -> None:
+        with self._lock:
+            self.context_tokens["packed"] += packed_tokens
+            self.context_tokens["saved"] += saved_tokens
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+
+        def histogram(name: str, help_text: str, series: Dict[Tuple[Tuple[str, str], ...], _Histogram]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, hist in series.items():
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                sep = "," if label_text else ""
+                for bound, count in zip(LATENCY_BUCKETS, hist.counts):
+                    lines.append(f'{name}_bucket{{{label_text}{sep}le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{label_text}{sep}le="+Inf"}} {hist.total}')
+                suffix = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{name}_sum{suffix} {hist.sum:.6f}")
+                lines.append(f"{name}_count{suffix} {hist.total}")
+
+        def counter(name: str, help_text: str, series: Dict[Tuple[Tuple[str, str], ...], float]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in series.items():
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        with self._lock:
+            histogram("rag_request_seconds", "End-to-end request latency by branch.",
+                      {(("branch", b),): h for b, h in self.request_seconds.items()})
+            histogram("rag_node_seconds", "Graph node latency.",
+                      {(("node", n),): h for n, h in self.node_seconds.items()})
+            histogram("rag_embedding_api_seconds", "Embedding API call latency (cache misses only).",
+                      {(): self.embedding_api_seconds})
+            counter("rag_llm_tokens_total", "LLM tokens by node and kind.",
+                    {(("node", n), ("kind", k)): v for (n, k), v in self.llm_tokens.items()})
+            counter("rag_llm_cost_usd_total", "Estimated LLM cost by node.",
+                    {(("node", n),): round(v, 6) for n, v in self.llm_cost_usd.items()})
+            counter("rag_embedding_texts_total", "Embedded texts by cache result.",
+                    {(("result", r),): v for r, v in self.embedding_texts.items()})
+            counter("rag_answer_cache_requests_total", "Requests by answer cache result.",
+                    {(("result", r),): v for r, v in self.answer_cache.items()})
+            counter("rag_retrieved_docs_total", "Documents added to context by node.",
+                    {(("node", n),): v for n, v in self.retrieved_docs.items()})
+            counter("rag_context_tokens_total", "Answer prompt context tokens (packed) and tokens trimmed away (saved).",
+                    {(("kind", k),): v for k, v in self.context_tokens.items()})
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+_log_lock = threading.Lock()
+
+
+def render_prometheus() -> str:
+    return registry.render_prometheus()
+
+# %%
+# --- 4. 요청 / 노드 범위 ---
+
+def _write_log(record: Dict[str, Any], path: str = METRICS_LOG_PATH) -> None:
+    if not path:
+        return
+    with _log_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+@contextmanager
+def track_request(query: str) -> Iterator[RequestMetrics]:
+    """요청 하나의 범위. 끝나면 JSONL 한 줄을 남기고 분기별 히스토그램에 반영합니다."""
+    request = RequestMetrics(query)
+    token = _current_request.set(request)
+    start = time.perf_counter()
+    try:
+        yield request
+    finally:
+        total_ms = (time.perf_counter() - start) * 1000
+        _current_request.reset(token)
+        if METRICS_ENABLED:
+            registry.observe_request(request.branch, total_ms / 1000, request.answer_cache_hit)
+            _write_log(request.to_dict(total_ms))
+
+
+def record_answer_cache(hit: bool) -> None:
+    request = _current_request.get()
+    if request is not None:
+        request.answer_cache_hit = hit
+
+
+@contextmanager
+def node_scope(name: str) -> Iterator[None]:
+    """
+    이 범위 안의 LLM / 임베딩 호출을 name 노드의 기록으로 모읍니다.
+    그래프 노드는 instrument_graph가 감싸고, 그래프 밖에서 실행하는 단계(CachedRagApp의 쿼리 분석)는 직접 사용합니다.
+    """
+    token = _current_node.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current_node.reset(token)
+        _finish_node(name, time.perf_counter() - start, None)
+
+
+def _finish_node(name: str, seconds: float, result: Any) -> None:
+    docs = len(result.get("context") or []) if isinstance(result, dict) else 0
+    request = _current_request.get()
+    if request is not None:
+        with request.lock:
+            stats = request.node(name)
+            stats.calls += 1
+            stats.wall_ms += seconds * 1000
+            stats.docs += docs
+            request.branch = BRANCH_BY_NODE.get(name, request.branch)
+    registry.observe_node(name, seconds, docs)
+
+# %%
+# --- 5. 그래프 노드 감싸기 ---
+
+def instrument_node(name: str, node: Any) -> RunnableLambda:
+    """노드 실행을 node_scope로 감쌉니다. (config를 그대로 넘기므로 스트리밍 / 콜백은 기존과 같음)"""
+    runnable = node if isinstance(node, Runnable) else RunnableLambda(node)
+
+    def run(state, config: RunnableConfig):
+        token = _current_node.set(name)
+        start = time.perf_counter()
+        try:
+            result = runnable.invoke(state, config)
+        finally:
+            _current_node.reset(token)
+        _finish_node(name, time.perf_counter() - start, result)
+        return result
+
+    async def arun(state, config: RunnableConfig):
+        token = _current_node.set(name)
+        start = time.perf_counter()
+        try:
+            result = await runnable.ainvoke(state, config)
+        finally:
+            _current_node.reset(token)
+        _finish_node(name, time.perf_counter() - start, result)
+        return result
+
+    return RunnableLambda(run, afunc=arun, name=name)
+
+
+def instrument_graph(builder) -> None:
+    """compile() 전에 StateGraph에 등록된 모든 노드를 instrument_node로 바꿉니다."""
+    if not METRICS_ENABLED:
+        return
+    for name, spec in list(builder.nodes.items()):
+        builder.nodes[name] = dataclasses.replace(spec, runnable=instrument_node(name, spec.runnable))
+
+# %%
+# --- 6. LLM / 임베딩 호출 기록 ---
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    service.llm에 붙이는 콜백. LLM 호출 시간과 usage_metadata의 토큰 수를 현재 노드에 기록합니다.
+    run_inline=True: 호출한 스레드 / 코루틴에서 바로 실행되어야 현재 노드(contextvar)를 알 수 있음
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._started: Dict[Any, Tuple[float, str]] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._started[run_id] = (time.perf_counter(), _current_node.get())
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._started[run_id] = (time.perf_counter(), _current_node.get())
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._started.pop(run_id, None)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        start, node = self._started.pop(run_id, (time.perf_counter(), _current_node.get()))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        prompt_tokens, completion_tokens = _token_usage(response)
+        cost = (prompt_tokens * LLM_INPUT_PRICE_PER_1M + completion_tokens * LLM_OUTPUT_PRICE_PER_1M) / 1_000_000
+
+        def update(stats: NodeMetrics) -> None:
+            stats.llm_calls += 1
+            stats.llm_ms += elapsed_ms
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+        _update(update)
+        registry.observe_llm(node, prompt_tokens, completion_tokens, cost)
+
+
+def _token_usage(response) -> Tuple[int, int]:
+    """LLMResult에서 (prompt, completion) 토큰 수. 스트리밍 응답은 stream_usage=True여야 값이 있습니다."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+def record_embedding(texts: int, cache_hits: int, api_seconds: Optional[float]) -> None:
+    """CachedEmbeddings 호출 한 번. api_seconds는 캐시 미스로 임베딩 API를 호출했을 때만 넘깁니다."""
+    def update(stats: NodeMetrics) -> None:
+        stats.embedding_texts += texts
+        stats.embedding_cache_hits += cache_hits
+        if api_seconds is not None:
+            stats.embedding_api_calls += 1
+            stats.embedding_ms += api_seconds * 1000
+    _update(update)
+    registry.observe_embedding(cache_hits, texts - cache_hits, api_seconds)
+
+
+def record_context_packing(original_tokens: int, packed_tokens: int) -> None:
+    """context_packing.pack_context 한 번. rag_text 전체(original) 대비 프롬프트에 넣은(packed) 컨텍스트 토큰 수"""
+    saved = max(0, original_tokens - packed_tokens)
+
+    def update(stats: NodeMetrics) -> None:
+        stats.context_tokens += packed_tokens
+        stats.context_tokens_saved += saved
+    _update(update)
+    registry.observe_context(packed_tokens, saved)
+
+# %%
+# --- 7. /metrics 엔드포인트 ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> ThreadingHTTPServer:
+    """백그라운드 스레드에서 GET /metrics (Prometheus 텍스트 형식)를 제공합니다."""
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"--- /metrics 엔드포인트: http://localhost:{server.server_address[1]}/metrics ---")
+    return server
+
+# %%
+# --- 8. JSONL 요약 ---
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def load_log(path: str = METRICS_LOG_PATH) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(records: List[Dict[str, Any]]) -> None:
+    """분기별 전체 지연과 분기 / 노드별 지연, 토큰, 비용의 p50 / p95 / p99를 출력합니다."""
+    by_branch: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for record in records:
+        branch = record["branch"] + (" (answer cache)" if record.get("answer_cache_hit") else "")
+        by_branch[branch].append(record)
+
+    # llm / embed: 노드 시간 중 LLM / 임베딩 API 호출 시간 (p50). 나머지는 벡터 검색, 필터 등
+    header = (f"{'':34s} {'n':>5s} {'p50(ms)':>9s} {'p95(ms)':>9s} {'p99(ms)':>9s} "
+              f"{'llm':>7s} {'embed':>7s} {'tokens':>8s} {'cost($)':>9s}")
+    order = [b for b in BRANCHES if b in by_branch] + sorted(set(by_branch) - set(BRANCHES))
+    for branch in order:
+        items = by_branch[branch]
+        print(f"\n--- {branch} ---")
+        print(header)
+        totals = [r["total_ms"] for r in items]
+        tokens = sum(r["prompt_tokens"] + r["completion_tokens"] for r in items) / len(items)
+        cost = sum(r["cost_usd"] for r in items) / len(items)
+        print(f"{'(request)':34s} {len(items):5d} {_percentile(totals, 50):9.1f} {_percentile(totals, 95):9.1f} "
+              f"{_percentile(totals, 99):9.1f} {'':7s} {'':7s} {tokens:8.0f} {cost:9.5f}")
+        packed = [r for r in items if r.get("context_tokens")]
+        if packed:
+            context = sum(r["context_tokens"] for r in packed) / len(packed)
+            saved = sum(r["context_tokens_saved"] for r in packed) / len(packed)
+            print(f"{'(answer context tokens)':34s} {len(packed):5d} 평균 {context:.0f} (절약 {saved:.0f}, "
+                  f"-{saved / (context + saved) if context + saved else 0:.0%})")
+
+        node_rows: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for record in items:
+            for name, stats in record["nodes"].items():
+                node_rows[name].append(stats)
+        for name, rows in node_rows.items():
+            wall = [row["wall_ms"] for row in rows]
+            tokens = sum(row["prompt_tokens"] + row["completion_tokens"] for row in rows) / len(rows)
+            cost = sum(row["cost_usd"] for row in rows) / len(rows)
+            llm = _percentile([row["llm_ms"] for row in rows], 50)
+            embed = _percentile([row["embedding_ms"] for row in rows], 50)
+            print(f"  {name:32s} {len(rows):5d} {_percentile(wall, 50):9.1f} {_percentile(wall, 95):9.1f} "
+                  f"{_percentile(wall, 99):9.1f} {llm:7.1f} {embed:7.1f} {tokens:8.0f} {cost:9.5f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG 요청 계측 로그(JSONL) 요약")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary = sub.add_parser("summary", help="분기 / 노드별 p50 / p95 / p99")
+    summary.add_argument("--log", default=METRICS_LOG_PATH)
+    args = parser.parse_args()
+
+    summarize(load_log(args.log))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+# item_neighbors.py
+"""
+작품별 유사 작품(이웃) top-N을 오프라인으로 미리 계산해 두는 작업.
+점수 = 임베딩 코사인 유사도 + 장르 / 출연진 / 감독 / 키워드 겹침(Jaccard)의 가중합
+
+실행 방법:
+    python item_neighbors.py build     # 전체 카탈로그의 이웃 테이블 생성
+    python item_neighbors.py update    # 기존 테이블에 새로 추가 / 삭제된 작품만 반영 (ingest 이후)
+
+내용이 바뀐 작품(같은 tmdb_id)은 update로 반영되지 않으므로 build로 다시 계산합니다.
+"""
+
+# %%
+import argparse
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from catalog import load_records
+
+# %%
+# --- 1. 설정 ---
+ITEM_NEIGHBORS_PATH = os.getenv("ITEM_NEIGHBORS_PATH", "./db/item_neighbors.npz")
+ITEM_NEIGHBORS_TOP_N = int(os.getenv("ITEM_NEIGHBORS_TOP_N", "20"))
+# 한 번에 점수를 계산하는 행 수 (메모리 사용량: BLOCK_SIZE x 전체 작품 수 float32)
+BLOCK_SIZE = 512
+
+SIMILARITY_WEIGHTS: Dict[str, float] = {
+    'embedding': 0.6,
+    'genres': 0.15,
+    'cast': 0.1,
+    'directors': 0.05,
+    'keywords': 0.1,
+}
+# rag_data.jsonl 레코드에서 겹침을 계산하는 리스트 필드
+OVERLAP_FIELDS = ('genres', 'cast', 'directors', 'keywords')
+
+# %%
+# --- 2. 점수 계산 ---
+
+class ItemFeatures:
+    """점수 계산에 필요한 정규화된 임베딩과 필드별 posting list (값 → 행 번호 배열)."""
+
+    def __init__(self, tmdb_ids: Sequence[int], vectors: np.ndarray, records: Sequence[Dict[str, Any]]):
+        self.tmdb_ids = np.asarray(tmdb_ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.vectors = vectors / norms
+
+        self.sets: Dict[str, List[Set[str]]] = {}
+        self.sizes: Dict[str, np.ndarray] = {}
+        self.postings: Dict[str, Dict[str, np.ndarray]] = {}
+        for field in OVERLAP_FIELDS:
+            sets = [set(record.get(field) or []) for record in records]
+            postings: Dict[str, List[int]] = {}
+            for row, values in enumerate(sets):
+                for value in values:
+                    postings.setdefault(value, []).append(row)
+            self.sets[field] = sets
+            self.sizes[field] = np.array([len(values) for values in sets], dtype=np.float32)
+            self.postings[field] = {value: np.array(rows, dtype=np.int64) for value, rows in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.tmdb_ids)
+
+    def score_rows(self, rows: Sequence[int]) -> np.ndarray:
+        """rows 각각과 전체 작품 사이의 점수 행렬 (len(rows) x 전체). 점수는 대칭이고 자기 자신은 -inf."""
+        rows = list(rows)
+        n = len(self)
+        scores = SIMILARITY_WEIGHTS['embedding'] * (self.vectors[rows] @ self.vectors.T)
+        for field in OVERLAP_FIELDS:
+            weight = SIMILARITY_WEIGHTS[field]
+            sizes = self.sizes[field]
+            for i, row in enumerate(rows):
+                values = self.sets[field][row]
+                if not values:
+                    continue
+                # 교집합 크기 = 같은 값을 가진 posting들을 모아 행 번호별로 센 값
+                counts = np.bincount(np.concatenate([self.postings[field][v] for v in values]), minlength=n)
+                union = sizes[row] + sizes - counts
+                scores[i] += weight * counts / np.maximum(union, 1.0)
+        scores[np.arange(len(rows)), rows] = -np.inf
+        return scores
+
+
+def _top_n(scores: np.ndarray, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """행마다 점수 상위 top_n개의 (열 번호, 점수)를 내림차순으로 반환합니다. (부족한 칸은 -1 / -inf)"""
+    rows, n = scores.shape
+    k = min(top_n, max(n - 1, 0))
+    neighbor_rows = np.full((rows, top_n), -1, dtype=np.int32)
+    neighbor_scores = np.full((rows, top_n), -np.inf, dtype=np.float32)
+    if k == 0:
+        return neighbor_rows, neighbor_scores
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    neighbor_rows[:, :k] = np.take_along_axis(part, order, axis=1)
+    neighbor_scores[:, :k] = np.take_along_axis(part_scores, order, axis=1)
+    return neighbor_rows, neighbor_scores
+
+# %%
+# --- 3. 이웃 테이블 ---
+
+class ItemNeighbors:
+    """
+    tmdb_id별 이웃 목록을 배열 세 개로 저장한 테이블.
+        tmdb_ids      : (n,) int64
+        neighbor_rows : (n, top_n) int32   - tmdb_ids의 행 번호 (-1은 빈 칸)
+        scores        : (n, top_n) float32
+    tmdb_id → 행 번호 딕셔너리로 O(1) 조회합니다.
+    """
+
+    def __init__(self, tmdb_ids: np.ndarray, neighbor_rows: np.ndarray, scores: np.ndarray):
+        self.tmdb_ids = np.asarray(tmdb_ids, dtype=np.int64)
+        self.neighbor_rows = np.asarray(neighbor_rows, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self._row = {int(tmdb_id): row for row, tmdb_id in enumerate(self.tmdb_ids)}
+
+    @property
+    def top_n(self) -> int:
+        return self.neighbor_rows.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.tmdb_ids)
+
+    def __contains__(self, tmdb_id: Any) -> bool:
+        return tmdb_id in self._row
+
+    def neighbors(self, tmdb_id: int, k: int = 3) -> List[Tuple[int, float]]:
+        """tmdb_id와 가장 비슷한 작품 k개의 (tmdb_id, 점수)."""
+        row = self._row.get(tmdb_id)
+        if row is None:
+            return []
+        result = []
+        for neighbor, score in zip(self.neighbor_rows[row, :k], self.scores[row, :k]):
+            if neighbor < 0:
+                break
+            result.append((int(self.tmdb_ids[neighbor]), float(score)))
+        return result
+
+    def save(self, path: str = ITEM_NEIGHBORS_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, tmdb_ids=self.tmdb_ids, neighbor_rows=self.neighbor_rows, scores=self.scores)
+
+    @classmethod
+    def load(cls, path: str = ITEM_NEIGHBORS_PATH) -> "ItemNeighbors":
+        with np.load(path) as data:
+            return cls(data['tmdb_ids'], data['neighbor_rows'], data['scores'])
+
+
+def build_neighbors(features: ItemFeatures, top_n: int = ITEM_NEIGHBORS_TOP_N) -> ItemNeighbors:
+    """전체 작품의 이웃 테이블을 BLOCK_SIZE 행씩 계산합니다."""
+    n = len(features)
+    neighbor_rows = np.full((n, top_n), -1, dtype=np.int32)
+    scores = np.full((n, top_n), -np.inf, dtype=np.float32)
+    for start in range(0, n, BLOCK_SIZE):
+        rows = range(start, min(start + BLOCK_SIZE, n))
+        block_rows, block_scores = _top_n(features.score_rows(rows), top_n)
+        neighbor_rows[start:start + len(rows)] = block_rows
+        scores[start:start + len(rows)] = block_scores
+    return ItemNeighbors(features.tmdb_ids, neighbor_rows, scores)
+
+
+def update_neighbors(table: ItemNeighbors, features: ItemFeatures,
+                     top_n: int = ITEM_NEIGHBORS_TOP_N) -> Tuple[ItemNeighbors, Dict[str, int]]:
+    """
+    기존 테이블에 카탈로그 변경분만 반영합니다.
+        - 새 작품: 행 전체를 계산
+        - 이웃 목록에 삭제된 작품이 있던 작품: 행 전체를 다시 계산
+        - 나머지: 기존 목록 + 새 작품과의 점수(대칭이므로 새 작품 행에서 가져옴)를 합쳐 top_n 유지
+    """
+    n = len(features)
+    new_row = {int(tmdb_id): row for row, tmdb_id in enumerate(features.tmdb_ids)}
+    old_ids = {int(tmdb_id) for tmdb_id in table.tmdb_ids}
+    added = [row for row, tmdb_id in enumerate(features.tmdb_ids) if int(tmdb_id) not in old_ids]
+    removed = old_ids - set(new_row)
+
+    # 기존 이웃 목록을 새 행 번호로 변환 (삭제된 작품이 있으면 다시 계산 대상)
+    neighbor_rows = np.full((n, top_n), -1, dtype=np.int32)
+    scores = np.full((n, top_n), -np.inf, dtype=np.float32)
+    dirty: List[int] = list(added)
+    for old_row, tmdb_id in enumerate(table.tmdb_ids):
+        row = new_row.get(int(tmdb_id))
+        if row is None:
+            continue
+        old_neighbors = [int(table.tmdb_ids[r]) for r in table.neighbor_rows[old_row] if r >= 0]
+        if any(neighbor in removed for neighbor in old_neighbors) or table.top_n < top_n:
+            dirty.append(row)
+            continue
+        count = min(len(old_neighbors), top_n)
+        neighbor_rows[row, :count] = [new_row[neighbor] for neighbor in old_neighbors[:count]]
+        scores[row, :count] = table.scores[old_row, :count]
+
+    # 새 작품과 기존 작품의 점수로 기존 목록 갱신
+    if added:
+        added_scores = features.score_rows(added)            # (새 작품 수, n)
+        added_set = set(added)
+        for row in range(n):
+            if row in added_set:
+                continue
+            candidate_rows = np.concatenate([neighbor_rows[row], np.asarray(added, dtype=np.int32)])
+            candidate_scores = np.concatenate([scores[row], added_scores[:, row]])
+            order = np.argsort(-candidate_scores, kind='stable')[:top_n]
+            neighbor_rows[row] = candidate_rows[order]
+            scores[row] = candidate_scores[order]
+
+    # 다시 계산해야 하는 행
+    dirty = sorted(set(dirty))
+    for start in range(0, len(dirty), BLOCK_SIZE):
+        rows = dirty[start:start + BLOCK_SIZE]
+        block_rows, block_scores = _top_n(features.score_rows(rows), top_n)
+        neighbor_rows[rows] = block_rows
+        scores[rows] = block_scores
+
+    summary = {"added": len(added), "removed": len(removed), "recomputed": len(dirty), "total": n}
+    return ItemNeighbors(features.tmdb_ids, neighbor_rows, scores), summary
+
+# %%
+# --- 4. 데이터 로드 ---
+
+def load_item_features(vector_store=None, embedding=None) -> ItemFeatures:
+    """
+    rag_data.jsonl 레코드와 벡터 스토어에 저장된 임베딩으로 ItemFeatures를 만듭니다.
+    (벡터 스토어에 없는 rag_text만 임베딩 API로 계산)
+    """
+    if vector_store is None or embedding is None:
+        from service import vector_store as default_store, embedding as default_embedding
+        vector_store = vector_store or default_store
+        embedding = embedding or default_embedding
+
+    records = [record for record in load_records() if record.get('tmdb_id') is not None and record.get('rag_text')]
+    data = vector_store.get(include=['embeddings', 'documents'])
+    vector_by_text = {text: vector for text, vector in zip(data['documents'], data['embeddings'])}
+
+    missing = [record['rag_text'] for record in records if record['rag_text'] not in vector_by_text]
+    if missing:
+        print(f"--- 벡터 스토어에 없는 작품 {len(missing)}개 임베딩 계산 ---")
+        vector_by_text.update(zip(missing, embedding.embed_documents(missing)))
+
+    vectors = np.asarray([vector_by_text[record['rag_text']] for record in records], dtype=np.float32)
+    return ItemFeatures([record['tmdb_id'] for record in records], vectors, records)
+
+
+@lru_cache(maxsize=1)
+def get_item_neighbors(path: str = ITEM_NEIGHBORS_PATH) -> Optional[ItemNeighbors]:
+    """저장된 이웃 테이블을 한 번만 읽어 재사용합니다. (파일이 없으면 None)"""
+    if not os.path.exists(path):
+        print(f"--- 이웃 테이블({path})이 없어 유사 추천에 벡터 검색을 사용합니다 ---")
+        return None
+    return ItemNeighbors.load(path)
+
+# %%
+def main():
+    parser = argparse.ArgumentParser(description="작품별 유사 작품 이웃 테이블 생성 / 갱신")
+    parser.add_argument("command", choices=["build", "update"])
+    parser.add_argument("--path", default=ITEM_NEIGHBORS_PATH)
+    parser.add_argument("--top-n", type=int, default=ITEM_NEIGHBORS_TOP_N)
+    args = parser.parse_args()
+
+    features = load_item_features()
+    if args.command == "update" and os.path.exists(args.path):
+        table, summary = update_neighbors(ItemNeighbors.load(args.path), features, args.top_n)
+        print(f"--- 이웃 테이블 갱신: {summary} ---")
+    else:
+        table = build_neighbors(features, args.top_n)
+        print(f"--- 이웃 테이블 생성: 작품 {len(table)}개, top_n={args.top_n} ---")
+    table.save(args.path)
+    print(f"--- 저장 완료: {args.path} ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# load_test.py
+"""
+로컬 stub OpenAI 서버(LLM / Embedding)를 띄워 놓고
+동기 그래프 실행(app.invoke, 요청마다 스레드 하나 점유)과
+비동기 그래프 실행(app.ainvoke, 하나의 이벤트 루프에서 동시 처리)의 처리량을 비교합니다.
+실제 OpenAI API는 호출하지 않습니다.
+
+실행 방법:
+    python load_test.py --requests 40 --concurrency 20 --llm-latency 0.5
+"""
+
+# %%
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List
+
+import numpy as np
+from aiohttp import web
+
+LOAD_TEST_QUERIES: List[str] = [
+    "영화 '승부'에 대해 알려줘",
+    "영화 '승부'랑 비슷한 거 추천해줘",
+    "넷플릭스 액션 영화 추천해줘",
+    "이병헌 나오는 넷플릭스 드라마 추천",
+    "봉준호 감독 영화 추천해줘",
+    "좀비 나오는 영화 추천해줘",
+]
+
+# %%
+# --- 1. stub OpenAI 서버 ---
+
+def _hash_vector(text: str, dim: int) -> np.ndarray:
+    """텍스트 해시로 시드를 정해서 항상 같은 단위 벡터를 만듭니다."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def create_stub_app(llm_latency: float, embedding_latency: float, embedding_dim: int) -> web.Application:
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        await asyncio.sleep(llm_latency)
+        created = int(time.time())
+        if body.get("response_format"):
+            # 구조화 출력 (QueryDetails) 요청
+            content = json.dumps({"status": "recommend", "title": None, "year": None, "casts": None,
+                                  "director": None, "genre": None, "ott": None, "info": None})
+        else:
+            content = "stub 응답입니다. 요청하신 조건에 맞는 작품을 추천드립니다."
+
+        if not body.get("stream"):
+            return web.json_response({
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": created, "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for token in content.split(" "):
+            chunk = {
+                "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created, "model": body.get("model"),
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": token + " "}, "finish_reason": None}],
+            }
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        last = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created, "model": body.get("model"),
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        await response.write(f"data: {json.dumps(last)}\n\n".encode("utf-8"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            # stream_usage=True: 마지막에 choices가 빈 usage 청크를 보냄 (OpenAI API와 같은 형식)
+            usage = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created,
+                     "model": body.get("model"), "choices": [],
+                     "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120}}
+            await response.write(f"data: {json.dumps(usage)}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def embeddings(request: web.Request) -> web.Response:
+        body = await request.json()
+        await asyncio.sleep(embedding_latency)
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dim = body.get("dimensions") or embedding_dim
+        data = []
+        for i, item in enumerate(inputs):
+            vector = _hash_vector(json.dumps(item, ensure_ascii=False), dim)
+            if body.get("encoding_format") == "base64":
+                encoded = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                encoded = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": encoded})
+        return web.json_response({"object": "list", "data": data, "model": body.get("model"),
+                                  "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)}})
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/v1/embeddings", embeddings)
+    return app
+
+
+def start_stub_server(llm_latency: float, embedding_latency: float, embedding_dim: int, port: int) -> str:
+    """별도 스레드의 이벤트 루프에서 stub 서버를 실행하고 base_url을 반환합니다."""
+    started = threading.Event()
+    address = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(create_stub_app(llm_latency, embedding_latency, embedding_dim))
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", port)
+        loop.run_until_complete(site.start())
+        address["port"] = site._server.sockets[0].getsockname()[1]
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return f"http://127.0.0.1:{address['port']}/v1"
+
+# %%
+# --- 2. 부하 테스트 ---
+
+def run_sync(app, queries: List[str]) -> float:
+    """Streamlit 워커처럼 요청을 하나씩 처리 (요청마다 스레드를 끝까지 점유)."""
+    start = time.perf_counter()
+    for query in queries:
+        app.invoke({"query": query})
+    return time.perf_counter() - start
+
+
+async def run_async(app, queries: List[str], concurrency: int) -> float:
+    """하나의 이벤트 루프에서 최대 concurrency개의 세션을 동시에 처리."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(query: str):
+        async with semaphore:
+            await app.ainvoke({"query": query})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(query) for query in queries))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sync vs async 그래프 처리량 비교 (stub OpenAI 서버 사용)")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stub LLM 응답 지연 (초)")
+    parser.add_argument("--embedding-latency", type=float, default=0.1, help="stub 임베딩 응답 지연 (초)")
+    parser.add_argument("--embedding-dim", type=int, default=3072, help="컬렉션의 임베딩 차원과 같아야 함")
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+
+    base_url = start_stub_server(args.llm_latency, args.embedding_latency, args.embedding_dim, args.port)
+    print(f"stub OpenAI 서버: {base_url}")
+
+    # service.py가 import되기 전에 OpenAI 클라이언트가 stub 서버를 보도록 설정
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "stub-key"
+    os.environ.setdefault("EMBEDDING_CACHE_PATH", "./db/load_test_embedding_cache.sqlite")
+    from main_graph import build_graph
+    import service
+
+    # stub 서버는 토큰 길이 제한이 없으므로 tiktoken 토크나이저(첫 실행 시 다운로드)를 건너뜀
+    service.embedding.underlying.check_embedding_ctx_length = False
+
+    app = build_graph()
+    queries = [LOAD_TEST_QUERIES[i % len(LOAD_TEST_QUERIES)] for i in range(args.requests)]
+
+    # 워밍업 (인덱스 로드, 커넥션 생성)
+    app.invoke({"query": queries[0]})
+
+    sync_elapsed = run_sync(app, queries)
+    async_elapsed = asyncio.run(run_async(app, queries, args.concurrency))
+
+    print("\n--- 결과 ---")
+    print(f"sync  (1 스레드, 순차): {sync_elapsed:6.2f}s  {args.requests / sync_elapsed:6.2f} req/s")
+    print(f"async (동시성 {args.concurrency:>3}):   {async_elapsed:6.2f}s  {args.requests / async_elapsed:6.2f} req/s")
+    print(f"처리량 향상: x{sync_elapsed / async_elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,182 @@
 # %%
 from langgraph.graph import StateGraph, START, END
-from typing import Dict, Any
+from langchain_core.runnables import RunnableLambda
+from typing import Callable, Dict, Any, List
+import os
+import time
 
 # --- 1. State 정의 ---
-from state import AgentState
+from state import AgentState, merge_context
 
 # --- 2. 노드 함수 임포트 ---
 
 # 2-1. 시작 및 분기 노드
-from query_analysis import generate_query_analysis, route_query_type
+from query_analysis import (
+    generate_query_analysis,
+    agenerate_query_analysis,
+    generate_query_analysis_combined,
+    agenerate_query_analysis_combined,
+    route_query_type,
+    get_query_analysis_chain,
+    get_combined_query_analysis_chain
+)
 
 # 2-2. 기능 1: 특정 검색 (Specific Search)
-# (format_state_to_string, generate_rag_query, retrieve, generate_answer)
-from specific_search import *
+from specific_search import (
+    format_state_to_string,
+    generate_rag_query,
+    agenerate_rag_query,
+    generate_template_rag_query,
+    retrieve,
+    aretrieve,
+    lookup_title,
+    lookup_title_candidate,
+    generate_answer,
+    agenerate_answer,
+    get_rag_query_generation_chain,
+    get_rag_chain
+)
 
 # 2-3. 기능 2: 유사 추천 (Similar Recommendation)
 from similar_recommendation import (
     retrieve_and_update_rag_context,
-    generate_recommendation_query
+    aretrieve_and_update_rag_context,
+    lookup_title_and_update_rag_context,
+    recommend_from_neighbors,
+    route_similar_recommendation,
+    generate_recommendation_query,
+    agenerate_recommendation_query,
+    get_recommend_query_chain
 )
 
 # 2-4. 기능 3: 광범위 추천 (Broad Recommendation)
 from broad_recommendation import (
     generate_broad_rag_query,
-    retrieve_with_filter
+    agenerate_broad_rag_query,
+    retrieve_with_filter,
+    aretrieve_with_filter,
+    retrieve_with_filter_on_query,
+    aretrieve_with_filter_on_query,
+    prefetch_with_filter_on_query,
+    aprefetch_with_filter_on_query,
+    route_broad_retrieval,
+    get_broad_rag_chain,
+    get_metadata_index
 )
 
+# 2-5. 제목 색인 (작품 제목이 확실하면 벡터 검색 생략)
+from title_index import get_title_index, route_title_lookup
+
+# 2-6. 노드별 지연 / 토큰 / 캐시 계측
+from instrumentation import instrument_graph
+
+# 2-7. 서비스 / 색인 미리 만들기 (warmup)
+from fast_query_analysis import analyze_query_locally
+from item_neighbors import get_item_neighbors
+from context_packing import count_tokens
+import service
+
+# %%
+# specific_search 분기의 RAG 쿼리 생성 방식
+#   'llm'      : generate_rag_query (LLM 호출) - 기존 방식
+#   'template' : QueryDetails로 rag_text 형식의 쿼리를 조립 (LLM 호출 없음)
+#   'combined' : 쿼리 분석 LLM이 구조화 출력으로 rag_query까지 함께 반환 (fast-path 적중 시 template으로 대체)
+RAG_QUERY_MODES = ('llm', 'template', 'combined')
+RAG_QUERY_MODE = os.getenv("RAG_QUERY_MODE", "llm")
+
+# 서로 의존하지 않는 검색을 LLM 쿼리 생성과 병렬로 미리 실행
+# (결과는 prefetched_context에 두었다가 merge_prefetched_context에서 메인 검색 결과 뒤에 붙이고 k개로 자름)
+#   specific: 제목 색인 후보 조회 ∥ generate_rag_query → retrieve
+#   broad   : 원본 쿼리로 필터 검색 ∥ generate_broad_query → retrieve_filtered
+#             (필터 후보가 k개 이하이면 원본 쿼리 필터 검색만 하고 generate_broad_query 생략)
+PARALLEL_RETRIEVAL = os.getenv("PARALLEL_RETRIEVAL", "1") == "1"
+
 # %%
-def build_graph() -> StateGraph:
+def _node(func, afunc) -> RunnableLambda:
+    """
+    동기/비동기 구현을 하나의 노드로 묶습니다.
+    app.invoke()에서는 func, app.ainvoke() / app.astream()에서는 afunc가 실행됩니다.
+    """
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
+
+def _fan_out(route: Callable[[AgentState], str], extra: Dict[str, List[str]]) -> Callable[[AgentState], List[str]]:
+    """route 결과가 extra의 키이면 해당 경로들을 함께 실행하도록 (병렬 분기) 목록으로 바꿉니다."""
+    def fan_out(state: AgentState) -> List[str]:
+        result = route(state)
+        return extra.get(result, [result])
+    fan_out.__name__ = route.__name__
+    return fan_out
+
+
+def merge_prefetched_context(state: AgentState) -> AgentState:
+    """
+    병렬 검색이 모두 끝난 뒤 실행. 메인 검색 결과(context)를 앞에 두고 미리 검색한 결과를 뒤에 붙여
+    retriever와 같은 k개로 자릅니다. (도착 순서와 관계없이 결과 순서 / 개수가 기존 검색과 같음)
+    """
+    return {'context': merge_context(state.get('context'), state.get('prefetched_context'), service.RETRIEVER_K)}
+
+
+def build_graph(rag_query_mode: str = RAG_QUERY_MODE, parallel_retrieval: bool = PARALLEL_RETRIEVAL) -> StateGraph:
     """
     전체 RAG 워크플로우를 위한 LangGraph를 빌드합니다.
+    컴파일된 앱은 동기(invoke / stream)와 비동기(ainvoke / astream) 실행을 모두 지원하며,
+    비동기로 실행하면 하나의 프로세스(이벤트 루프)에서 여러 세션의 요청을 동시에 처리할 수 있습니다.
+
+    Args:
+        rag_query_mode: specific_search 분기의 RAG 쿼리 생성 방식 ('llm' | 'template' | 'combined')
+        parallel_retrieval: LLM 쿼리 생성과 병렬로 추가 검색을 미리 실행할지 여부
     """
+    if rag_query_mode not in RAG_QUERY_MODES:
+        raise ValueError(f"지원하지 않는 rag_query_mode: {rag_query_mode}")
     
     builder = StateGraph(AgentState)
 
     # --- 3. 노드 추가 ---
 
     # 3-1. 시작점 (쿼리 분석)
-    builder.add_node("generate_query_analysis", generate_query_analysis)
+    if rag_query_mode == 'combined':
+        query_analyzer, aquery_analyzer = generate_query_analysis_combined, agenerate_query_analysis_combined
+    else:
+        query_analyzer, aquery_analyzer = generate_query_analysis, agenerate_query_analysis
+    builder.add_node("generate_query_analysis", _node(query_analyzer, aquery_analyzer))
 
     # 3-2. 기능 1 (Specific Search) 브랜치 노드
     # 이 브랜치는 1(format) -> 2(gen_query) -> 3(retrieve) -> 4(answer)
     builder.add_node("format_state_specific", format_state_to_string)
-    builder.add_node("generate_rag_query_specific", generate_rag_query)
-    builder.add_node("retrieve_specific", retrieve)
+    if rag_query_mode == 'llm':
+        builder.add_node("generate_rag_query_specific", _node(generate_rag_query, agenerate_rag_query))
+    else:
+        # template / combined: LLM 왕복 한 번을 줄이기 위해 템플릿(또는 분석 단계의 rag_query) 사용
+        builder.add_node("generate_rag_query_specific", generate_template_rag_query)
+    builder.add_node("retrieve_specific", _node(retrieve, aretrieve))
+    builder.add_node("lookup_title_specific", lookup_title)
+    if parallel_retrieval:
+        builder.add_node("lookup_title_candidate_specific", lookup_title_candidate)
+        builder.add_node("merge_context_specific", merge_prefetched_context)
 
     # 3-3. 기능 2 (Similar Recommendation) 브랜치 노드
     # 이 브랜치는 1(format) -> 2(gen_query) -> 3(retrieve_base) -> 4(gen_rec_query) -> 5(retrieve_similar) -> 6(answer)
     builder.add_node("format_state_similar", format_state_to_string)
-    builder.add_node("generate_rag_query_base", generate_rag_query) # 재사용
-    builder.add_node("retrieve_base_item", retrieve_and_update_rag_context)
-    builder.add_node("generate_recommend_query", generate_recommendation_query)
-    builder.add_node("retrieve_similar_items", retrieve) # 재사용
+    builder.add_node("generate_rag_query_base", _node(generate_rag_query, agenerate_rag_query)) # 재사용
+    builder.add_node("retrieve_base_item", _node(retrieve_and_update_rag_context, aretrieve_and_update_rag_context))
+    builder.add_node("lookup_title_base", lookup_title_and_update_rag_context)
+    builder.add_node("recommend_from_neighbors", recommend_from_neighbors)
+    builder.add_node("generate_recommend_query", _node(generate_recommendation_query, agenerate_recommendation_query))
+    builder.add_node("retrieve_similar_items", _node(retrieve, aretrieve)) # 재사용
 
     # 3-4. 기능 3 (Broad Recommendation) 브랜치 노드
     # 이 브랜치는 1(format) -> 2(gen_broad_query) -> 3(retrieve_filtered) -> 4(answer)
     builder.add_node("format_state_broad", format_state_to_string)
-    builder.add_node("generate_broad_query", generate_broad_rag_query)
-    builder.add_node("retrieve_filtered", retrieve_with_filter)
+    builder.add_node("generate_broad_query", _node(generate_broad_rag_query, agenerate_broad_rag_query))
+    builder.add_node("retrieve_filtered", _node(retrieve_with_filter, aretrieve_with_filter))
+    if parallel_retrieval:
+        builder.add_node("retrieve_filtered_query", _node(prefetch_with_filter_on_query, aprefetch_with_filter_on_query))
+        builder.add_node("merge_context_broad", merge_prefetched_context)
+        builder.add_node("retrieve_filtered_only", _node(retrieve_with_filter_on_query, aretrieve_with_filter_on_query))
 
     # 3-5. 종료점 (공유 노드)
-    builder.add_node("generate_answer", generate_answer)
+    builder.add_node("generate_answer", _node(generate_answer, agenerate_answer))
 
 
     # --- 4. 엣지 연결 ---
@@ -81,30 +197,110 @@ def build_graph() -> StateGraph:
     )
 
     # 4-2. 기능 1 (Specific) 브랜치 엣지
-    builder.add_edge("format_state_specific", "generate_rag_query_specific")
+    # 제목 색인으로 작품이 확실히 특정되면 RAG 쿼리 생성 / 임베딩 / 벡터 검색 없이 바로 답변
+    if parallel_retrieval:
+        # 'vector'일 때 제목 색인 후보 조회를 RAG 쿼리 생성과 함께 실행하고, 둘 다 끝나면 답변 생성
+        builder.add_conditional_edges(
+            "format_state_specific",
+            _fan_out(route_title_lookup, {"vector": ["vector", "candidate"]}),
+            {
+                "direct": "lookup_title_specific",
+                "vector": "generate_rag_query_specific",
+                "candidate": "lookup_title_candidate_specific"
+            }
+        )
+        builder.add_edge(["retrieve_specific", "lookup_title_candidate_specific"], "merge_context_specific")
+        builder.add_edge("merge_context_specific", "generate_answer")
+    else:
+        builder.add_conditional_edges(
+            "format_state_specific",
+            route_title_lookup,
+            {
+                "direct": "lookup_title_specific",
+                "vector": "generate_rag_query_specific"
+            }
+        )
+        builder.add_edge("retrieve_specific", "generate_answer") # 답변 노드로 이동
+    builder.add_edge("lookup_title_specific", "generate_answer")
     builder.add_edge("generate_rag_query_specific", "retrieve_specific")
-    builder.add_edge("retrieve_specific", "generate_answer") # 답변 노드로 이동
 
     # 4-3. 기능 2 (Similar) 브랜치 엣지
-    builder.add_edge("format_state_similar", "generate_rag_query_base")
+    # 기준 작품이 이웃 테이블에 있으면 바로 답변, 제목만 특정되면 벡터 검색 단계만 수행
+    builder.add_conditional_edges(
+        "format_state_similar",
+        route_similar_recommendation,
+        {
+            "neighbors": "recommend_from_neighbors",
+            "direct": "lookup_title_base",
+            "vector": "generate_rag_query_base"
+        }
+    )
+    builder.add_edge("recommend_from_neighbors", "generate_answer")
+    builder.add_edge("lookup_title_base", "generate_recommend_query")
     builder.add_edge("generate_rag_query_base", "retrieve_base_item")
     builder.add_edge("retrieve_base_item", "generate_recommend_query")
     builder.add_edge("generate_recommend_query", "retrieve_similar_items")
     builder.add_edge("retrieve_similar_items", "generate_answer") # 답변 노드로 이동
 
     # 4-4. 기능 3 (Broad) 브랜치 엣지
-    builder.add_edge("format_state_broad", "generate_broad_query")
+    if parallel_retrieval:
+        # 원본 쿼리 필터 검색은 generate_broad_query와 동시에 시작, 두 검색이 모두 끝나면 답변 생성
+        builder.add_conditional_edges(
+            "format_state_broad",
+            _fan_out(route_broad_retrieval, {"generate": ["generate", "query"]}),
+            {
+                "filter_only": "retrieve_filtered_only",
+                "generate": "generate_broad_query",
+                "query": "retrieve_filtered_query"
+            }
+        )
+        builder.add_edge(["retrieve_filtered", "retrieve_filtered_query"], "merge_context_broad")
+        builder.add_edge("merge_context_broad", "generate_answer")
+        builder.add_edge("retrieve_filtered_only", "generate_answer")
+    else:
+        builder.add_edge("format_state_broad", "generate_broad_query")
+        builder.add_edge("retrieve_filtered", "generate_answer") # 답변 노드로 이동
     builder.add_edge("generate_broad_query", "retrieve_filtered")
-    builder.add_edge("retrieve_filtered", "generate_answer") # 답변 노드로 이동
 
     # 4-5. 종료점 설정
     builder.add_edge("generate_answer", END)
     
-    # 5. 그래프 컴파일
+    # 5. 모든 노드를 계측 래퍼로 감싼 뒤 그래프 컴파일 (METRICS_ENABLED=0이면 그대로)
+    instrument_graph(builder)
     app = builder.compile()
+    # 그래프 밖에서 먼저 쿼리를 분석하는 쪽(answer_cache.CachedRagApp)이 같은 분석기를 쓰도록
+    # (combined 모드에서 분석 결과의 rag_query가 그래프로 그대로 넘어가야 함)
+    app.query_analyzer = query_analyzer
+    app.aquery_analyzer = aquery_analyzer
     
     return app
 
+
+def warmup() -> Dict[str, float]:
+    """
+    서비스(LLM / 임베딩 / 벡터 스토어)와 색인, 체인은 처음 사용할 때 만들어지므로
+    첫 요청이 느려지지 않도록 미리 만들어 둡니다. 단계별 걸린 시간(초)을 반환합니다. (app.py에서 그래프 빌드 후 호출)
+    """
+    steps = {
+        "services": service.warmup,
+        "query_vocabulary": lambda: analyze_query_locally("warmup"),
+        "title_index": get_title_index,
+        "metadata_index": get_metadata_index,
+        "item_neighbors": get_item_neighbors,
+        "tokenizer": lambda: count_tokens("warmup"),
+        "chains": lambda: [get_chain() for get_chain in (
+            get_query_analysis_chain, get_combined_query_analysis_chain, get_rag_query_generation_chain,
+            get_recommend_query_chain, get_broad_rag_chain, get_rag_chain
+        )],
+    }
+    timings: Dict[str, float] = {}
+    for name, step in steps.items():
+        start = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - start
+    print("--- warmup: " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()) + " ---")
+    return timings
+
 # %%
 # --- 5. 그래프 실행 테스트 ---
 # if __name__ == "__main__":
@@ -0,0 +1,137 @@
+# metadata_index.py
+
+# %%
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# %%
+# 인덱스에 올리는 필드 (AgentState 키 기준)
+INDEXED_FIELDS = ('genre', 'ott', 'casts', 'director', 'year')
+
+# 메타데이터에 콤마로 이어 붙인 문자열로 저장된 필드 (ingest 노트북 참고)
+JOINED_LIST_FIELDS = ('casts', 'director')
+# 메타데이터에 원핫 컬럼(genre_액션, ott_Netflix ...)으로 저장된 필드
+ONE_HOT_PREFIXES = {'genre': 'genre_', 'ott': 'ott_'}
+
+
+def _normalize_value(field: str, value: Any) -> Any:
+    """인물 이름은 공백 차이를 무시하고, 나머지는 Enum 값/문자열로 통일합니다."""
+    if hasattr(value, 'value'):
+        value = value.value
+    if field in JOINED_LIST_FIELDS and isinstance(value, str):
+        return "".join(value.split())
+    if field == 'year':
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    return value
+
+
+def _bits_to_rows(bits: int) -> List[int]:
+    rows = []
+    while bits:
+        low = bits & -bits
+        rows.append(low.bit_length() - 1)
+        bits ^= low
+    return rows
+
+# %%
+class MetadataIndex:
+    """
+    인물 / 장르 / OTT / 연도 → 문서 ID 집합을 미리 만들어 둔 역색인(inverted index).
+    posting list는 파이썬 int 비트셋으로 저장하므로 AND / OR 연산이 비트 연산 한 번으로 끝납니다.
+
+    Chroma에는 casts / director가 콤마로 이어 붙인 문자열로, genre / ott는 원핫 컬럼으로 저장되어 있어
+    {"casts": {"$eq": "이병헌"}} 같은 필터가 맞지 않는 문제를 이 인덱스로 대신 해결합니다.
+    """
+
+    def __init__(self, ids: Sequence[str], postings: Dict[str, Dict[Any, int]]):
+        self.ids = list(ids)
+        self.postings = postings
+
+    # --- 생성 ---
+    @classmethod
+    def from_metadatas(cls, ids: Sequence[str], metadatas: Iterable[Dict[str, Any]]) -> "MetadataIndex":
+        """컬렉션 메타데이터(ingest 노트북 형식)로 인덱스를 만듭니다."""
+        postings: Dict[str, Dict[Any, int]] = {field: {} for field in INDEXED_FIELDS}
+        for row, metadata in enumerate(metadatas):
+            bit = 1 << row
+            for key, value in (metadata or {}).items():
+                if value is None or value == "":
+                    continue
+                if key in JOINED_LIST_FIELDS:
+                    for item in str(value).split(','):
+                        item = _normalize_value(key, item)
+                        if item:
+                            postings[key][item] = postings[key].get(item, 0) | bit
+                elif key == 'year':
+                    year = _normalize_value('year', value)
+                    if year is not None:
+                        postings['year'][year] = postings['year'].get(year, 0) | bit
+                else:
+                    for field, prefix in ONE_HOT_PREFIXES.items():
+                        if key.startswith(prefix) and value:
+                            name = key[len(prefix):]
+                            postings[field][name] = postings[field].get(name, 0) | bit
+        return cls(ids, postings)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], id_field: str = 'tmdb_id') -> "MetadataIndex":
+        """
+        rag_data.jsonl 레코드로 인덱스를 만듭니다.
+        (컬렉션 문서 ID가 id_field 값(예: tmdb_id)과 같을 때 사용)
+        """
+        ids: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        for record in records:
+            ids.append(str(record.get(id_field)))
+            metadata = {
+                'year': record.get('year'),
+                'casts': ", ".join(record.get('cast') or []),
+                'director': ", ".join(record.get('directors') or []),
+            }
+            for genre in record.get('genres') or []:
+                metadata[f"genre_{genre}"] = 1
+            for ott in record.get('ott_streaming_kr') or []:
+                metadata[f"ott_{ott}"] = 1
+            metadatas.append(metadata)
+        return cls.from_metadatas(ids, metadatas)
+
+    @classmethod
+    def from_vector_store(cls, vector_store) -> "MetadataIndex":
+        """Chroma / NumpyVectorStore의 get()으로 전체 메타데이터를 읽어 인덱스를 만듭니다."""
+        data = vector_store.get(include=['metadatas'])
+        return cls.from_metadatas(data['ids'], data['metadatas'])
+
+    # --- 조회 ---
+    def _field_bits(self, field: str, values: Sequence[Any]) -> int:
+        """한 필드 안의 여러 값은 OR (union)."""
+        bits = 0
+        for value in values:
+            bits |= self.postings.get(field, {}).get(_normalize_value(field, value), 0)
+        return bits
+
+    def candidate_bits(self, state: Dict[str, Any]) -> Optional[int]:
+        """
+        state의 genre / ott / casts / director / year 조건으로 후보 문서 비트셋을 계산합니다.
+        필드 사이는 AND (intersection), 조건이 하나도 없으면 None을 반환합니다.
+        """
+        result: Optional[int] = None
+        for field in INDEXED_FIELDS:
+            values = state.get(field)
+            if values is None or values == [] or values == "":
+                continue
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            bits = self._field_bits(field, values)
+            result = bits if result is None else result & bits
+            if result == 0:
+                break
+        return result
+
+    def candidate_ids(self, state: Dict[str, Any]) -> Optional[List[str]]:
+        """조건에 맞는 문서 ID 목록. (조건이 없으면 None, 맞는 문서가 없으면 빈 리스트)"""
+        bits = self.candidate_bits(state)
+        if bits is None:
+            return None
+        return [self.ids[row] for row in _bits_to_rows(bits)]
@@ -0,0 +1,505 @@
+# numpy_vector_store.py
+
+# %%
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from ingest import INDEX_VERSION_PATH, read_index_info
+from metadata_index import JOINED_LIST_FIELDS, ONE_HOT_PREFIXES
+
+# %%
+# --- 1. 설정 ---
+NUMPY_INDEX_PATH = os.getenv("NUMPY_INDEX_PATH", "./db/numpy_index")
+NUMPY_VECTOR_DTYPE = os.getenv("NUMPY_VECTOR_DTYPE", "float32")   # 'float32' | 'float16'
+# 압축 검색 색인: 압축 코드로 후보 top-N을 고른 뒤 전체 정밀도 벡터로 다시 점수를 매김
+NUMPY_QUANTIZATION = os.getenv("NUMPY_QUANTIZATION", "none")      # 'none' | 'int8' | 'binary'
+NUMPY_INDEX_DIM = int(os.getenv("NUMPY_INDEX_DIM", "0"))           # 0: 전체 차원, N: 앞 N차원만 사용 (Matryoshka)
+NUMPY_RESCORE_CANDIDATES = int(os.getenv("NUMPY_RESCORE_CANDIDATES", "50"))  # 0이면 재채점 없이 압축 점수로 top-k
+# 스냅샷에서 연 스토어가 index_version 파일을 다시 읽는 간격 (초, 바뀌면 Chroma에서 스냅샷을 다시 만들어 교체)
+NUMPY_INDEX_VERSION_CHECK = float(os.getenv("NUMPY_INDEX_VERSION_CHECK", "5"))
+# int8 코드를 float32로 바꿔 점수를 계산할 때 한 번에 처리하는 행 수 (임시 메모리 제한)
+NUMPY_SCORE_BLOCK = 4096
+
+# %%
+@dataclass(frozen=True)
+class _StoreData:
+    """
+    검색에 쓰는 데이터 한 벌. 바꿀 때는 새 객체를 다 만든 뒤 참조 하나만 교체하고,
+    검색은 시작할 때 읽은 객체 하나만 끝까지 사용합니다. (다시 읽는 중에 예전 ids와 새 벡터가 섞이지 않도록)
+    """
+    ids: List[str]
+    texts: List[str]
+    metadatas: List[Dict[str, Any]]
+    vectors: np.ndarray
+    codes: Optional[np.ndarray]
+    code_scales: Optional[np.ndarray]
+    id_to_row: Dict[str, int]
+    masks: Dict[Tuple[str, Any], np.ndarray]
+    numeric_columns: Dict[str, np.ndarray]
+    version: Optional[int] = None   # 스냅샷을 만든 컬렉션 index_version (모르면 None)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    전체 임베딩을 하나의 연속된 float32(선택적으로 float16) 배열에 올려두고
+    행렬-벡터 곱 + argpartition으로 top-k를 찾는 in-process 벡터 스토어.
+    ~1천 개 규모의 카탈로그에서는 Chroma(HNSW + SQLite)보다 시작/질의 비용이 작습니다.
+
+    filter는 Chroma의 where 문법($eq, $ne, $in, $nin, $gt, $gte, $lt, $lte, $and, $or)을 그대로 받으며,
+    'genre' / 'ott'는 원핫 컬럼으로, 'casts' / 'director'는 콤마로 구분된 목록으로 해석합니다.
+    Chroma의 query와 마찬가지로 ids=[...]를 넘기면 해당 문서들 안에서만 검색합니다.
+
+    quantization / index_dim을 지정하면 검색은 압축 코드(앞 index_dim 차원, int8 + 행별 scale 또는 부호 비트)로
+    후보 rescore_candidates개를 고른 뒤 전체 정밀도 벡터로 다시 점수를 매깁니다.
+    스냅샷(load)에서 읽을 때는 전체 벡터를 메모리에 올리지 않고 memmap으로 열어 후보 행만 읽습니다.
+    """
+
+    def __init__(self, embedding: Embeddings, ids: Sequence[str], texts: Sequence[str],
+                 metadatas: Sequence[Dict[str, Any]], vectors: np.ndarray, dtype: str = NUMPY_VECTOR_DTYPE,
+                 quantization: str = NUMPY_QUANTIZATION, index_dim: int = NUMPY_INDEX_DIM,
+                 rescore_candidates: int = NUMPY_RESCORE_CANDIDATES, normalized: bool = False,
+                 index_version: Optional[int] = None):
+        if quantization not in ("none", "int8", "binary"):
+            raise ValueError(f"지원하지 않는 quantization: {quantization}")
+        self.embedding = embedding
+        self.dtype = np.dtype(dtype)
+        self.quantization = quantization
+        self.index_dim = index_dim
+        self.rescore_candidates = rescore_candidates
+        self._reload = None
+        self._set_data(list(ids), list(texts), [dict(m or {}) for m in metadatas], vectors, normalized, index_version)
+
+    # --- 데이터 / 마스크 구성 ---
+    def _set_data(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]], vectors,
+                  normalized: bool = False, version: Optional[int] = None) -> None:
+        if not (normalized and isinstance(vectors, np.ndarray) and vectors.dtype == self.dtype):
+            vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            # 코사인 유사도 = 정규화된 벡터의 내적
+            vectors = np.ascontiguousarray(vectors / norms, dtype=self.dtype)
+        # (normalized: save()로 저장한 스냅샷은 이미 정규화됨, memmap이면 그대로 유지)
+        codes, code_scales = self._build_codes(vectors)
+        masks, numeric_columns = self._build_masks(metadatas)
+        self._data = _StoreData(ids, texts, metadatas, vectors, codes, code_scales,
+                                {doc_id: row for row, doc_id in enumerate(ids)}, masks, numeric_columns, version)
+
+    @property
+    def index_version(self) -> Optional[int]:
+        """지금 검색하는 데이터를 만든 컬렉션 index_version (스냅샷에서 읽지 않았으면 None)"""
+        return self._data.version
+
+    def _coarse_vectors(self, vectors: np.ndarray) -> np.ndarray:
+        """앞 index_dim 차원만 남기고 다시 정규화합니다. (text-embedding-3의 dimensions 축소 출력과 같은 방식)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.index_dim and self.index_dim < vectors.shape[1]:
+            vectors = vectors[:, :self.index_dim]
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors = vectors / norms
+        return vectors
+
+    def _build_codes(self, vectors: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        검색용 압축 코드와 (int8이면) 행별 scale을 만듭니다.
+        (quantization='none'이고 index_dim이 없으면 (None, None): 전체 벡터로 바로 검색)
+        """
+        if self.quantization == "none" and not self.index_dim:
+            return None, None
+        codes, scales = [], []
+        for start in range(0, vectors.shape[0], NUMPY_SCORE_BLOCK):
+            block = self._coarse_vectors(vectors[start:start + NUMPY_SCORE_BLOCK])
+            if self.quantization == "int8":
+                block_scales = np.abs(block).max(axis=1) / 127
+                block_scales[block_scales == 0] = 1.0
+                codes.append(np.round(block / block_scales[:, None]).astype(np.int8))
+                scales.append(block_scales.astype(np.float32))
+            elif self.quantization == "binary":
+                codes.append(np.packbits(block > 0, axis=1))
+            else:
+                codes.append(block.astype(self.dtype))
+        dim = self._coarse_vectors(np.zeros((1, vectors.shape[1]))).shape[1]
+        width = (dim + 7) // 8 if self.quantization == "binary" else dim
+        code_dtype = {"int8": np.int8, "binary": np.uint8}.get(self.quantization, self.dtype)
+        code_scales = None
+        if self.quantization == "int8":
+            code_scales = np.concatenate(scales) if scales else np.zeros(0, dtype=np.float32)
+        return (np.vstack(codes) if codes else np.zeros((0, width), dtype=code_dtype)), code_scales
+
+    @staticmethod
+    def _build_masks(metadatas: List[Dict[str, Any]]) -> Tuple[Dict[Tuple[str, Any], np.ndarray], Dict[str, np.ndarray]]:
+        """필터에 쓰이는 (필드, 값) 조합별 boolean mask와 범위 비교용 숫자 컬럼을 미리 계산합니다."""
+        n = len(metadatas)
+        postings: Dict[Tuple[str, Any], List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            for key, value in metadata.items():
+                if value is None:
+                    continue
+                if key in JOINED_LIST_FIELDS and isinstance(value, str):
+                    for item in value.split(','):
+                        if item.strip():
+                            postings.setdefault((key, item.strip()), []).append(row)
+                    continue
+                for field, prefix in ONE_HOT_PREFIXES.items():
+                    if key.startswith(prefix) and value:
+                        postings.setdefault((field, key[len(prefix):]), []).append(row)
+                if isinstance(value, (str, int, float, bool)):
+                    postings.setdefault((key, value), []).append(row)
+
+        masks: Dict[Tuple[str, Any], np.ndarray] = {}
+        for key, rows in postings.items():
+            mask = np.zeros(n, dtype=bool)
+            mask[rows] = True
+            masks[key] = mask
+        # 범위 비교($gt 등)를 위한 숫자 컬럼
+        numeric_columns: Dict[str, np.ndarray] = {}
+        for field in ('year', 'runtime_min'):
+            column = np.full(n, np.nan)
+            for row, metadata in enumerate(metadatas):
+                value = metadata.get(field)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    column[row] = value
+            numeric_columns[field] = column
+        return masks, numeric_columns
+
+    @staticmethod
+    def _leaf_mask(data: _StoreData, field: str, op: str, value: Any) -> np.ndarray:
+        n = len(data.ids)
+        empty = np.zeros(n, dtype=bool)
+        if op == "$eq":
+            return data.masks.get((field, value), empty)
+        if op == "$ne":
+            return ~data.masks.get((field, value), empty)
+        if op == "$in":
+            return np.logical_or.reduce([data.masks.get((field, v), empty) for v in value] or [empty])
+        if op == "$nin":
+            return ~np.logical_or.reduce([data.masks.get((field, v), empty) for v in value] or [empty])
+        if op in ("$gt", "$gte", "$lt", "$lte"):
+            column = data.numeric_columns.get(field)
+            if column is None:
+                return empty
+            with np.errstate(invalid='ignore'):
+                return {"$gt": column > value, "$gte": column >= value,
+                        "$lt": column < value, "$lte": column <= value}[op]
+        raise ValueError(f"지원하지 않는 필터 연산자: {op}")
+
+    def _filter_mask(self, data: _StoreData, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Chroma where 절을 boolean mask로 변환합니다. (필터가 없으면 None)"""
+        if not where:
+            return None
+        masks = []
+        for key, condition in where.items():
+            if key == "$and":
+                masks.append(np.logical_and.reduce([self._filter_mask(data, c) for c in condition]))
+            elif key == "$or":
+                masks.append(np.logical_or.reduce([self._filter_mask(data, c) for c in condition]))
+            elif isinstance(condition, dict):
+                for op, value in condition.items():
+                    masks.append(self._leaf_mask(data, key, op, value))
+            else:
+                masks.append(self._leaf_mask(data, key, "$eq", condition))
+        return np.logical_and.reduce(masks)
+
+    # --- 검색 ---
+    @staticmethod
+    def _to_document(data: _StoreData, row: int) -> Document:
+        return Document(id=data.ids[row], page_content=data.texts[row], metadata=dict(data.metadatas[row]))
+
+    def _top_k(self, scores: np.ndarray, rows: Optional[np.ndarray], k: int) -> List[Tuple[int, float]]:
+        if scores.shape[0] == 0:
+            return []
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        if rows is not None:
+            return [(int(rows[i]), float(scores[i])) for i in top]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def _search(self, query_vectors: np.ndarray, k: int, filter: Optional[Dict[str, Any]] = None,
+                ids: Optional[Sequence[str]] = None) -> List[List[Tuple[Document, float]]]:
+        """정규화된 질의 벡터 행렬(q x d)로 top-k (Document, score)를 한 번에 계산합니다."""
+        self._check_version()
+        # 검색 도중 다시 읽기가 일어나도 이 검색은 처음 읽은 데이터만 사용
+        data = self._data
+        results = self._search_rows(data, query_vectors, k, filter, ids)
+        return [[(self._to_document(data, row), score) for row, score in hits] for hits in results]
+
+    def _search_rows(self, data: _StoreData, query_vectors: np.ndarray, k: int,
+                     filter: Optional[Dict[str, Any]] = None,
+                     ids: Optional[Sequence[str]] = None) -> List[List[Tuple[int, float]]]:
+        """data에서 top-k (row, score)를 계산합니다."""
+        mask = self._filter_mask(data, filter)
+        if ids is not None:
+            id_mask = np.zeros(len(data.ids), dtype=bool)
+            id_mask[[data.id_to_row[i] for i in ids if i in data.id_to_row]] = True
+            mask = id_mask if mask is None else mask & id_mask
+        rows = None
+        vectors = data.vectors if data.codes is None else None
+        if mask is not None:
+            rows = np.flatnonzero(mask)
+            if vectors is not None:
+                vectors = vectors[rows]
+        if data.codes is None:
+            scores = (query_vectors.astype(self.dtype) @ vectors.T).astype(np.float32)
+            return [self._top_k(row_scores, rows, k) for row_scores in scores]
+
+        # 압축 코드로 후보 top-N → 전체 정밀도 벡터로 재채점
+        coarse = self._coarse_scores(data, query_vectors, rows)
+        n_candidates = max(k, self.rescore_candidates) if self.rescore_candidates else k
+        results = []
+        for query, row_scores in zip(query_vectors, coarse):
+            candidates = self._top_k(row_scores, rows, n_candidates)
+            if not self.rescore_candidates or not candidates:
+                results.append(candidates[:k])
+                continue
+            candidate_rows = np.array([row for row, _ in candidates])
+            exact = np.asarray(data.vectors[candidate_rows], dtype=np.float32) @ query.astype(np.float32)
+            results.append(self._top_k(exact, candidate_rows, k))
+        return results
+
+    def _coarse_scores(self, data: _StoreData, query_vectors: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """압축 코드에 대한 점수 행렬 (q x 행 수). binary는 해밍 거리의 음수"""
+        codes = data.codes if rows is None else data.codes[rows]
+        queries = self._coarse_vectors(query_vectors)
+        if self.quantization == "binary":
+            query_bits = np.packbits(queries > 0, axis=1)
+            return np.stack([-np.bitwise_count(codes ^ bits).sum(axis=1, dtype=np.int32) for bits in query_bits]
+                            ).astype(np.float32).reshape(len(queries), -1)
+        if self.quantization == "int8":
+            scales = data.code_scales if rows is None else data.code_scales[rows]
+            scores = np.empty((len(queries), codes.shape[0]), dtype=np.float32)
+            for start in range(0, codes.shape[0], NUMPY_SCORE_BLOCK):
+                end = start + NUMPY_SCORE_BLOCK
+                scores[:, start:end] = (queries @ codes[start:end].T.astype(np.float32)) * scales[start:end]
+            return scores
+        return (queries.astype(codes.dtype) @ codes.T).astype(np.float32)
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict[str, Any]] = None,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self._search(self._normalize(embedding), k, filter, kwargs.get('ids'))[0]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k, filter, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4,
+                          filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter, **kwargs)]
+
+    def similarity_search_by_vectors(self, embeddings: Sequence[List[float]], k: int = 4,
+                                     filter: Optional[Dict[str, Any]] = None,
+                                     ids: Optional[Sequence[str]] = None) -> List[List[Document]]:
+        """여러 질의 벡터를 행렬 곱 한 번으로 검색합니다. (배치 검색)"""
+        if len(embeddings) == 0:
+            return []
+        results = self._search(self._normalize(embeddings), k, filter, ids)
+        return [[doc for doc, _ in hits] for hits in results]
+
+    def batch_similarity_search(self, queries: Sequence[str], k: int = 4,
+                                filter: Optional[Dict[str, Any]] = None) -> List[List[Document]]:
+        """여러 질의를 embed_documents 한 번 + 행렬 곱 한 번으로 검색합니다."""
+        if not queries:
+            return []
+        return self.similarity_search_by_vectors(self.embedding.embed_documents(list(queries)), k, filter)
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    # --- VectorStore 인터페이스 (추가/조회) ---
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, *,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        data = self._data
+        ids = list(ids) if ids else [str(len(data.ids) + i) for i in range(len(texts))]
+        vectors = np.asarray(self.embedding.embed_documents(texts), dtype=np.float32)
+
+        all_ids, all_texts, all_metadatas = list(data.ids), list(data.texts), list(data.metadatas)
+        all_vectors = data.vectors.astype(np.float32)
+        new_rows = []
+        for doc_id, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+            row = data.id_to_row.get(doc_id)
+            if row is None:
+                all_ids.append(doc_id)
+                all_texts.append(text)
+                all_metadatas.append(dict(metadata or {}))
+                new_rows.append(vector)
+            else:  # 같은 id면 덮어쓰기 (upsert)
+                all_texts[row] = text
+                all_metadatas[row] = dict(metadata or {})
+                all_vectors[row] = vector
+        if new_rows:
+            all_vectors = np.vstack([all_vectors.reshape(-1, vectors.shape[1]), np.asarray(new_rows)])
+        self._set_data(all_ids, all_texts, all_metadatas, all_vectors, version=data.version)
+        return ids
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        data = self._data
+        return [self._to_document(data, data.id_to_row[i]) for i in ids if i in data.id_to_row]
+
+    def get(self, ids: Optional[Sequence[str]] = None,
+            include: Sequence[str] = ('documents', 'metadatas')) -> Dict[str, Any]:
+        """Chroma.get과 같은 형태(ids / documents / metadatas / embeddings)로 반환합니다."""
+        data = self._data
+        rows = range(len(data.ids)) if ids is None else [data.id_to_row[i] for i in ids if i in data.id_to_row]
+        rows = list(rows)
+        result: Dict[str, Any] = {"ids": [data.ids[r] for r in rows]}
+        if 'documents' in include:
+            result['documents'] = [data.texts[r] for r in rows]
+        if 'metadatas' in include:
+            result['metadatas'] = [dict(data.metadatas[r]) for r in rows]
+        if 'embeddings' in include:
+            result['embeddings'] = data.vectors[rows].astype(np.float32)
+        return result
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   *, ids: Optional[List[str]] = None, **kwargs: Any) -> "NumpyVectorStore":
+        texts = list(texts)
+        vectors = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+        ids = list(ids) if ids else [str(i) for i in range(len(texts))]
+        return cls(embedding, ids, texts, metadatas or [{} for _ in texts], vectors, **kwargs)
+
+    # --- Chroma 변환 / 스냅샷 저장 ---
+    @classmethod
+    def from_chroma(cls, chroma_store, dtype: str = NUMPY_VECTOR_DTYPE, **kwargs: Any) -> "NumpyVectorStore":
+        """기존 Chroma 컬렉션의 임베딩을 그대로 가져옵니다. (API 호출 없음, kwargs: quantization / index_dim 등)"""
+        data = chroma_store.get(include=['embeddings', 'documents', 'metadatas'])
+        return cls(chroma_store.embeddings, data['ids'], data['documents'], data['metadatas'],
+                   np.asarray(data['embeddings'], dtype=np.float32), dtype=dtype, **kwargs)
+
+    def save(self, path: str = NUMPY_INDEX_PATH, index_version: int = 0) -> None:
+        """
+        벡터는 .npy, 문서/메타데이터는 .json으로 저장합니다. (.json에 만든 시점의 index_version과 행 수도 기록)
+        임시 파일에 쓴 뒤 교체하므로 다른 프로세스가 반쯤 쓴 스냅샷을 읽지 않습니다.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        data = self._data
+        np.save(f"{tmp}.npy", data.vectors)
+        with open(f"{tmp}.json", "w", encoding="utf-8") as f:
+            json.dump({"index_version": index_version, "count": len(data.ids),
+                       "ids": data.ids, "texts": data.texts, "metadatas": data.metadatas}, f, ensure_ascii=False)
+        os.replace(f"{tmp}.npy", f"{path}.npy")
+        os.replace(f"{tmp}.json", f"{path}.json")
+
+    @classmethod
+    def load(cls, embedding: Embeddings, path: str = NUMPY_INDEX_PATH, dtype: str = NUMPY_VECTOR_DTYPE,
+             quantization: str = NUMPY_QUANTIZATION, index_dim: int = NUMPY_INDEX_DIM,
+             data: Optional[Dict[str, Any]] = None) -> "NumpyVectorStore":
+        # 압축 색인을 쓰면 전체 벡터는 재채점할 후보 행만 읽도록 memmap으로 엶
+        compact = quantization != "none" or bool(index_dim)
+        vectors = np.load(f"{path}.npy", mmap_mode="r" if compact else None)
+        data = data or read_snapshot_info(path)
+        return cls(embedding, data['ids'], data['texts'], data['metadatas'], vectors, dtype=dtype,
+                   quantization=quantization, index_dim=index_dim, normalized=True,
+                   index_version=data.get('index_version'))
+
+    # --- 컬렉션 변경 감지 ---
+    def watch_index_version(self, reload, version_path: str = INDEX_VERSION_PATH,
+                            interval: float = NUMPY_INDEX_VERSION_CHECK) -> None:
+        """
+        검색할 때 interval초마다 index_version을 다시 읽고, 지금 데이터의 버전과 다르면
+        reload()가 돌려준 스토어의 데이터로 교체합니다. (ingest.py로 다시 인덱싱해도 예전 스냅샷을 계속 쓰지 않도록)
+        """
+        self._reload = reload
+        self._version_path = version_path
+        self._version_interval = interval
+        self._version_checked_at = time.monotonic()
+        self._reload_lock = threading.Lock()
+
+    def refresh_index_version(self) -> Optional[int]:
+        """(interval이 지났으면) 컬렉션 버전을 확인해 필요하면 다시 읽은 뒤, 지금 검색하는 데이터의 index_version"""
+        self._check_version()
+        return self._data.version
+
+    def _check_version(self) -> None:
+        if self._reload is None or time.monotonic() - self._version_checked_at < self._version_interval:
+            return
+        with self._reload_lock:
+            if time.monotonic() - self._version_checked_at < self._version_interval:
+                return
+            self._version_checked_at = time.monotonic()
+            version = read_index_info(self._version_path)["version"]
+            if version == self._data.version:
+                return
+            print(f"--- 컬렉션 버전 변경 ({self._data.version} → {version}): NumpyVectorStore 스냅샷 다시 읽기 ---")
+            # 새 데이터를 다 만든 뒤 참조 하나만 교체 (진행 중인 검색은 예전 데이터로 끝남)
+            self._data = self._reload()._data
+
+
+def read_snapshot_info(path: str = NUMPY_INDEX_PATH) -> Optional[Dict[str, Any]]:
+    """스냅샷 .json 내용 (ids / texts / metadatas / index_version / count). 파일이 없으면 None"""
+    if not (os.path.exists(f"{path}.npy") and os.path.exists(f"{path}.json")):
+        return None
+    with open(f"{path}.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _snapshot_is_current(data: Optional[Dict[str, Any]], path: str, info: Dict[str, Any]) -> bool:
+    """스냅샷이 현재 컬렉션(index_version / 문서 수)에서 만든 것이고 .npy와 .json의 행 수가 같으면 True"""
+    if data is None or data.get("index_version") != info["version"]:
+        return False
+    if info["count"] is not None and data.get("count") != info["count"]:
+        return False
+    rows = np.load(f"{path}.npy", mmap_mode="r").shape[0]
+    return rows == len(data.get("ids", [])) == data.get("count")
+
+
+def _load_or_rebuild(embedding: Embeddings, persist_directory: str, collection_name: str,
+                     path: str, version_path: str) -> NumpyVectorStore:
+    info = read_index_info(version_path)
+    data = read_snapshot_info(path)
+    if _snapshot_is_current(data, path, info):
+        return NumpyVectorStore.load(embedding, path, data=data)
+
+    from langchain_chroma import Chroma
+
+    print(f"--- NumpyVectorStore 스냅샷이 없거나 오래됨: Chroma 컬렉션에서 다시 만듦 (index_version {info['version']}) ---")
+    chroma_store = Chroma(
+        embedding_function=embedding,
+        persist_directory=persist_directory,
+        collection_name=collection_name
+    )
+    NumpyVectorStore.from_chroma(chroma_store).save(path, index_version=info["version"])
+    # 저장한 스냅샷을 다시 열어서 (압축 색인이면 memmap) 처음부터 스냅샷을 읽은 것과 같은 상태로 사용
+    return NumpyVectorStore.load(embedding, path)
+
+
+def load_numpy_vector_store(embedding: Embeddings, persist_directory: str, collection_name: str,
+                            path: str = NUMPY_INDEX_PATH,
+                            version_path: str = INDEX_VERSION_PATH) -> NumpyVectorStore:
+    """
+    스냅샷이 현재 컬렉션에서 만든 것이면 바로 읽고(Chroma 미사용), 없거나 index_version / 문서 수가 다르면
+    Chroma 컬렉션에서 다시 가져와 스냅샷을 저장합니다. 실행 중에 index_version이 바뀌어도 다시 읽습니다.
+    """
+    store = _load_or_rebuild(embedding, persist_directory, collection_name, path, version_path)
+    store.watch_index_version(
+        lambda: _load_or_rebuild(embedding, persist_directory, collection_name, path, version_path), version_path)
+    return store
@@ -1,9 +1,11 @@
 # %%
-from typing import Literal
+from functools import lru_cache
+from typing import Literal, Optional
 from langchain_core.prompts import ChatPromptTemplate
 from state import AgentState
 from schemas import *
-from service import llm
+from service import get_llm
+from fast_query_analysis import analyze_query_locally, fast_path_stats, FAST_PATH_THRESHOLD
 
 # %%
 queryDetail_prompt_template = """
@@ -23,17 +25,77 @@ queryDetail_prompt_template = """
 
 # %%
 queryDetail_generate_prompt = ChatPromptTemplate.from_template(queryDetail_prompt_template)
-structed_llm = llm.with_structured_output(QueryDetails)
-query_analysis_chain = queryDetail_generate_prompt | structed_llm
+
+# 체인은 처음 LLM 분석이 필요할 때 만듦 (fast-path로 끝나는 요청은 LLM 객체를 만들지 않음)
+@lru_cache(maxsize=None)
+def get_query_analysis_chain():
+    return queryDetail_generate_prompt | get_llm().with_structured_output(QueryDetails)
 
 # %%
 # --- 테스트 ---
 # test_query = "이병헌이랑 유아인이 나오는 2020년 이후 공상과학 액션 영화 찾아줘. 넷플릭스에 있으면 좋겠어."
-# response_object = query_analysis_chain.invoke({"query": test_query})
+# response_object = get_query_analysis_chain().invoke({"query": test_query})
 
 # print(response_object)
 
 # %%
+# --- rag_query_mode='combined': 쿼리 분석과 RAG 검색 쿼리 생성을 한 번의 LLM 호출로 처리 ---
+combined_prompt_template = queryDetail_prompt_template + """- 'rag_query' 필드에는 벡터 검색에 사용할 쿼리를 작성합니다.
+  검색 대상 문서는 아래와 같은 형식이므로, 쿼리에서 알 수 있는 항목만 같은 형식으로 작성합니다.
+  [제목] 승부
+  [장르] 드라마
+  [줄거리] 바둑 대회, 사제 대결
+  [주요 출연진] 이병헌, 유아인
+  [감독] 김형주
+"""
+
+@lru_cache(maxsize=None)
+def get_combined_query_analysis_chain():
+    return (
+        ChatPromptTemplate.from_template(combined_prompt_template)
+        | get_llm().with_structured_output(QueryDetailsWithRagQuery)
+    )
+
+# %%
+def analyze_query_fast_path(query: str, verbose: bool = True) -> Optional[dict]:
+    """
+    규칙 기반 분석 (fast-path). 확신도가 FAST_PATH_THRESHOLD 이상이면 QueryDetails 필드 dict, 아니면 None
+    (결과는 fast_path_stats에 기록, batch_runner도 같은 판단을 사용)
+    """
+    local_details, confidence = analyze_query_locally(query)
+    hit = confidence >= FAST_PATH_THRESHOLD
+    fast_path_stats.record(hit=hit)
+    if not hit:
+        return None
+    if verbose:
+        print(f"--- 규칙 기반 쿼리 분석 사용 (confidence={confidence:.2f}) ---")
+    return local_details.model_dump()
+
+
+def _analysis_without_llm(state: AgentState) -> Optional[AgentState]:
+    """LLM 없이 끝나는 경우의 결과. None이면 LLM 구조화 출력으로 분석"""
+    # 이미 분석된 state가 들어온 경우 (예: answer_cache.CachedRagApp) 다시 분석하지 않음
+    if state.get('status'):
+        return {}
+    # 규칙 기반 분석 확신도가 충분하면 LLM 호출을 건너뜀
+    return analyze_query_fast_path(state['query'])
+
+
+def _analyze_query(state: AgentState, get_chain) -> AgentState:
+    result = _analysis_without_llm(state)
+    if result is not None:
+        return result
+    # 확신도가 낮으면 기존처럼 LLM 구조화 출력 사용
+    return get_chain().invoke({"query": state['query']}).model_dump()
+
+
+async def _aanalyze_query(state: AgentState, get_chain) -> AgentState:
+    result = _analysis_without_llm(state)
+    if result is not None:
+        return result
+    return (await get_chain().ainvoke({"query": state['query']})).model_dump()
+
+
 def generate_query_analysis(state: AgentState) -> AgentState:
     """
     쿼리에서 영화와 관련된 기본 요소를 분리해서 세부정보를 반환합니다.
@@ -43,11 +105,25 @@ def generate_query_analysis(state: AgentState) -> AgentState:
     Returns:
         state (AgnetState) : title, year, casts 등을 추출해서 담고있는 state
     """
+    return _analyze_query(state, get_query_analysis_chain)
+
+
+async def agenerate_query_analysis(state: AgentState) -> AgentState:
+    """generate_query_analysis의 비동기 버전 (LLM 호출 시 ainvoke 사용)"""
+    return await _aanalyze_query(state, get_query_analysis_chain)
+
+
+def generate_query_analysis_combined(state: AgentState) -> AgentState:
+    """
+    generate_query_analysis와 같지만, LLM을 호출할 때 rag_query까지 함께 받아옵니다.
+    (specific_search 분기에서 generate_rag_query 호출을 생략하기 위한 rag_query_mode='combined')
+    """
+    return _analyze_query(state, get_combined_query_analysis_chain)
 
-    query = state['query']
-    response = query_analysis_chain.invoke({"query": query})
 
-    return response.model_dump()
+async def agenerate_query_analysis_combined(state: AgentState) -> AgentState:
+    """generate_query_analysis_combined의 비동기 버전"""
+    return await _aanalyze_query(state, get_combined_query_analysis_chain)
 
 # %%
 def route_query_type(state: AgentState) -> Literal['specific_search', 'similar_recommendation', 'broad_recommendation']:
@@ -0,0 +1,69 @@
+# rag_client.py
+"""
+server.py(ASGI 서버)의 클라이언트. app.py(Streamlit)는 그래프를 직접 빌드하지 않고 이 모듈로 서버에 질문합니다.
+stream_query는 streaming.stream_graph와 같은 (kind, payload) 이벤트를 내보내므로 UI 코드는 그대로 사용할 수 있습니다.
+    ("progress", "쿼리 분석 중 → 검색 중") / ("token", "...") / ("done", {"answer", "route", "titles", "coalesced"})
+"""
+
+# %%
+import json
+import os
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import httpx
+
+# %%
+# --- 1. 설정 ---
+RAG_SERVER_URL = os.getenv("RAG_SERVER_URL", "http://localhost:8000")
+RAG_CLIENT_TIMEOUT = float(os.getenv("RAG_CLIENT_TIMEOUT", "60"))   # 서버에 넘기는 요청 마감 시간 (초)
+
+
+class RagServerError(Exception):
+    """서버가 요청을 처리하지 못함 (429 혼잡 / 504 마감 초과 / 500 그래프 오류)"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+# %%
+# --- 2. 요청 ---
+
+def stream_query(query: str, url: str = RAG_SERVER_URL,
+                 timeout: float = RAG_CLIENT_TIMEOUT) -> Iterator[Tuple[str, Any]]:
+    """POST /query/stream의 SSE 이벤트를 (kind, payload)로 내보냅니다. error 이벤트는 RagServerError"""
+    payload = {"query": query, "timeout": timeout}
+    # 서버 마감보다 조금 더 기다려야 서버의 마감 초과 이벤트를 받을 수 있음
+    with httpx.stream("POST", f"{url}/query/stream", json=payload, timeout=timeout + 5) as response:
+        if response.status_code == 429:
+            raise RagServerError("서버가 혼잡합니다. 잠시 후 다시 시도해 주세요.", status=429)
+        if response.status_code != 200:
+            response.read()
+            raise RagServerError(response.text, status=response.status_code)
+
+        event = None
+        for line in response.iter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:") and event is not None:
+                data = json.loads(line[len("data:"):].strip())
+                if event == "error":
+                    raise RagServerError(data, status=504 if "deadline" in data else 500)
+                yield event, data
+                if event == "done":
+                    return
+                event = None
+
+
+def query(query: str, url: str = RAG_SERVER_URL, timeout: float = RAG_CLIENT_TIMEOUT) -> Dict[str, Any]:
+    """POST /query (스트리밍 없이 최종 결과만)"""
+    response = httpx.post(f"{url}/query", json={"query": query, "timeout": timeout}, timeout=timeout + 5)
+    if response.status_code != 200:
+        raise RagServerError(response.json().get("error", response.text), status=response.status_code)
+    return response.json()
+
+
+def get_stats(url: str = RAG_SERVER_URL) -> Dict[str, Any]:
+    """GET /stats (답변 캐시 적중률, 분기별 TTFT, 합치기 / 거절 횟수)"""
+    response = httpx.get(f"{url}/stats", timeout=5)
+    response.raise_for_status()
+    return response.json()
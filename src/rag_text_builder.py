@@ -0,0 +1,206 @@
+# rag_text_builder.py
+"""
+output/tmdb_data.jsonl + 한국어 Wikipedia 요약으로 rag_text를 만들어 output/rag_data.jsonl에 저장합니다.
+(data_preprocessing.ipynb의 'RAG용 텍스트 생성' 셀을 대체, rag_text 구성은 노트북과 같음)
+
+    - Wikipedia 요약은 http_cache에 저장 (404 / 동음이의어 페이지도 저장되므로 다시 요청하지 않음)
+    - 작품마다 sleep(0.05) 대신 토큰 버킷(WIKI_RATE_LIMIT) + 스레드 풀로 요청
+    - 출력 파일은 매번 처음부터 다시 씀. rag_text 구성만 바꿨다면 --offline으로 네트워크 없이 몇 초 만에 다시 만들 수 있음
+
+실행 방법:
+    python rag_text_builder.py
+    python rag_text_builder.py --offline        # 저장된 응답만 사용 (없는 요약이 있으면 출력 파일을 바꾸지 않고 실패)
+    python rag_text_builder.py --offline --allow-missing   # 없는 요약은 빈 문자열로 (rag_text가 바뀌어 다시 임베딩될 수 있음)
+"""
+
+# %%
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import quote
+from tqdm import tqdm
+
+from http_cache import HttpCache, OfflineCacheMiss, get_http_cache
+from tmdb_ingest import TokenBucket
+
+# %%
+# --- 1. 설정 ---
+WIKI_API_ENDPOINT = os.getenv("WIKI_API_ENDPOINT", "https://ko.wikipedia.org/api/rest_v1/page/summary/")
+WIKI_WORKERS = int(os.getenv("WIKI_WORKERS", "4"))
+WIKI_RATE_LIMIT = float(os.getenv("WIKI_RATE_LIMIT", "20"))     # 초당 최대 요청 수 (노트북의 sleep 0.05와 같음)
+WIKI_TIMEOUT = float(os.getenv("WIKI_TIMEOUT", "5"))
+USER_AGENT = "OTTBotDataCollector/1.0 (test@example.com)"
+
+INPUT_JSONL = "./output/tmdb_data.jsonl"
+OUTPUT_JSONL = "./output/rag_data.jsonl"
+
+# %%
+# --- 2. Wikipedia 요약 ---
+
+class WikipediaClient:
+    """한국어 Wikipedia 요약 API 클라이언트. 캐시에 없을 때만 요청 수 제한 토큰을 씁니다."""
+
+    def __init__(self, endpoint: str = WIKI_API_ENDPOINT, workers: int = WIKI_WORKERS,
+                 rate: float = WIKI_RATE_LIMIT, cache: Optional[HttpCache] = None):
+        self.endpoint = endpoint
+        self.cache = cache or get_http_cache()
+        self.bucket = TokenBucket(rate)
+        self.offline_misses = 0
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _send(self, url: str, headers: Dict[str, str]) -> requests.Response:
+        self.bucket.acquire()
+        return self.session.get(url, headers=headers, timeout=WIKI_TIMEOUT)
+
+    def summary(self, title_ko: str) -> str:
+        """
+        작품 요약(extract). 문서 없음(404) / 동음이의어 페이지 / 오류는 빈 문자열 (노트북과 같음)
+        offline 모드에서 저장된 응답이 없으면 빈 문자열을 반환하고 offline_misses를 셉니다. (build_rag_data가 판단)
+        """
+        if not title_ko:
+            return ""
+        # 제목을 URL에 맞게 인코딩 (예: "승부" -> "%EC%8A%B9%EB%B6%80")
+        url = self.endpoint + quote(title_ko)
+        try:
+            response = self.cache.fetch("wikipedia", url, headers={"User-Agent": USER_AGENT},
+                                        send=lambda headers: self._send(url, headers))
+        except OfflineCacheMiss:
+            with self._lock:
+                self.offline_misses += 1
+            return ""
+        except requests.exceptions.RequestException:
+            return ""
+        if response.status_code != 200:
+            return ""
+        data = response.json()
+        if data.get('type') == 'disambiguation':
+            return ""
+        return data.get('extract', "")
+
+# %%
+# --- 3. rag_text ---
+
+def build_rag_text(data: Dict[str, Any], wikipedia_summary: str) -> str:
+    """RAG 모델이 잘 이해할 수 있도록 명확한 필드로 텍스트 구성 (노트북과 같은 순서 / 형식)"""
+    title_ko = data.get('title_ko', '')
+    text_blob_parts = [f"[제목] {title_ko}"]
+    if data.get('title_en'):
+        text_blob_parts.append(f"[영문 제목] {data.get('title_en')}")
+    if data.get('overview'):
+        text_blob_parts.append(f"[줄거리] {data.get('overview')}")
+    # Wikipedia 요약이 TMDB 줄거리와 다를 경우에만 추가 (중복 방지)
+    if wikipedia_summary and wikipedia_summary not in (data.get('overview') or ''):
+        text_blob_parts.append(f"[추가 요약] {wikipedia_summary}")
+    if data.get('genres'):
+        text_blob_parts.append(f"[장르] {', '.join(data.get('genres', []))}")
+    if data.get('keywords'):
+        text_blob_parts.append(f"[키워드] {', '.join(data.get('keywords', []))}")
+    if data.get('cast'):
+        text_blob_parts.append(f"[주요 출연진] {', '.join(data.get('cast', []))}")
+    if data.get('directors'):
+        text_blob_parts.append(f"[감독] {', '.join(data.get('directors', []))}")
+    return "\n".join(text_blob_parts)
+
+
+def read_tmdb_records(path: str = INPUT_JSONL) -> List[Dict[str, Any]]:
+    """tmdb_data.jsonl (깨진 줄 / tmdb_id 없는 줄 / 중복 tmdb_id는 건너뜀)"""
+    records, seen = [], set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            tmdb_id = data.get('tmdb_id')
+            if not tmdb_id or tmdb_id in seen:
+                continue
+            seen.add(tmdb_id)
+            records.append(data)
+    return records
+
+# %%
+# --- 4. 실행 ---
+
+def build_rag_data(input_path: str = INPUT_JSONL, output_path: str = OUTPUT_JSONL,
+                   client: Optional[WikipediaClient] = None, workers: int = WIKI_WORKERS,
+                   show_progress: bool = True, allow_missing: bool = False) -> Dict[str, Any]:
+    """
+    tmdb_data.jsonl의 모든 작품에 rag_text를 붙여 output_path를 새로 씁니다.
+    임시 파일에 다 쓴 뒤 교체하므로 중간에 실패해도 기존 rag_data.jsonl은 그대로입니다.
+    offline 모드에서 저장된 Wikipedia 응답이 없는 작품이 있으면 [추가 요약]이 빠져 rag_text(content_hash)가 바뀌므로
+    allow_missing이 아니면 교체하지 않고 OfflineCacheMiss를 발생시킵니다.
+    """
+    client = client or WikipediaClient(workers=workers)
+    records = read_tmdb_records(input_path)
+    counters_before = dict(client.cache.counters)
+    misses_before = client.offline_misses
+    start = time.perf_counter()
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    with_summary = 0
+    with open(tmp_path, "w", encoding="utf-8") as outfile, ThreadPoolExecutor(max_workers=workers) as executor:
+        # map은 입력 순서를 유지하므로 출력 순서가 tmdb_data.jsonl과 같음
+        summaries = executor.map(lambda data: client.summary(data.get('title_ko', '')), records)
+        for data, wikipedia_summary in tqdm(zip(records, summaries), total=len(records),
+                                            desc="Creating RAG text", disable=not show_progress):
+            with_summary += bool(wikipedia_summary)
+            data['rag_text'] = build_rag_text(data, wikipedia_summary)
+            outfile.write(json.dumps(data, ensure_ascii=False) + "\n")
+
+    offline_misses = client.offline_misses - misses_before
+    if offline_misses and not allow_missing:
+        os.remove(tmp_path)
+        raise OfflineCacheMiss(f"저장된 Wikipedia 응답이 없는 작품 {offline_misses}개 "
+                               f"('{output_path}'은 그대로, 빈 요약으로 만들려면 --allow-missing)")
+    os.replace(tmp_path, output_path)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "done": len(records),
+        "with_summary": with_summary,
+        "offline_misses": offline_misses,
+        "cache": {name: client.cache.counters[name] - counters_before.get(name, 0) for name in client.cache.counters},
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tmdb_data.jsonl + Wikipedia 요약 → rag_data.jsonl (응답 캐시 사용)")
+    parser.add_argument("--input", default=INPUT_JSONL)
+    parser.add_argument("--output", default=OUTPUT_JSONL)
+    parser.add_argument("--workers", type=int, default=WIKI_WORKERS)
+    parser.add_argument("--rate", type=float, default=WIKI_RATE_LIMIT, help="초당 최대 요청 수")
+    parser.add_argument("--offline", action="store_true", help="네트워크 없이 http_cache에 저장된 응답만 사용")
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="offline에서 저장된 응답이 없는 요약은 빈 문자열로 만들고 계속 진행")
+    args = parser.parse_args()
+
+    cache = get_http_cache(mode="offline") if args.offline else get_http_cache()
+    client = WikipediaClient(workers=args.workers, rate=args.rate, cache=cache)
+    try:
+        stats = build_rag_data(args.input, args.output, client, workers=args.workers,
+                               allow_missing=args.allow_missing)
+    except OfflineCacheMiss as e:
+        print(f"오류: {e}")
+        sys.exit(1)
+    print(f"--- RAG 텍스트 생성 완료: {stats} ---")
+    if stats["offline_misses"]:
+        print(f"경고: 저장된 Wikipedia 응답이 없는 작품 {stats['offline_misses']}개는 [추가 요약] 없이 만들었습니다.")
+    print(f"최종 RAG 데이터가 '{args.output}' 파일에 저장되었습니다.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# retrieval_cache.py
+"""
+벡터 검색 결과 캐시. (키: k + 메타데이터 필터 / 후보 ids, 값: 최근 질의 벡터별 검색 결과)
+LLM이 만든 rag_query는 사용자마다 표현이 조금씩 달라도 같은 top-k를 가져오는 경우가 많으므로,
+같은 필터로 최근에 검색한 질의 벡터와의 코사인 유사도가 RETRIEVAL_CACHE_THRESHOLD 이상이면 그 결과를 재사용합니다.
+
+    - 필터별로 최근 질의 벡터를 작은 행렬로 들고 있다가 행렬-벡터 곱 한 번으로 가장 가까운 질의를 찾음
+    - 캐시는 스토어가 실제로 검색한 컬렉션 버전(ingest.current_index_version)의 결과만 담고, 버전이 바뀌면 전체를 비움
+      (NumpyVectorStore는 스냅샷을 다시 읽은 뒤에 버전이 바뀌므로 예전 스냅샷의 결과가 새 버전으로 저장되지 않음)
+    - service.py: RETRIEVAL_CACHE_ENABLED=1 이면 get_vector_store()가 이 래퍼를 반환
+      (retriever.invoke / HybridRetriever의 dense 검색 / search_batcher의 배치 검색 모두 이 캐시를 거침)
+"""
+
+# %%
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from ingest import current_index_version
+from search_batcher import search_by_vectors
+
+# %%
+# --- 1. 설정 ---
+RETRIEVAL_CACHE_THRESHOLD = float(os.getenv("RETRIEVAL_CACHE_THRESHOLD", "0.97"))   # 코사인 유사도
+RETRIEVAL_CACHE_MAX_KEYS = int(os.getenv("RETRIEVAL_CACHE_MAX_KEYS", "256"))       # 필터 조합 수 (LRU)
+RETRIEVAL_CACHE_PER_KEY = int(os.getenv("RETRIEVAL_CACHE_PER_KEY", "64"))          # 필터별 최근 질의 벡터 수
+
+
+def make_filter_key(k: int, filter: Optional[Dict[str, Any]] = None, ids: Optional[Sequence[str]] = None) -> str:
+    """
+    같은 문서 집합을 같은 개수만큼 검색하는 요청이면 같은 키가 됩니다.
+    (broad_recommendation은 _build_metadata_filter 대신 메타데이터 색인으로 만든 후보 ids를 넘기므로 ids도 키에 포함)
+    """
+    payload = {"k": k, "filter": filter, "ids": sorted(ids) if ids is not None else None}
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+# %%
+# --- 2. 필터별 최근 질의 벡터 ---
+
+class _Bucket:
+    """한 필터 키의 최근 질의 벡터(정규화, n x d)와 검색 결과. 가득 차면 가장 오래된 것부터 덮어씀"""
+
+    def __init__(self, dim: int, capacity: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.docs: List[Optional[List[Document]]] = [None] * capacity
+        self.size = 0
+        self.next = 0
+
+    def nearest(self, vector: np.ndarray) -> Tuple[float, Optional[List[Document]]]:
+        if self.size == 0:
+            return -1.0, None
+        scores = self.vectors[:self.size] @ vector
+        best = int(np.argmax(scores))
+        return float(scores[best]), self.docs[best]
+
+    def add(self, vector: np.ndarray, docs: List[Document]) -> None:
+        self.vectors[self.next] = vector
+        self.docs[self.next] = docs
+        self.next = (self.next + 1) % len(self.docs)
+        self.size = min(self.size + 1, len(self.docs))
+
+
+class RetrievalCache:
+    def __init__(self, threshold: float = RETRIEVAL_CACHE_THRESHOLD, max_keys: int = RETRIEVAL_CACHE_MAX_KEYS,
+                 per_key: int = RETRIEVAL_CACHE_PER_KEY):
+        self.threshold = threshold
+        self.max_keys = max_keys
+        self.per_key = per_key
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None   # 지금 담긴 결과를 검색한 컬렉션 버전
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self, version: Optional[int]) -> None:
+        """컬렉션 버전이 바뀌었으면 전체를 비웁니다. (호출 쪽에서 lock 보유)"""
+        if version != self._version:
+            if self._buckets:
+                print(f"--- 컬렉션 버전 변경 ({self._version} → {version}): 검색 결과 캐시 초기화 ---")
+            self._version = version
+            self._buckets.clear()
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, key: str, vector: Sequence[float], version: Optional[int] = None) -> Optional[List[Document]]:
+        """version: 지금 스토어가 검색하는 컬렉션 버전 (다르면 예전 결과를 모두 버림)"""
+        with self._lock:
+            self._check_version(version)
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._buckets.move_to_end(key)
+                score, docs = bucket.nearest(self._normalize(vector))
+                if score >= self.threshold:
+                    self.hits += 1
+                    return list(docs)
+            self.misses += 1
+            return None
+
+    def set(self, key: str, vector: Sequence[float], docs: List[Document], version: Optional[int] = None) -> None:
+        """version: docs를 검색한 컬렉션 버전 (그 사이 캐시가 다른 버전으로 바뀌었으면 저장하지 않음)"""
+        vector = self._normalize(vector)
+        with self._lock:
+            if version != self._version:
+                return
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket(vector.shape[0], self.per_key)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(key)
+            bucket.add(vector, list(docs))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+# %%
+# --- 3. 벡터 스토어 래퍼 ---
+
+class CachedVectorStore(VectorStore):
+    """
+    vector_store의 similarity_search 앞에 RetrievalCache를 두는 래퍼.
+    질의는 임베딩(CachedEmbeddings)한 뒤 캐시를 먼저 보고, 미스인 질의만 원래 스토어에서 벡터로 검색합니다.
+    """
+
+    def __init__(self, vector_store: VectorStore, cache: Optional[RetrievalCache] = None):
+        self.vector_store = vector_store
+        self.cache = cache or RetrievalCache()
+
+    def __getattr__(self, name: str):
+        if name == "vector_store":
+            raise AttributeError(name)
+        return getattr(self.vector_store, name)
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.vector_store.embeddings
+
+    def stats(self) -> Dict[str, float]:
+        return self.cache.stats()
+
+    def similarity_search_by_vectors(self, embeddings: Sequence[List[float]], k: int = 4,
+                                     filter: Optional[Dict[str, Any]] = None,
+                                     ids: Optional[Sequence[str]] = None) -> List[List[Document]]:
+        """search_batcher.BatchingVectorStore가 모은 질의도 캐시를 거친 뒤 미스만 다중 질의 검색으로 넘깁니다."""
+        key = make_filter_key(k, filter, ids)
+        version = current_index_version(self.vector_store)
+        results: List[Optional[List[Document]]] = [self.cache.get(key, vector, version) for vector in embeddings]
+        misses = [i for i, docs in enumerate(results) if docs is None]
+        if misses:
+            found = search_by_vectors(self.vector_store, [embeddings[i] for i in misses], k, filter, ids)
+            # 검색 도중 스토어가 다른 버전으로 바뀌었으면 결과는 돌려주되 캐시에는 넣지 않음
+            cacheable = current_index_version(self.vector_store) == version
+            for i, docs in zip(misses, found):
+                if cacheable:
+                    self.cache.set(key, embeddings[i], docs, version)
+                results[i] = docs
+        return results
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                          **kwargs: Any) -> List[Document]:
+        vector = self.vector_store.embeddings.embed_query(query)
+        return self.similarity_search_by_vectors([vector], k, filter, kwargs.get("ids"))[0]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vectors([embedding], k, filter, kwargs.get("ids"))[0]
+
+    # --- 점수가 필요한 검색 / 추가는 캐시 없이 그대로 전달 ---
+    def similarity_search_with_score(self, *args: Any, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.vector_store.similarity_search_with_score(*args, **kwargs)
+
+    def _select_relevance_score_fn(self):
+        return self.vector_store._select_relevance_score_fn()
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        # 같은 프로세스에서 문서가 추가되면 index_version을 기다리지 않고 바로 비움
+        self.cache.clear()
+        return self.vector_store.add_texts(texts, metadatas, **kwargs)
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        return self.vector_store.get_by_ids(ids)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   **kwargs: Any) -> "CachedVectorStore":
+        raise NotImplementedError("CachedVectorStore는 기존 벡터 스토어를 감싸서 사용합니다.")
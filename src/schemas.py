@@ -56,4 +56,14 @@ class QueryDetails(BaseModel):
         None, 
         description="쿼리에서 언급된 OTT 플랫폼 목록. 반드시 스키마에 정의된 허용된 값 중에서만 선택해야 함."
     )
-    info: Optional[str] = Field(None, description="기타 줄거리 관련 키워드")
\ No newline at end of file
+    info: Optional[str] = Field(None, description="기타 줄거리 관련 키워드")
+
+# %%
+class QueryDetailsWithRagQuery(QueryDetails):
+    """
+    쿼리 분석과 RAG 검색 쿼리 생성을 LLM 호출 한 번으로 처리하기 위한 스키마 (rag_query_mode='combined')
+    """
+    rag_query: Optional[str] = Field(
+        None,
+        description="벡터 검색용 쿼리. 문서(rag_text)와 같은 '[제목] ...\\n[장르] ...\\n[주요 출연진] ...\\n[감독] ...' 형식으로 작성"
+    )
@@ -0,0 +1,181 @@
+# search_batcher.py
+"""
+동시에 들어온 벡터 검색 요청을 잠깐(SEARCH_BATCH_WINDOW_MS) 모아서 한 번에 처리하는 벡터 스토어 래퍼.
+    - 질의 임베딩: 요청마다 embed_query를 부르지 않고 모인 질의 전체를 embed_documents 한 번으로 계산
+    - 검색: 같은 (k, filter, ids) 요청끼리 묶어 다중 질의 검색 한 번으로 처리
+      (NumpyVectorStore: 행렬 곱 한 번 / Chroma: collection.query(query_embeddings=[...]) 한 번)
+
+그래프 노드는 그대로 retriever.invoke(query)를 호출합니다. 여러 요청이 동시에 실행될 때
+(batch_runner.py의 app.batch, 동시 사용자) 가장 먼저 도착한 요청이 창(window) 동안 기다렸다가
+모인 요청을 대신 실행하고(leader), 나머지 요청은 결과를 받을 때까지 기다립니다.
+
+    service.py: SEARCH_BATCH_WINDOW_MS > 0 이면 get_vector_store()가 이 래퍼를 반환
+"""
+
+# %%
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# %%
+# --- 1. 다중 질의 검색 ---
+
+def search_by_vectors(vector_store: VectorStore, vectors: Sequence[List[float]], k: int,
+                      filter: Optional[Dict[str, Any]] = None,
+                      ids: Optional[Sequence[str]] = None) -> List[List[Document]]:
+    """질의 벡터 여러 개를 가능한 한 번의 검색 호출로 처리합니다. (지원하지 않는 스토어는 질의별 검색)"""
+    # NumpyVectorStore / retrieval_cache.CachedVectorStore
+    if hasattr(vector_store, "similarity_search_by_vectors"):
+        return vector_store.similarity_search_by_vectors(vectors, k, filter, ids=ids)
+
+    collection = getattr(vector_store, "_collection", None)
+    if collection is not None:
+        # Chroma: 여러 query_embeddings를 한 번의 query로 검색
+        query_kwargs: Dict[str, Any] = {"query_embeddings": list(vectors), "n_results": k,
+                                        "include": ["documents", "metadatas"]}
+        if filter:
+            query_kwargs["where"] = filter
+        if ids is not None:
+            query_kwargs["ids"] = list(ids)
+        results = collection.query(**query_kwargs)
+        return [
+            [Document(id=doc_id, page_content=text, metadata=metadata or {})
+             for doc_id, text, metadata in zip(row_ids, row_texts, row_metadatas)]
+            for row_ids, row_texts, row_metadatas in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+
+    kwargs = {"ids": ids} if ids is not None else {}
+    return [vector_store.similarity_search_by_vector(vector, k, filter=filter, **kwargs) for vector in vectors]
+
+# %%
+# --- 2. 요청 모으기 ---
+
+class _SearchRequest:
+    __slots__ = ("query", "k", "filter", "ids", "result", "error", "done")
+
+    def __init__(self, query: str, k: int, filter: Optional[Dict[str, Any]], ids: Optional[Sequence[str]]):
+        self.query = query
+        self.k = k
+        self.filter = filter
+        self.ids = ids
+        self.result: List[Document] = []
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+    def group_key(self) -> Tuple[int, str, Optional[Tuple[str, ...]]]:
+        filter_key = json.dumps(self.filter, sort_keys=True, ensure_ascii=False) if self.filter else ""
+        return self.k, filter_key, tuple(self.ids) if self.ids is not None else None
+
+
+class BatchingVectorStore(VectorStore):
+    """
+    vector_store의 similarity_search를 micro-batch로 묶는 래퍼. 그 외 메서드(get, add_texts 등)는 원래 스토어로 넘깁니다.
+    window_ms 동안(또는 max_batch개가 모일 때까지) 기다렸다가 모인 요청을 한 번에 임베딩 / 검색합니다.
+    """
+
+    def __init__(self, vector_store: VectorStore, window_ms: float, max_batch: int):
+        self.vector_store = vector_store
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._pending: List[_SearchRequest] = []
+        self._leader_waiting = False
+        self.batches = 0
+        self.requests = 0
+
+    def __getattr__(self, name: str):
+        # get / get_by_ids / _collection 등 래핑하지 않은 속성은 원래 스토어 것을 사용
+        if name == "vector_store":
+            raise AttributeError(name)
+        return getattr(self.vector_store, name)
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.vector_store.embeddings
+
+    def stats(self) -> Dict[str, float]:
+        return {"requests": self.requests, "batches": self.batches,
+                "avg_batch_size": self.requests / self.batches if self.batches else 0.0}
+
+    def _take_batch(self, request: _SearchRequest) -> Optional[List[_SearchRequest]]:
+        """요청을 대기열에 넣고, 이 요청이 leader가 되면 모인 요청 목록을 반환합니다. (follower면 None)"""
+        with self._cond:
+            self._pending.append(request)
+            if self._leader_waiting:
+                if len(self._pending) >= self.max_batch:
+                    self._cond.notify_all()
+                return None
+
+            self._leader_waiting = True
+            deadline = time.monotonic() + self.window
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._pending = self._pending, []
+            self._leader_waiting = False
+            return batch
+
+    def _run_batch(self, batch: List[_SearchRequest]) -> None:
+        try:
+            # 1. 질의 임베딩: 중복 질의를 제외하고 embed_documents 한 번
+            queries = list(dict.fromkeys(request.query for request in batch))
+            vectors = dict(zip(queries, self.vector_store.embeddings.embed_documents(queries)))
+
+            # 2. 같은 (k, filter, ids) 요청끼리 다중 질의 검색 한 번
+            groups: Dict[Any, List[_SearchRequest]] = defaultdict(list)
+            for request in batch:
+                groups[request.group_key()].append(request)
+            for requests in groups.values():
+                first = requests[0]
+                results = search_by_vectors(self.vector_store, [vectors[r.query] for r in requests],
+                                            first.k, first.filter, first.ids)
+                for request, docs in zip(requests, results):
+                    request.result = docs
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        finally:
+            self.batches += 1
+            self.requests += len(batch)
+            for request in batch:
+                request.done.set()
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                          **kwargs: Any) -> List[Document]:
+        request = _SearchRequest(query, k, filter, kwargs.get("ids"))
+        batch = self._take_batch(request)
+        if batch is not None:
+            self._run_batch(batch)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    # --- 점수가 필요한 검색 / 벡터 검색은 모으지 않고 그대로 전달 ---
+    def similarity_search_with_score(self, *args: Any, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.vector_store.similarity_search_with_score(*args, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.vector_store.similarity_search_by_vector(embedding, k, **kwargs)
+
+    def _select_relevance_score_fn(self):
+        return self.vector_store._select_relevance_score_fn()
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        return self.vector_store.add_texts(texts, metadatas, **kwargs)
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        return self.vector_store.get_by_ids(ids)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   **kwargs: Any) -> "BatchingVectorStore":
+        raise NotImplementedError("BatchingVectorStore는 기존 벡터 스토어를 감싸서 사용합니다.")
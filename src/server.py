@@ -0,0 +1,382 @@
+# server.py
+"""
+그래프(build_graph + answer_cache.CachedRagApp)를 HTTP로 제공하는 ASGI 서버. Streamlit(app.py)은 이 서버의 클라이언트입니다.
+
+    POST /query          {"query": "...", "timeout": 30}  → {"answer", "route", "titles", "coalesced"}
+    POST /query/stream   같은 요청, SSE로 progress / token / done / error 이벤트 (streaming.stream_graph와 같은 순서)
+    GET  /healthz        실행 중 / 대기 중 요청 수
+    GET  /stats          서버 카운터 + 답변 캐시 적중률 + 분기별 TTFT
+    GET  /metrics        Prometheus 텍스트 형식 (instrumentation.render_prometheus)
+
+    - 요청 합치기(singleflight): 정규화한 질문이 같은 요청이 이미 실행 중이면 그래프를 다시 실행하지 않고
+      같은 실행의 이벤트를 받음 (이미 나온 토큰부터 다시 보내 줌). 끝난 뒤의 같은 질문은 답변 캐시가 처리
+    - 백프레셔: 그래프는 이벤트 루프에서 비동기(CachedRagApp.astream)로 최대 SERVER_WORKERS개를 동시에 실행하고,
+      실행 + 대기 중인 (서로 다른) 질문이 SERVER_WORKERS + SERVER_QUEUE_SIZE개를 넘으면 바로 429 (Retry-After)
+    - 마감 시간: 요청마다 timeout(최대 SERVER_DEADLINE초). 넘으면 JSON은 504, SSE는 error 이벤트.
+      기다리는 요청이 모두 마감을 넘기거나 연결을 끊으면 대기열에서 꺼낼 때 / 노드 사이에서 실행을 멈춤
+
+합치기 / 대기열은 프로세스 단위입니다. 여러 프로세스(uvicorn --workers, 여러 인스턴스 + 로드 밸런서)로 늘릴 때는
+같은 질문이 같은 프로세스로 가도록 질문 기준 라우팅을 하거나, 답변 캐시를 공유(ANSWER_CACHE_BACKEND=sqlite)하면 됩니다.
+
+실행 방법:
+    python server.py                      # http://0.0.0.0:8000
+    uvicorn server:app --port 8000
+"""
+
+# %%
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from answer_cache import normalize_query
+from instrumentation import METRICS_PORT, render_prometheus, start_metrics_server
+from streaming import ttft_recorder
+
+# %%
+# --- 1. 설정 ---
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "8"))          # 동시에 실행하는 그래프 수 (이벤트 루프의 동시 실행 한도)
+SERVER_QUEUE_SIZE = int(os.getenv("SERVER_QUEUE_SIZE", "32"))   # 실행을 기다릴 수 있는 질문 수 (넘으면 429)
+SERVER_DEADLINE = float(os.getenv("SERVER_DEADLINE", "60"))     # 요청 하나의 최대 시간 (초)
+SERVER_COALESCE = os.getenv("SERVER_COALESCE", "1") == "1"      # 0이면 같은 질문도 따로 실행
+
+TERMINAL_EVENTS = ("done", "error")
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def coalesce_key(query: str) -> str:
+    """대소문자 / 공백 / 문장부호만 다른 질문은 같은 키 ("승부 알려줘" == "승부 알려줘?")"""
+    return normalize_query(query)
+
+
+def summarize_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """최종 state에서 클라이언트에 보낼 부분만 (Document는 JSON으로 보낼 수 없으므로 제목만)"""
+    from query_analysis import route_query_type
+
+    return {
+        "answer": state.get("answer") or "",
+        "route": route_query_type(state) if state.get("status") else None,
+        "titles": [doc.metadata.get("title_ko") for doc in state.get("context") or []],
+    }
+
+# %%
+# --- 2. 실행 하나 (같은 질문의 요청들이 공유) ---
+
+class _Flight:
+    """그래프 실행 하나의 이벤트 기록과 구독자 큐. (이벤트 추가 / 구독은 이벤트 루프에서만)"""
+
+    def __init__(self, key: str, query: str, deadline: float):
+        self.key = key
+        self.query = query
+        self.deadline = deadline
+        self.events: List[Tuple[str, Any]] = []
+        self.queues: List[asyncio.Queue] = []
+        self.finished = False
+
+    def subscribe(self, deadline: float) -> asyncio.Queue:
+        # 실행은 가장 늦은 구독자의 마감까지 계속
+        self.deadline = max(self.deadline, deadline)
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in self.events:
+            queue.put_nowait(event)
+        self.queues.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        if queue in self.queues:
+            self.queues.remove(queue)
+
+    def abandoned(self) -> bool:
+        """기다리는 요청이 없거나 모두 마감을 넘김 → 더 실행할 필요 없음"""
+        return not self.queues or time.monotonic() > self.deadline
+
+# %%
+# --- 3. ASGI 앱 ---
+
+class RagServer:
+    def __init__(self, rag_app=None, workers: int = SERVER_WORKERS, queue_size: int = SERVER_QUEUE_SIZE,
+                 deadline: float = SERVER_DEADLINE, coalesce: bool = SERVER_COALESCE):
+        self.rag_app = rag_app
+        self.capacity = workers + queue_size
+        self.deadline = deadline
+        self.coalesce = coalesce
+        self.workers = workers
+        self._slots: Optional[asyncio.Semaphore] = None   # 이벤트 루프에서 처음 필요할 때 생성
+        self._tasks: Set[asyncio.Task] = set()
+        self._flights: Dict[str, _Flight] = {}
+        self._flight_seq = 0
+        self._app_lock = threading.Lock()
+        self.running = 0
+        self.counters: Dict[str, int] = {"requests": 0, "executions": 0, "coalesced": 0, "rejected": 0,
+                                         "timeouts": 0, "abandoned": 0, "errors": 0}
+
+    def get_rag_app(self):
+        """그래프는 처음 필요할 때 한 번만 빌드합니다. (lifespan startup에서 미리 호출)"""
+        with self._app_lock:
+            if self.rag_app is None:
+                from answer_cache import CachedRagApp
+                from main_graph import build_graph, warmup
+
+                self.rag_app = CachedRagApp(build_graph())
+                warmup()
+            return self.rag_app
+
+    def _count(self, name: str, delta: int = 1) -> None:
+        # 이벤트 루프에서만 갱신하므로 락이 필요 없음
+        if name == "running":
+            self.running += delta
+        else:
+            self.counters[name] += delta
+
+    # --- 요청 합치기 / 대기열 ---
+    def _join(self, query: str, deadline: float) -> Optional[Tuple[_Flight, asyncio.Queue, bool]]:
+        """실행 중인 같은 질문에 합류하거나 새 실행을 대기열에 넣습니다. 자리가 없으면 None"""
+        self._count("requests")
+        key = coalesce_key(query)
+        flight = self._flights.get(key) if self.coalesce else None
+        if flight is not None:
+            self._count("coalesced")
+            return flight, flight.subscribe(deadline), True
+
+        if len(self._flights) >= self.capacity:
+            self._count("rejected")
+            return None
+        if not self.coalesce:
+            # 합치지 않을 때는 요청마다 다른 키
+            self._flight_seq += 1
+            key = f"{key}#{self._flight_seq}"
+        flight = self._flights[key] = _Flight(key, query, deadline)
+        queue = flight.subscribe(deadline)
+        self._count("executions")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        task = asyncio.ensure_future(self._run_flight(flight))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return flight, queue, False
+
+    def _publish(self, flight: _Flight, kind: str, payload: Any) -> None:
+        if flight.finished:
+            return
+        flight.events.append((kind, payload))
+        for queue in flight.queues:
+            queue.put_nowait((kind, payload))
+        if kind in TERMINAL_EVENTS:
+            flight.finished = True
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    async def _run_flight(self, flight: _Flight) -> None:
+        """CachedRagApp.astream 이벤트를 구독자에게 넘깁니다. (동시 실행은 SERVER_WORKERS개까지, 나머지는 대기)"""
+        async with self._slots:
+            if flight.abandoned():
+                self._count("abandoned")
+                self._publish(flight, "error", "deadline exceeded before start")
+                return
+
+            self._count("running")
+            stream = None
+            try:
+                rag_app = self.rag_app
+                if rag_app is None:
+                    # lifespan 없이 띄운 경우: 그래프 빌드 / warmup이 이벤트 루프를 막지 않도록 스레드에서
+                    rag_app = await asyncio.get_running_loop().run_in_executor(None, self.get_rag_app)
+                stream = rag_app.astream({"query": flight.query})
+                async for kind, payload in stream:
+                    if kind == "done":
+                        self._publish(flight, "done", summarize_state(payload))
+                        break
+                    self._publish(flight, kind, payload)
+                    if flight.abandoned():
+                        raise DeadlineExceeded()
+            except DeadlineExceeded:
+                self._count("abandoned")
+                print(f"--- 마감 초과 / 연결 종료로 실행 중단: {flight.query} ---")
+                self._publish(flight, "error", "deadline exceeded")
+            except asyncio.CancelledError:
+                self._publish(flight, "error", "server shutting down")
+                raise
+            except Exception as e:
+                self._count("errors")
+                print(f"--- 그래프 실행 오류: {type(e).__name__}: {e} ---")
+                self._publish(flight, "error", f"{type(e).__name__}: {e}")
+            finally:
+                if stream is not None:
+                    await stream.aclose()
+                self._count("running", -1)
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {**self.counters, "running": self.running,
+                                 "in_flight": len(self._flights), "capacity": self.capacity}
+        if self.rag_app is not None and hasattr(self.rag_app, "stats"):
+            stats["answer_cache"] = self.rag_app.stats()
+        stats["ttft"] = ttft_recorder.summary()
+        return stats
+
+    # --- ASGI ---
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        method, path = scope["method"], scope["path"]
+        if method == "POST" and path in ("/query", "/query/stream"):
+            await self._handle_query(receive, send, stream=path == "/query/stream")
+        elif method == "GET" and path == "/healthz":
+            await _send_json(send, 200, {"status": "ok", "running": self.running,
+                                         "in_flight": len(self._flights), "capacity": self.capacity})
+        elif method == "GET" and path == "/stats":
+            await _send_json(send, 200, self.stats())
+        elif method == "GET" and path == "/metrics":
+            await _send_body(send, 200, render_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            await _send_json(send, 404, {"error": "not found"})
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, self.get_rag_app)
+                    if METRICS_PORT:
+                        # /metrics는 이 서버에도 있지만, 별도 포트로 수집하던 설정도 그대로 지원
+                        start_metrics_server(METRICS_PORT)
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for task in list(self._tasks):
+                    task.cancel()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _handle_query(self, receive, send, stream: bool) -> None:
+        try:
+            body = json.loads(await _read_body(receive) or b"{}")
+            query = str(body["query"]).strip()
+            timeout = min(float(body.get("timeout") or self.deadline), self.deadline)
+        except (ValueError, KeyError, TypeError):
+            await _send_json(send, 400, {"error": 'body must be JSON {"query": "...", "timeout": seconds}'})
+            return
+        if not query:
+            await _send_json(send, 400, {"error": "empty query"})
+            return
+
+        deadline = time.monotonic() + timeout
+        joined = self._join(query, deadline)
+        if joined is None:
+            await _send_json(send, 429, {"error": "server busy"}, headers=[(b"retry-after", b"1")])
+            return
+
+        flight, queue, coalesced = joined
+        # 클라이언트가 연결을 끊으면 구독을 해제 (모두 끊기면 실행도 멈춤)
+        disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+        try:
+            if stream:
+                await self._stream_events(send, queue, deadline, disconnected, coalesced)
+            else:
+                await self._send_result(send, queue, deadline, disconnected, coalesced)
+        finally:
+            flight.unsubscribe(queue)
+            disconnected.cancel()
+
+    async def _next_event(self, queue: asyncio.Queue, deadline: float,
+                          disconnected: asyncio.Future) -> Optional[Tuple[str, Any]]:
+        """다음 이벤트. 마감을 넘기면 DeadlineExceeded, 연결이 끊기면 None"""
+        getter = asyncio.ensure_future(queue.get())
+        done, _ = await asyncio.wait({getter, disconnected}, timeout=max(0.0, deadline - time.monotonic()),
+                                     return_when=asyncio.FIRST_COMPLETED)
+        if getter in done:
+            return getter.result()
+        getter.cancel()
+        if disconnected in done:
+            return None
+        self._count("timeouts")
+        raise DeadlineExceeded()
+
+    async def _send_result(self, send, queue, deadline, disconnected, coalesced: bool) -> None:
+        try:
+            while True:
+                event = await self._next_event(queue, deadline, disconnected)
+                if event is None:
+                    return
+                kind, payload = event
+                if kind == "done":
+                    await _send_json(send, 200, {**payload, "coalesced": coalesced})
+                    return
+                if kind == "error":
+                    await _send_json(send, 504 if "deadline" in payload else 500, {"error": payload})
+                    return
+        except DeadlineExceeded:
+            await _send_json(send, 504, {"error": "deadline exceeded"})
+
+    async def _stream_events(self, send, queue, deadline, disconnected, coalesced: bool) -> None:
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream; charset=utf-8"),
+                                (b"cache-control", b"no-cache")]})
+        try:
+            while True:
+                event = await self._next_event(queue, deadline, disconnected)
+                if event is None:
+                    return
+                kind, payload = event
+                if kind == "done":
+                    payload = {**payload, "coalesced": coalesced}
+                await send({"type": "http.response.body", "body": _sse(kind, payload), "more_body": True})
+                if kind in TERMINAL_EVENTS:
+                    break
+        except DeadlineExceeded:
+            await send({"type": "http.response.body", "body": _sse("error", "deadline exceeded"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+# %%
+# --- 4. ASGI 헬퍼 ---
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _wait_disconnect(receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _send_body(send, status: int, body: bytes, content_type: str,
+                     headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", content_type.encode()),
+                            (b"content-length", str(len(body)).encode()), *(headers or [])]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status: int, payload: Any, headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await _send_body(send, status, body, "application/json; charset=utf-8", headers)
+
+
+def _sse(kind: str, payload: Any) -> bytes:
+    return f"event: {kind}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+app = RagServer()
+
+# %%
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT)
@@ -1,20 +1,173 @@
 # services.py
+"""
+LLM / 임베딩 / 벡터 스토어 / retriever를 처음 사용할 때 한 번만 만드는 서비스 레지스트리.
+모듈 import만으로는 OpenAI 클라이언트나 Chroma에 접근하지 않습니다. (langchain_openai / langchain_chroma import도 생성 시점으로 미룸)
+
+    get_llm(), get_embedding(), get_vector_store(), get_retriever()   # 노드 모듈에서 호출 시점에 사용
+    warmup()                                                          # 첫 요청 전에 미리 생성 (main_graph.warmup)
+
+기존 코드와의 호환을 위해 service.llm / service.embedding / service.vector_store / service.retriever
+속성 접근도 해당 getter로 연결됩니다.
+"""
+
+import os
+import time
+from functools import lru_cache
 
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_chroma import Chroma
+
+from embedding_cache import CachedEmbeddings
+from instrumentation import MetricsCallbackHandler
 
 load_dotenv()
 
-# --- 1. LLM 및 Embedding 초기화 ---
-llm = ChatOpenAI(model="gpt-5")
-embedding = OpenAIEmbeddings(model='text-embedding-3-large')
+CHROMA_PERSIST_DIRECTORY = './db/chromaDB2'
+CHROMA_COLLECTION_NAME = 'movie_rag_collection'
+# 'chroma' | 'numpy' (numpy: 전체 임베딩을 메모리 배열에 올려 brute-force 검색)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+# 'dense'  : 벡터 검색만 (기존 방식)
+# 'hybrid' : BM25(sparse_index.py) + 벡터 검색을 RRF로 합침. 질의에 인물 이름 / 제목이 그대로 있으면 BM25만 사용
+# 'sparse' : BM25만 (임베딩 API 호출 없음)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense")
+# 'openai' | 'fake' (fake: fake_services.py의 가짜 LLM / 해시 임베딩과 rag_data.jsonl로 만든 로컬 벡터 스토어, API 호출 없음)
+SERVICE_BACKEND = os.getenv("SERVICE_BACKEND", "openai")
+
+# OpenAI 호출에 공유하는 커넥션 풀 (keep-alive 재사용, 동시 연결 수 제한)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+
+# 동시에 들어온 벡터 검색을 모으는 시간(ms)과 최대 개수 (search_batcher.py, 0이면 요청마다 바로 검색)
+SEARCH_BATCH_WINDOW_MS = float(os.getenv("SEARCH_BATCH_WINDOW_MS", "0"))
+SEARCH_BATCH_SIZE = int(os.getenv("SEARCH_BATCH_SIZE", "64"))
+# 비슷한 질의 벡터 + 같은 필터의 검색 결과 재사용 (retrieval_cache.py, 임계값 등은 RETRIEVAL_CACHE_*)
+RETRIEVAL_CACHE_ENABLED = os.getenv("RETRIEVAL_CACHE_ENABLED", "1") == "1"
+RETRIEVER_K = 3     # 검색 결과 문서 수 (병렬 검색 결과를 합칠 때도 이 개수로 자름)
+# text-embedding-3의 축소 출력 차원 (빈 값: 모델 기본 3072차원)
+# 바꾸면 컬렉션을 같은 차원으로 다시 인덱싱해야 함 (ingest.py). 인덱싱 없이 줄이려면 NUMPY_INDEX_DIM 사용
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+
+# --- 1. HTTP 클라이언트 ---
+@lru_cache(maxsize=None)
+def get_http_clients():
+    """(동기 클라이언트, 비동기 클라이언트). 비동기 클라이언트는 app.ainvoke / app.astream에서 사용."""
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+    )
+    return (
+        httpx.Client(limits=limits, timeout=OPENAI_TIMEOUT),
+        httpx.AsyncClient(limits=limits, timeout=OPENAI_TIMEOUT),
+    )
+
+
+# --- 2. LLM 및 Embedding ---
+@lru_cache(maxsize=None)
+def get_llm():
+    if SERVICE_BACKEND == "fake":
+        from fake_services import FakeChatModel
+        return FakeChatModel(callbacks=[MetricsCallbackHandler()])
+
+    from langchain_openai import ChatOpenAI
+
+    http_client, async_http_client = get_http_clients()
+    # 호출 시간 / 토큰 수를 현재 노드에 기록 (instrumentation.py)
+    # stream_usage: 스트리밍 응답(generate_answer)도 마지막 청크로 토큰 사용량을 받음
+    return ChatOpenAI(
+        model="gpt-5",
+        http_client=http_client,
+        http_async_client=async_http_client,
+        callbacks=[MetricsCallbackHandler()],
+        stream_usage=True
+    )
+
+
+@lru_cache(maxsize=None)
+def get_embedding() -> CachedEmbeddings:
+    if SERVICE_BACKEND == "fake":
+        from fake_services import HashingEmbeddings
+        return CachedEmbeddings(HashingEmbeddings(), path=":memory:")
+
+    from langchain_openai import OpenAIEmbeddings
+
+    http_client, async_http_client = get_http_clients()
+    # 같은 텍스트(rag_query, rag_text)는 다시 임베딩하지 않도록 content-hash 캐시로 감쌈
+    return CachedEmbeddings(OpenAIEmbeddings(
+        model='text-embedding-3-large',
+        dimensions=EMBEDDING_DIMENSIONS,
+        http_client=http_client,
+        http_async_client=async_http_client
+    ))
+
+
+# --- 3. VectorStore 및 Retriever ---
+@lru_cache(maxsize=None)
+def get_vector_store():
+    vector_store = _build_vector_store()
+    if RETRIEVAL_CACHE_ENABLED:
+        from retrieval_cache import CachedVectorStore
+        vector_store = CachedVectorStore(vector_store)
+    if SEARCH_BATCH_WINDOW_MS > 0:
+        from search_batcher import BatchingVectorStore
+        return BatchingVectorStore(vector_store, SEARCH_BATCH_WINDOW_MS, SEARCH_BATCH_SIZE)
+    return vector_store
+
+
+def _build_vector_store():
+    embedding = get_embedding()
+    if SERVICE_BACKEND == "fake":
+        from fake_services import build_local_vector_store
+        return build_local_vector_store(embedding)
+    if VECTOR_STORE_BACKEND == "numpy":
+        from numpy_vector_store import load_numpy_vector_store
+        return load_numpy_vector_store(
+            embedding,
+            persist_directory=CHROMA_PERSIST_DIRECTORY,
+            collection_name=CHROMA_COLLECTION_NAME
+        )
+
+    from langchain_chroma import Chroma
+
+    return Chroma(
+        embedding_function=embedding,
+        persist_directory=CHROMA_PERSIST_DIRECTORY,
+        collection_name=CHROMA_COLLECTION_NAME
+    )
+
+
+@lru_cache(maxsize=None)
+def get_retriever():
+    vector_store = get_vector_store()
+    if RETRIEVAL_MODE == "dense":
+        return vector_store.as_retriever(search_kwargs={'k': RETRIEVER_K})
+
+    from sparse_index import HybridRetriever
+    return HybridRetriever(vector_store=vector_store, k=RETRIEVER_K, mode=RETRIEVAL_MODE)
+
+
+def warmup() -> float:
+    """서비스 객체를 모두 미리 만들고 걸린 시간(초)을 반환합니다. (hybrid / sparse이면 BM25 색인까지)"""
+    start = time.perf_counter()
+    get_llm()
+    retriever = get_retriever()
+    if RETRIEVAL_MODE != "dense":
+        retriever.sparse_index
+    return time.perf_counter() - start
+
+
+# service.llm 같은 기존 속성 접근 (처음 접근할 때 생성)
+_LAZY_ATTRIBUTES = {
+    "llm": get_llm,
+    "embedding": get_embedding,
+    "vector_store": get_vector_store,
+    "retriever": get_retriever,
+    "http_client": lambda: get_http_clients()[0],
+    "async_http_client": lambda: get_http_clients()[1],
+}
 
 
-# --- 2. VectorStore 및 Retriever 초기화 ---
-vector_store = Chroma(
-    embedding_function=embedding,
-    persist_directory='./db/chromaDB2',
-    collection_name='movie_rag_collection'
-)
-retriever = vector_store.as_retriever(search_kwargs={'k':3})
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module 'service' has no attribute {name!r}")
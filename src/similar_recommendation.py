@@ -1,31 +1,32 @@
 # similar_recommendation.py
 
 # %%
-from typing import List
+from functools import lru_cache
+from typing import List, Literal
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document
 
 from state import AgentState
-from service import llm, retriever
+from service import RETRIEVER_K, get_llm, get_retriever
+from catalog import record_to_document, records_by_tmdb_id
+from title_index import resolve_title
+from item_neighbors import get_item_neighbors
 
 # %%
 # --- Node 3: 특정 작품 검색 및 rag_context 덮어쓰기 ---
 
-def retrieve_and_update_rag_context(state: AgentState) -> AgentState:
-    """
-    (플로우 3단계)
-    state의 'rag_query'를 사용해 특정 작품 정보를 검색하고,
-    검색된 첫 번째 문서의 내용을 'rag_context'에 덮어씌웁니다.
-    """
+# retrieve_and_update_rag_context / aretrieve_and_update_rag_context 공통 전후 처리 (검색 호출만 다름)
+def _item_query(state: AgentState) -> str:
     print("--- RAG: 특정 작품 정보 검색 중 ---")
     rag_query = state.get('rag_query')
     if not rag_query:
         print("경고: RAG 쿼리가 없어 원본 쿼리 사용")
         rag_query = state['query']
+    return rag_query
 
-    docs: List[Document] = retriever.invoke(rag_query)
 
+def _update_rag_context(state: AgentState, docs: List[Document]) -> AgentState:
     if not docs:
         print("경고: 특정 작품 정보를 찾지 못했습니다. 원본 쿼리로 추천을 시도합니다.")
         # Fallback: 원본 쿼리 자체를 rag_context로 사용하여 다음 단계 진행
@@ -37,6 +38,79 @@ def retrieve_and_update_rag_context(state: AgentState) -> AgentState:
     
     return {"rag_context": specific_item_context}
 
+
+def retrieve_and_update_rag_context(state: AgentState) -> AgentState:
+    """
+    (플로우 3단계)
+    state의 'rag_query'를 사용해 특정 작품 정보를 검색하고,
+    검색된 첫 번째 문서의 내용을 'rag_context'에 덮어씌웁니다.
+    """
+    docs: List[Document] = get_retriever().invoke(_item_query(state))
+    return _update_rag_context(state, docs)
+
+
+async def aretrieve_and_update_rag_context(state: AgentState) -> AgentState:
+    """retrieve_and_update_rag_context의 비동기 버전"""
+    docs: List[Document] = await get_retriever().ainvoke(_item_query(state))
+    return _update_rag_context(state, docs)
+
+
+def lookup_title_and_update_rag_context(state: AgentState) -> AgentState:
+    """
+    retrieve_and_update_rag_context 대신 사용하는 노드.
+    제목 색인(title_index)으로 기준 작품을 바로 찾아 'rag_context'에 넣습니다. (임베딩 / 벡터 검색 없음)
+    """
+    match = resolve_title(state)
+    if match is None:
+        print("경고: 제목 색인에서 작품을 찾지 못해 벡터 검색을 사용합니다.")
+        return retrieve_and_update_rag_context(state)
+
+    specific_item_context = record_to_document(match.record).page_content
+    print(f"--- 제목 색인으로 작품 조회 (rag_context로 업데이트): {match.record.get('title_ko')} (score={match.score:.2f}) ---")
+
+    return {"rag_context": specific_item_context}
+
+# %%
+# --- 미리 계산된 이웃 테이블로 바로 추천 (item_neighbors.py) ---
+
+SIMILAR_TOP_K = RETRIEVER_K   # retriever가 돌려주는 문서 수와 같게
+
+def route_similar_recommendation(state: AgentState) -> Literal['neighbors', 'direct', 'vector']:
+    """
+    'neighbors': 기준 작품이 제목 색인으로 특정되고 이웃 테이블에 있음 → 테이블에서 바로 추천
+    'direct'   : 기준 작품은 특정되지만 이웃 테이블이 없음 → 제목 색인 + 추천 쿼리 생성 + 벡터 검색
+    'vector'   : 기존 흐름 (RAG 쿼리 생성 → 벡터 검색)
+    """
+    match = resolve_title(state)
+    if match is None:
+        return 'vector'
+    table = get_item_neighbors()
+    if table is not None and match.record.get('tmdb_id') in table:
+        return 'neighbors'
+    return 'direct'
+
+
+def recommend_from_neighbors(state: AgentState) -> AgentState:
+    """
+    기준 작품의 미리 계산된 이웃 목록으로 추천 작품 문서를 만듭니다.
+    (추천 쿼리 생성 LLM, 임베딩, 벡터 검색 없이 바로 generate_answer로 이동)
+    """
+    match = resolve_title(state)
+    table = get_item_neighbors()
+    if match is None or table is None:
+        print("경고: 이웃 테이블에서 기준 작품을 찾지 못했습니다.")
+        return {'context': []}
+
+    records = records_by_tmdb_id()
+    neighbors = table.neighbors(match.record.get('tmdb_id'), SIMILAR_TOP_K)
+    docs = [record_to_document(records[tmdb_id]) for tmdb_id, _ in neighbors if tmdb_id in records]
+    print(f"--- 이웃 테이블로 유사 작품 조회: {match.record.get('title_ko')} → {[doc.metadata['title_ko'] for doc in docs]} ---")
+
+    return {
+        'rag_context': record_to_document(match.record).page_content,
+        'context': docs
+    }
+
 # %%
 # --- Node 4: 추천 검색 쿼리 생성 ---
 
@@ -54,14 +128,12 @@ recommend_query_prompt_template = """
 """
 
 recommend_query_prompt = ChatPromptTemplate.from_template(recommend_query_prompt_template)
-recommend_query_chain = recommend_query_prompt | llm | StrOutputParser()
+@lru_cache(maxsize=None)
+def get_recommend_query_chain():
+    return recommend_query_prompt | get_llm() | StrOutputParser()
 
-def generate_recommendation_query(state: AgentState) -> AgentState:
-    """
-    (플로우 4단계)
-    특정 작품의 정보('rag_context')를 기반으로
-    유사한 작품을 찾기 위한 새로운 RAG 쿼리를 생성하여 'rag_query'에 덮어씌웁니다.
-    """
+# generate_recommendation_query / agenerate_recommendation_query 공통 전후 처리 (체인 호출만 다름)
+def _recommendation_query_input(state: AgentState) -> dict:
     print("--- RAG: 유사 작품 추천 쿼리 생성 중 ---")
     rag_context = state.get('rag_context')
 
@@ -69,8 +141,24 @@ def generate_recommendation_query(state: AgentState) -> AgentState:
         print("경고: rag_context가 비어있어 추천 쿼리 생성 실패.")
         # Fallback: 원본 쿼리를 기반으로 생성 시도
         rag_context = state.get('query')
+    return {"rag_context": rag_context}
 
-    new_rag_query = recommend_query_chain.invoke({"rag_context": rag_context})
-    
+
+def _recommendation_query_output(new_rag_query: str) -> AgentState:
     print(f"--- 생성된 추천 쿼리 (rag_query로 업데이트): {new_rag_query} ---")
-    return {"rag_query": new_rag_query}
\ No newline at end of file
+    return {"rag_query": new_rag_query}
+
+
+def generate_recommendation_query(state: AgentState) -> AgentState:
+    """
+    (플로우 4단계)
+    특정 작품의 정보('rag_context')를 기반으로
+    유사한 작품을 찾기 위한 새로운 RAG 쿼리를 생성하여 'rag_query'에 덮어씌웁니다.
+    """
+    return _recommendation_query_output(get_recommend_query_chain().invoke(_recommendation_query_input(state)))
+
+
+async def agenerate_recommendation_query(state: AgentState) -> AgentState:
+    """generate_recommendation_query의 비동기 버전"""
+    return _recommendation_query_output(
+        await get_recommend_query_chain().ainvoke(_recommendation_query_input(state)))
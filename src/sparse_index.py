@@ -0,0 +1,228 @@
+# sparse_index.py
+"""
+rag_text에 대한 로컬 BM25 색인과 dense(벡터) 검색 결과를 합치는 하이브리드 retriever.
+    - 토큰화: 띄어쓰기 단위 어절을 글자 bigram으로 나눔 (형태소 분석기 없이 한국어 인명 / 제목 매칭)
+    - postings(term → 문서 행 / tf)와 IDF를 미리 계산해 두고 질의 시에는 numpy 누적만 수행
+    - RRF(reciprocal rank fusion)로 dense / sparse 순위를 합침
+    - 질의에 카탈로그의 인물 이름 / 제목이 그대로 들어 있으면 sparse만 사용 (임베딩 API 호출 없음)
+
+service.py의 RETRIEVAL_MODE로 선택합니다. ('dense' | 'hybrid' | 'sparse')
+"""
+
+# %%
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+from ingest import current_index_version
+from metadata_index import JOINED_LIST_FIELDS
+
+# %%
+# --- 1. 설정 ---
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+# dense / sparse 각각에서 RRF에 넣는 후보 수 (최종 k보다 넉넉하게)
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+# 이 길이(정규화 후 글자 수) 이상인 인물 이름 / 제목이 질의에 그대로 있으면 sparse만 사용
+# ('정이', '승부' 같은 2글자 제목은 다른 단어의 일부로도 자주 나오므로 제외)
+SPARSE_ONLY_MIN_NAME_LENGTH = 3
+
+# %%
+# --- 2. 토큰화 ---
+
+def normalize_text(text: str) -> str:
+    """전각/반각, 대소문자 차이를 없애고 문장부호를 공백으로 바꿉니다."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return re.sub(r"[^\w\s]|_", " ", text)
+
+
+def tokenize(text: str) -> List[str]:
+    """어절마다 글자 bigram ('이병헌' -> '이병', '병헌'), 한 글자 어절은 그대로."""
+    tokens: List[str] = []
+    for word in normalize_text(text).split():
+        if len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def _compact(text: str) -> str:
+    return "".join(normalize_text(text).split())
+
+# %%
+# --- 3. BM25 색인 ---
+
+class SparseIndex:
+    """
+    rag_text BM25 색인.
+    postings는 term → (문서 행 배열, tf 배열)로 저장하고, IDF와 문서 길이 정규화 값은 생성 시 미리 계산합니다.
+    """
+
+    def __init__(self, ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.metadatas = [dict(m or {}) for m in metadatas]
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+        term_rows: Dict[str, List[int]] = defaultdict(list)
+        term_tfs: Dict[str, List[int]] = defaultdict(list)
+        lengths = np.zeros(len(self.ids), dtype=np.float32)
+        for row, text in enumerate(self.texts):
+            tokens = tokenize(text or "")
+            lengths[row] = len(tokens)
+            for token, tf in Counter(tokens).items():
+                term_rows[token].append(row)
+                term_tfs[token].append(tf)
+
+        n = max(len(self.ids), 1)
+        avg_length = float(lengths.mean()) if len(self.ids) else 1.0
+        # BM25 분모의 문서 길이 항: k1 * (1 - b + b * len / avg_len)
+        self._length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(avg_length, 1.0))
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.idf: Dict[str, float] = {}
+        for token, rows in term_rows.items():
+            self.postings[token] = (np.array(rows, dtype=np.int32), np.array(term_tfs[token], dtype=np.float32))
+            df = len(rows)
+            self.idf[token] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+        self.names = self._collect_names()
+
+    def _collect_names(self) -> Set[str]:
+        """sparse-only 판단에 쓰는 인물 이름 / 제목 목록 (정규화, 공백 제거)"""
+        names: Set[str] = set()
+        for metadata in self.metadatas:
+            for field in JOINED_LIST_FIELDS:
+                for name in str(metadata.get(field) or "").split(','):
+                    names.add(_compact(name))
+            names.add(_compact(str(metadata.get('title_ko') or "")))
+        return {name for name in names if len(name) >= SPARSE_ONLY_MIN_NAME_LENGTH}
+
+    @classmethod
+    def from_vector_store(cls, vector_store) -> "SparseIndex":
+        """Chroma / NumpyVectorStore의 get()으로 전체 문서를 읽어 색인을 만듭니다. (문서 ID가 같으므로 결과를 합칠 수 있음)"""
+        data = vector_store.get(include=['documents', 'metadatas'])
+        return cls(data['ids'], data['documents'], data['metadatas'])
+
+    # --- 조회 ---
+    def matched_names(self, query: str) -> List[str]:
+        """질의에 그대로 들어 있는 인물 이름 / 제목"""
+        compact = _compact(query)
+        return [name for name in self.names if name in compact]
+
+    def search(self, query: str, k: int = 4, ids: Optional[Sequence[str]] = None) -> List[Tuple[int, float]]:
+        """(문서 행, BM25 점수) top-k. ids를 넘기면 해당 문서들 안에서만 검색합니다."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            rows, tf = posting
+            scores[rows] += self.idf[token] * tf * (BM25_K1 + 1) / (tf + self._length_norm[rows])
+
+        if ids is not None:
+            allowed = np.zeros(len(self.ids), dtype=bool)
+            allowed[[self._id_to_row[i] for i in ids if i in self._id_to_row]] = True
+            scores[~allowed] = 0.0
+        hit_rows = np.flatnonzero(scores > 0)
+        if len(hit_rows) > k:
+            hit_rows = hit_rows[np.argpartition(-scores[hit_rows], k - 1)[:k]]
+        ranked = hit_rows[np.argsort(-scores[hit_rows], kind="stable")]
+        return [(int(row), float(scores[row])) for row in ranked]
+
+    def to_document(self, row: int) -> Document:
+        return Document(id=self.ids[row], page_content=self.texts[row], metadata=dict(self.metadatas[row]))
+
+    def similarity_search(self, query: str, k: int = 4, ids: Optional[Sequence[str]] = None) -> List[Document]:
+        return [self.to_document(row) for row, _ in self.search(query, k, ids)]
+
+# %%
+# --- 4. RRF / 하이브리드 retriever ---
+
+def _doc_key(doc: Document) -> str:
+    return doc.id or doc.page_content
+
+
+def rrf_fuse(rankings: Sequence[Sequence[Document]], k: int, rrf_k: int = RRF_K) -> List[Document]:
+    """여러 순위 목록을 reciprocal rank fusion(sum 1 / (rrf_k + rank))으로 합쳐 상위 k개를 반환합니다."""
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    ordered = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [docs[key] for key in ordered[:k]]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    vector_store(dense)와 SparseIndex(BM25)를 함께 쓰는 retriever. (vector_store.as_retriever()와 같은 방식으로 사용)
+        - mode='hybrid': 질의에 인물 이름 / 제목이 그대로 있으면 sparse만, 아니면 dense + sparse를 RRF로 합침
+        - mode='sparse': 항상 sparse만 (임베딩 API 호출 없음)
+    invoke(query, ids=[...])로 후보 문서를 제한할 수 있습니다. (broad_recommendation의 메타데이터 필터)
+    """
+
+    vector_store: Any
+    k: int = 3
+    mode: str = "hybrid"
+    candidates: int = HYBRID_CANDIDATES
+
+    # (만든 시점의 컬렉션 버전, 색인)
+    _sparse_index: Optional[Tuple[Optional[int], SparseIndex]] = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def sparse_index(self) -> SparseIndex:
+        """
+        첫 검색 때 만들고, vector_store가 검색하는 컬렉션 버전(index_version)이 바뀌면 다시 만듭니다.
+        (vector_store 전체 문서를 읽음. dense 결과와 같은 문서 집합을 검색하도록)
+        """
+        version = current_index_version(self.vector_store)
+        built = self._sparse_index
+        if built is None or built[0] != version:
+            with self._lock:
+                built = self._sparse_index
+                if built is None or built[0] != version:
+                    print(f"--- BM25 색인 생성 중 (index_version {version}) ---")
+                    built = self._sparse_index = (version, SparseIndex.from_vector_store(self.vector_store))
+        return built[1]
+
+    def use_sparse_only(self, query: str) -> bool:
+        return self.mode == "sparse" or bool(self.sparse_index.matched_names(query))
+
+    def _search_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        search_kwargs: Dict[str, Any] = {'k': self.candidates}
+        if kwargs.get('ids') is not None:
+            search_kwargs['ids'] = kwargs['ids']
+        return search_kwargs
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun,
+                                **kwargs: Any) -> List[Document]:
+        k = kwargs.get('k', self.k)
+        sparse_docs = self.sparse_index.similarity_search(query, self.candidates, kwargs.get('ids'))
+        if self.use_sparse_only(query):
+            return sparse_docs[:k]
+        dense_docs = self.vector_store.similarity_search(query, **self._search_kwargs(kwargs))
+        return rrf_fuse([dense_docs, sparse_docs], k)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun,
+                                       **kwargs: Any) -> List[Document]:
+        k = kwargs.get('k', self.k)
+        sparse_docs = self.sparse_index.similarity_search(query, self.candidates, kwargs.get('ids'))
+        if self.use_sparse_only(query):
+            return sparse_docs[:k]
+        dense_docs = await self.vector_store.asimilarity_search(query, **self._search_kwargs(kwargs))
+        return rrf_fuse([dense_docs, sparse_docs], k)
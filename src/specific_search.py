@@ -1,9 +1,13 @@
 # %%
 from state import AgentState
-from service import llm, retriever
+from service import get_llm, get_retriever
+from catalog import record_to_document
+from title_index import TITLE_CANDIDATE_THRESHOLD, resolve_title
+from context_packing import pack_context
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document
+from functools import lru_cache
 from typing import List
 
 
@@ -71,22 +75,83 @@ RAG 안에 Document content는 다음과 같은 형태로 되어있습니다.
 rag_query_prompt = ChatPromptTemplate.from_template(rag_specialized_prompt_template)
 
 # %%
-rag_query_generation_chain = (rag_query_prompt | llm | StrOutputParser())
+# 체인은 처음 호출될 때 만듦 (모듈 import 시 LLM 객체를 만들지 않음)
+@lru_cache(maxsize=None)
+def get_rag_query_generation_chain():
+    return rag_query_prompt | get_llm() | StrOutputParser()
+
+# generate_rag_query / agenerate_rag_query 공통 전후 처리 (체인 호출만 다름)
+def _rag_query_input(state: AgentState) -> dict:
+    print("--- RAG 쿼리 생성 중 ---")
+    return {"rag_context": state['rag_context']}
+
+
+def _rag_query_output(rag_query: str) -> AgentState:
+    print(f"생성된 RAG 쿼리: {rag_query}")
+    return {"rag_query": rag_query}
 
 # 노드
 def generate_rag_query(state: AgentState) -> AgentState:
     """
     Rag_context 정보를 바탕으로 RAG 쿼리를 생성합니다.
     """
-    print("--- RAG 쿼리 생성 중 ---")
-    
-    # state 전체를 체인에 전달
-    rag_query = rag_query_generation_chain.invoke({"rag_context": state['rag_context']})
-    
-    print(f"생성된 RAG 쿼리: {rag_query}")
+    return _rag_query_output(get_rag_query_generation_chain().invoke(_rag_query_input(state)))
+
+
+async def agenerate_rag_query(state: AgentState) -> AgentState:
+    """generate_rag_query의 비동기 버전"""
+    return _rag_query_output(await get_rag_query_generation_chain().ainvoke(_rag_query_input(state)))
+
+# %%
+# --- rag_query_mode='template' / 'combined': LLM 없이 QueryDetails로 RAG 쿼리 생성 ---
+
+# rag_text와 같은 순서의 (라벨, state 키)
+RAG_QUERY_TEMPLATE_FIELDS = [
+    ('제목', 'title'),
+    ('줄거리', 'info'),
+    ('장르', 'genre'),
+    ('주요 출연진', 'casts'),
+    ('감독', 'director'),
+]
+
+def build_template_rag_query(state: AgentState) -> str:
+    """
+    QueryDetails 값을 rag_text와 같은 "[제목] ...\\n[장르] ..." 형식으로 이어 붙입니다.
+    채울 값이 하나도 없으면 원본 쿼리를 반환합니다.
+    """
+    lines = []
+    for label, key in RAG_QUERY_TEMPLATE_FIELDS:
+        value = state.get(key)
+        if not value:
+            continue
+        if isinstance(value, List):
+            value = ", ".join(str(v.value if hasattr(v, 'value') else v) for v in value)
+        lines.append(f"[{label}] {value}")
+    return "\n".join(lines) if lines else state['query']
+
+# 노드
+def generate_template_rag_query(state: AgentState) -> AgentState:
+    """
+    generate_rag_query 대신 사용하는 노드 (LLM 호출 없음).
+    쿼리 분석 단계에서 이미 rag_query를 받은 경우(combined)에는 그대로 사용합니다.
+    """
+    if state.get('rag_query'):
+        print(f"쿼리 분석에서 생성된 RAG 쿼리 사용: {state['rag_query']}")
+        return {}
+
+    rag_query = build_template_rag_query(state)
+    print(f"템플릿 RAG 쿼리: {rag_query}")
     return {"rag_query": rag_query}
 
 # %%
+def _retrieval_query(state: AgentState) -> str:
+    """retrieve / aretrieve가 검색할 쿼리 (rag_query가 없으면 원본 쿼리)"""
+    rag_query = state.get('rag_query')
+    if not rag_query:
+        print("경고: RAG 쿼리가 비어있어 원본 쿼리를 사용합니다.")
+        rag_query = state['query']
+    return rag_query
+
 # 노드
 def retrieve(state: AgentState) -> AgentState:
     """ 
@@ -96,19 +161,48 @@ def retrieve(state: AgentState) -> AgentState:
     Returns:
         AgentState: 검색된 문서가 추가된 state를 반환합니다.        
     """
+    return {'context': get_retriever().invoke(_retrieval_query(state))}
 
-    rag_query = state.get('rag_query')
-    if not rag_query:
-        print("경고: RAG 쿼리가 비어있어 원본 쿼리를 사용합니다.")
-        rag_query = state['query']
-    docs = retriever.invoke(rag_query)
-    return {'context': docs}
+
+async def aretrieve(state: AgentState) -> AgentState:
+    """retrieve의 비동기 버전"""
+    return {'context': await get_retriever().ainvoke(_retrieval_query(state))}
+
+# 노드
+def lookup_title(state: AgentState) -> AgentState:
+    """
+    쿼리에서 언급된 작품 제목을 제목 색인(title_index)으로 바로 찾아 context로 사용합니다.
+    (generate_rag_query, 임베딩, 벡터 검색을 모두 건너뜀)
+    """
+    match = resolve_title(state)
+    if match is None:
+        print("경고: 제목 색인에서 작품을 찾지 못해 벡터 검색을 사용합니다.")
+        return retrieve(state)
+
+    print(f"--- 제목 색인으로 작품 조회: {match.record.get('title_ko')} (score={match.score:.2f}) ---")
+    return {'context': [record_to_document(match.record)]}
+
+# 노드 (PARALLEL_RETRIEVAL: generate_rag_query와 병렬 실행)
+def lookup_title_candidate(state: AgentState) -> AgentState:
+    """
+    제목 색인 점수가 TITLE_CANDIDATE_THRESHOLD 이상인 작품을 후보 문서로 prefetched_context에 둡니다.
+    (LLM / 임베딩 호출 없음. 점수가 확실하지 않은 후보이므로 벡터 검색 결과 뒤에 붙고,
+    벡터 검색 결과가 k개보다 적을 때만 context에 들어감)
+    """
+    match = resolve_title(state, threshold=TITLE_CANDIDATE_THRESHOLD)
+    if match is None:
+        return {}
+    print(f"--- 제목 색인 후보: {match.record.get('title_ko')} (score={match.score:.2f}) ---")
+    return {'prefetched_context': [record_to_document(match.record)]}
 
 # %%
+# 요청마다 같은 지시문을 맨 앞(system)에 두고, 바뀌는 컨텍스트 / 질문은 뒤에 둠
+# (OpenAI prompt caching은 앞부분이 같은 프롬프트끼리 캐시를 재사용)
+generate_system_prompt = """You are an assistant for question-answering tasks. Use the following pieces of retrieved context to answer the question. If you don't know the answer, just say that you don't know. Use three sentences maximum and keep the answer concise."""
+
 generate_prompt_str = """
-You are an assistant for question-answering tasks. Use the following pieces of retrieved context to answer the question. If you don't know the answer, just say that you don't know. Use three sentences maximum and keep the answer concise.
-Question: {question} 
 Context: {context} 
+Question: {question} 
 Answer:
 """
 
@@ -122,31 +216,44 @@ def format_docs_to_string(docs: List[Document]) -> str:
     # 각 문서를 명확하게 분리
     return "\n\n---\n\n".join(formatted_docs)
 
-rag_chain = (
-    ChatPromptTemplate.from_template(generate_prompt_str)
-    | llm
-    | StrOutputParser()
-)
+@lru_cache(maxsize=None)
+def get_rag_chain():
+    return (
+        ChatPromptTemplate.from_messages([("system", generate_system_prompt), ("human", generate_prompt_str)])
+        | get_llm()
+        | StrOutputParser()
+    )
 
-# 노드
-def generate_answer(state: AgentState) -> AgentState:
-    """ 
-    주어진 state를 기반으로 RAG 체인을 사용하여 응답을 생성합니다.
-    """
+# generate_answer / agenerate_answer 공통 전후 처리 (stream / astream만 다름)
+def _answer_input(state: AgentState) -> dict:
     print("--- 3. 검색된 컨텍스트로 답변 생성 ---")
     
     query = state['query']
     context_docs = state['context'] # List[Document]
 
-    formatted_context = format_docs_to_string(context_docs)
+    # 분기 / QueryDetails에 필요한 필드만 토큰 예산 안에서 (CONTEXT_PACKING=0이면 rag_text 전체)
+    formatted_context = pack_context(context_docs, state).text
+    return {'question': query, 'context': formatted_context}
 
-    response = rag_chain.invoke({
-        'question': query, 
-        'context': formatted_context
-    })
 
+def _answer_output(chunks: List[str]) -> AgentState:
+    response = "".join(chunks)
     print(f"생성된 답변: {response}")
-
     return {'answer': response}
 
+# 노드
+def generate_answer(state: AgentState) -> AgentState:
+    """ 
+    주어진 state를 기반으로 RAG 체인을 사용하여 응답을 생성합니다.
+    """
+    # 토큰 단위로 스트리밍 (graph.stream(stream_mode="messages")로 UI까지 전달됨)
+    chunks = [chunk for chunk in get_rag_chain().stream(_answer_input(state))]
+    return _answer_output(chunks)
+
+
+async def agenerate_answer(state: AgentState) -> AgentState:
+    """generate_answer의 비동기 버전 (astream으로 토큰 스트리밍)"""
+    chunks = [chunk async for chunk in get_rag_chain().astream(_answer_input(state))]
+    return _answer_output(chunks)
+
 
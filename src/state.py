@@ -3,12 +3,30 @@ from langchain_core.documents import Document
 from typing import Optional, List
 from typing import Literal
 
+
+def merge_context(primary: Optional[List[Document]], secondary: Optional[List[Document]], k: int) -> List[Document]:
+    """
+    메인 검색 결과(primary) 뒤에 병렬로 미리 검색한 결과(secondary)를 붙이고,
+    같은 작품 문서(page_content가 같은 문서)는 한 번만 남겨 k개까지 반환합니다.
+    (secondary는 메인 검색 결과가 k개보다 적을 때만 들어감)
+    """
+    merged: List[Document] = []
+    seen = set()
+    for doc in (primary or []) + (secondary or []):
+        if doc.page_content in seen:
+            continue
+        seen.add(doc.page_content)
+        merged.append(doc)
+    return merged[:k]
+
+
 class AgentState(TypedDict):
     query : str
     rag_query : str
     recommend_query : str
     rag_context : str
     context : List[Document]
+    prefetched_context : List[Document]   # 병렬로 미리 검색한 보조 결과 (merge_context로 context 뒤에 붙임)
     answer : str
 
     # 세부사항
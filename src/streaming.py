@@ -0,0 +1,125 @@
+# streaming.py
+
+# %%
+import statistics
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Tuple
+
+# %%
+# --- 1. 진행 단계 표시 ---
+# 노드가 끝났을 때 UI에 보여줄 다음 단계 이름
+STAGE_AFTER_NODE: Dict[str, str] = {
+    "generate_query_analysis": "검색 중",
+    "retrieve_specific": "답변 생성 중",
+    "lookup_title_specific": "답변 생성 중",
+    "recommend_from_neighbors": "답변 생성 중",
+    "retrieve_similar_items": "답변 생성 중",
+    "retrieve_filtered": "답변 생성 중",
+    "retrieve_filtered_only": "답변 생성 중",
+}
+FIRST_STAGE = "쿼리 분석 중"
+
+# 어떤 분기(route_query_type 결과)로 실행됐는지 판단하는 노드
+BRANCH_BY_NODE: Dict[str, str] = {
+    "format_state_specific": "specific_search",
+    "format_state_similar": "similar_recommendation",
+    "format_state_broad": "broad_recommendation",
+}
+
+ANSWER_NODE = "generate_answer"
+
+# %%
+# --- 2. 분기별 Time-To-First-Token 기록 ---
+
+class TTFTRecorder:
+    """분기별로 첫 답변 토큰까지 걸린 시간(초)을 기록합니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {}
+
+    def record(self, branch: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(branch, []).append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                branch: {"count": len(values), "p50": statistics.median(values), "max": max(values)}
+                for branch, values in self._samples.items()
+            }
+
+
+ttft_recorder = TTFTRecorder()
+
+# %%
+# --- 3. 그래프 스트리밍 실행 ---
+
+class _GraphEvents:
+    """app.stream / app.astream의 (mode, chunk)를 UI 이벤트로 바꿉니다. (stream_graph / astream_graph가 공유)"""
+
+    def __init__(self, inputs: Dict[str, Any]):
+        self.start = time.perf_counter()
+        self.stages = [FIRST_STAGE]
+        self.branch = "unknown"
+        self.first_token_at = None
+        self.final_state: Dict[str, Any] = dict(inputs)
+
+    def handle(self, mode: str, chunk: Any) -> List[Tuple[str, Any]]:
+        events: List[Tuple[str, Any]] = []
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") != ANSWER_NODE:
+                return events  # 쿼리 분석 / RAG 쿼리 생성 LLM의 토큰은 UI에 보내지 않음
+            text = message.content if isinstance(message.content, str) else ""
+            if not text:
+                return events
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter() - self.start
+                ttft_recorder.record(self.branch, self.first_token_at)
+                print(f"--- 첫 토큰까지 {self.first_token_at:.2f}s ({self.branch}) ---")
+            events.append(("token", text))
+
+        elif mode == "updates":
+            for node_name in chunk:
+                self.branch = BRANCH_BY_NODE.get(node_name, self.branch)
+                stage = STAGE_AFTER_NODE.get(node_name)
+                if stage and stage != self.stages[-1]:
+                    self.stages.append(stage)
+                    events.append(("progress", " → ".join(self.stages)))
+
+        elif mode == "values":
+            self.final_state = chunk
+        return events
+
+
+STREAM_MODES = ["updates", "messages", "values"]
+
+
+def stream_graph(app, inputs: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """
+    컴파일된 그래프를 스트리밍 모드로 실행하면서 이벤트를 순서대로 내보냅니다.
+        ("progress", "쿼리 분석 중 → 검색 중")   : 진행 단계가 바뀔 때
+        ("token", "...")                          : generate_answer가 생성한 답변 토큰
+        ("done", final_state)                     : 그래프 실행 종료 (최종 state)
+    """
+    graph_events = _GraphEvents(inputs)
+    yield "progress", FIRST_STAGE
+
+    for mode, chunk in app.stream(inputs, stream_mode=STREAM_MODES):
+        yield from graph_events.handle(mode, chunk)
+
+    yield "done", graph_events.final_state
+
+
+async def astream_graph(app, inputs: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+    """stream_graph의 비동기 버전. app.astream으로 실행하므로 이벤트 루프를 막지 않습니다. (server.py)"""
+    graph_events = _GraphEvents(inputs)
+    yield "progress", FIRST_STAGE
+
+    async for mode, chunk in app.astream(inputs, stream_mode=STREAM_MODES):
+        for event in graph_events.handle(mode, chunk):
+            yield event
+
+    yield "done", graph_events.final_state
@@ -0,0 +1,175 @@
+# title_index.py
+
+# %%
+import difflib
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Literal, NamedTuple, Optional, Set
+
+from catalog import load_records
+
+# %%
+# --- 1. 설정 ---
+# resolve_title의 score가 이 값 이상이면 벡터 검색 없이 작품 문서를 바로 사용합니다.
+TITLE_MATCH_THRESHOLD = float(os.getenv("TITLE_MATCH_THRESHOLD", "0.85"))
+# 이 값 이상이면 확실하지는 않아도 벡터 검색과 병렬로 후보 문서로 함께 사용합니다. (main_graph PARALLEL_RETRIEVAL)
+TITLE_CANDIDATE_THRESHOLD = float(os.getenv("TITLE_CANDIDATE_THRESHOLD", "0.6"))
+# 오타 허용(fuzzy) 매칭은 정규화 후 이 길이 이상인 제목에만 적용 ('잠', '손' 같은 짧은 제목 오매칭 방지)
+FUZZY_MIN_LENGTH = 3
+NGRAM_SIZE = 3
+
+# %%
+# --- 2. 정규화 ---
+# 한글 음절 → 초성 / 중성 / 종성 (호환 자모)
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+JUNGSEONG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+JONGSEONG = ["", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ", "ㄿ", "ㅀ",
+             "ㅁ", "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
+HANGUL_BASE, HANGUL_LAST = 0xAC00, 0xD7A3
+
+
+def normalize_title(text: str) -> str:
+    """전각/반각, 대소문자, 띄어쓰기, 문장부호 차이를 없앱니다. ('육사오(6/45)' -> '육사오645')"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return re.sub(r"[\s\W_]+", "", text)
+
+
+def decompose_jamo(text: str) -> str:
+    """한글 음절을 자모로 풀어 씁니다. ('승부' -> 'ㅅㅡㅇㅂㅜ') 한 글자 오타도 자모 한두 개 차이가 됩니다."""
+    chars = []
+    for ch in text:
+        code = ord(ch)
+        if HANGUL_BASE <= code <= HANGUL_LAST:
+            index = code - HANGUL_BASE
+            chars.append(CHOSEONG[index // 588])
+            chars.append(JUNGSEONG[(index % 588) // 28])
+            chars.append(JONGSEONG[index % 28])
+        else:
+            chars.append(ch)
+    return "".join(chars)
+
+
+def _ngrams(text: str, n: int = NGRAM_SIZE) -> Set[str]:
+    padded = f"^{text}$"
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+# %%
+# --- 3. 제목 색인 ---
+
+class TitleMatch(NamedTuple):
+    record: Dict[str, Any]
+    score: float        # 0 ~ 1 (1: 정규화 후 정확히 일치하는 유일한 작품)
+    matched: str        # 매칭된 제목 (title_ko 또는 title_en)
+
+
+class TitleIndex:
+    """
+    rag_data.jsonl의 title_ko / title_en으로 만든 작품 제목 색인.
+        - 정확 매칭: 정규화한 제목 → 레코드
+        - 오타 허용 매칭: 자모 단위 n-gram 역색인으로 후보를 좁힌 뒤 difflib 유사도로 점수 계산
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]]):
+        self.records: List[Dict[str, Any]] = list(records)
+        self.exact: Dict[str, List[int]] = {}
+        self.jamo_titles: List[tuple] = []          # (자모 문자열, 레코드 번호, 원래 제목)
+        self.ngram_postings: Dict[str, Set[int]] = {}
+
+        for row, record in enumerate(self.records):
+            for title in (record.get('title_ko'), record.get('title_en')):
+                # title_en은 비어 있으면 NaN(float)으로 들어올 수 있음
+                if not isinstance(title, str):
+                    continue
+                key = normalize_title(title)
+                if not key:
+                    continue
+                rows = self.exact.setdefault(key, [])
+                if row not in rows:
+                    rows.append(row)
+
+                entry = len(self.jamo_titles)
+                jamo = decompose_jamo(key)
+                self.jamo_titles.append((jamo, row, title))
+                for gram in _ngrams(jamo):
+                    self.ngram_postings.setdefault(gram, set()).add(entry)
+
+    def _pick(self, rows: List[int], year: Optional[int]) -> tuple:
+        """같은 제목의 작품이 여러 개면 year로 구분하고, 그래도 여러 개면 최신작을 고르되 점수를 낮춥니다."""
+        if year is not None:
+            same_year = [row for row in rows if self.records[row].get('year') == year]
+            if len(same_year) == 1:
+                return same_year[0], 1.0
+        rows = sorted(rows, key=lambda row: self.records[row].get('year') or 0, reverse=True)
+        return rows[0], 1.0 if len(rows) == 1 else 0.8
+
+    def lookup(self, title: str, year: Optional[int] = None) -> Optional[TitleMatch]:
+        """title에 가장 잘 맞는 작품을 반환합니다. (후보가 없으면 None)"""
+        if not title:
+            return None
+        key = normalize_title(title)
+        if not key:
+            return None
+
+        # 1. 정확 매칭
+        rows = self.exact.get(key)
+        if rows:
+            row, score = self._pick(rows, year)
+            return TitleMatch(self.records[row], score, title)
+
+        # 2. 오타 허용 매칭 (자모 n-gram 후보 → 유사도)
+        if len(key) < FUZZY_MIN_LENGTH:
+            return None
+        jamo = decompose_jamo(key)
+        candidates: Set[int] = set()
+        for gram in _ngrams(jamo):
+            candidates |= self.ngram_postings.get(gram, set())
+        if not candidates:
+            return None
+
+        scored: Dict[int, tuple] = {}
+        for entry in candidates:
+            candidate_jamo, row, original = self.jamo_titles[entry]
+            ratio = difflib.SequenceMatcher(None, jamo, candidate_jamo).ratio()
+            if ratio > scored.get(row, (0.0, ""))[0]:
+                scored[row] = (ratio, original)
+        ranked = sorted(scored.items(), key=lambda item: item[1][0], reverse=True)
+
+        best_row, (best_score, best_title) = ranked[0]
+        # 비슷한 점수의 다른 작품이 있으면 확신도를 낮춤
+        if len(ranked) > 1 and best_score - ranked[1][1][0] < 0.05:
+            best_score *= 0.9
+        if year is not None and self.records[best_row].get('year') not in (None, year):
+            best_score *= 0.9
+        return TitleMatch(self.records[best_row], best_score, best_title)
+
+
+@lru_cache(maxsize=1)
+def get_title_index() -> TitleIndex:
+    """rag_data.jsonl로 제목 색인을 한 번만 만들어 재사용합니다."""
+    print("--- 제목 색인 생성 중 ---")
+    return TitleIndex(load_records())
+
+# %%
+# --- 4. 그래프에서 사용하는 함수 ---
+
+def resolve_title(state: Dict[str, Any], threshold: float = TITLE_MATCH_THRESHOLD) -> Optional[TitleMatch]:
+    """쿼리 분석 결과의 title이 확신도 threshold 이상으로 특정 작품에 매칭되면 반환합니다."""
+    title = state.get('title')
+    if not title:
+        return None
+    match = get_title_index().lookup(title, year=state.get('year'))
+    if match is None or match.score < threshold:
+        return None
+    return match
+
+
+def route_title_lookup(state: Dict[str, Any]) -> Literal['direct', 'vector']:
+    """
+    제목이 확실히 매칭되면 'direct' (RAG 쿼리 생성 + 임베딩 + 벡터 검색 생략),
+    아니면 기존 흐름인 'vector'로 분기합니다.
+    """
+    return 'direct' if resolve_title(state) is not None else 'vector'
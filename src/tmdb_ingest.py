@@ -0,0 +1,346 @@
+# tmdb_ingest.py
+"""
+data/wikidata.csv의 작품들을 TMDB API로 보강해서 output/tmdb_data.jsonl에 저장합니다.
+(data_preprocessing.ipynb의 df.iterrows() 루프를 대체)
+
+    - append_to_response로 작품당 API 호출 1번 (details + credits + watch/providers + keywords + 연령 등급)
+    - 스레드 풀 + requests.Session 커넥션 풀(keep-alive)
+    - 토큰 버킷으로 초당 요청 수 제한, 429 / 5xx / 네트워크 오류는 지수 백오프로 재시도
+    - 출력 파일에 이미 있는 tmdb_id는 건너뜀 (중단 후 다시 실행하면 이어서 진행)
+    - 응답은 http_cache에 저장 (TTL 안이면 요청하지 않고, 지나면 ETag / Last-Modified로 재검증)
+
+실행 방법:
+    python tmdb_ingest.py                       # TMDB_API_KEY 필요
+    python tmdb_ingest.py --workers 16 --rate 40
+    python tmdb_ingest.py --rebuild --offline   # parse_title만 바뀐 경우: 저장된 응답으로 출력 파일을 다시 만듦 (API 키 불필요)
+                                                # (임시 파일에 만든 뒤 오류 없이 끝났을 때만 기존 파일을 교체)
+"""
+
+# %%
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+from http_cache import HttpCache, get_http_cache
+
+load_dotenv()
+
+# %%
+# --- 1. 설정 ---
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+TMDB_WORKERS = int(os.getenv("TMDB_WORKERS", "8"))
+TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", "40"))     # 초당 최대 요청 수
+TMDB_TIMEOUT = float(os.getenv("TMDB_TIMEOUT", "10"))
+TMDB_MAX_RETRIES = int(os.getenv("TMDB_MAX_RETRIES", "5"))
+BACKOFF_BASE = 0.5      # 초 (재시도마다 2배, 최대 BACKOFF_MAX)
+BACKOFF_MAX = 30.0
+
+INPUT_CSV = "./data/wikidata.csv"
+OUTPUT_JSONL = "./output/tmdb_data.jsonl"
+
+# 연령 등급은 movie / tv 엔드포인트가 다름
+RATING_APPEND = {'movie': 'release_dates', 'tv': 'content_ratings'}
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# %%
+# --- 2. 요청 수 제한 / 재시도 ---
+
+class TokenBucket:
+    """초당 rate개의 토큰이 채워지는 버킷. 여러 스레드가 공유합니다."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """토큰 하나를 얻을 때까지 대기합니다."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class TMDBClient:
+    """커넥션 풀, 요청 수 제한, 재시도를 적용한 TMDB API 클라이언트."""
+
+    def __init__(self, api_key: Optional[str] = TMDB_API_KEY, base_url: str = TMDB_BASE_URL,
+                 workers: int = TMDB_WORKERS, rate: float = TMDB_RATE_LIMIT,
+                 max_retries: int = TMDB_MAX_RETRIES, timeout: float = TMDB_TIMEOUT,
+                 cache: Optional[HttpCache] = None):
+        self.cache = cache or get_http_cache()
+        # offline 모드는 저장된 응답만 쓰므로 API 키가 없어도 됨
+        if not api_key and self.cache.mode != "offline":
+            raise ValueError("TMDB_API_KEY가 .env 파일에 설정되지 않았습니다.")
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate)
+        self.retries = 0
+        self._stats_lock = threading.Lock()
+
+        # 워커 수만큼 keep-alive 연결을 유지
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        if response is not None and response.headers.get("Retry-After"):
+            try:
+                return float(response.headers["Retry-After"])
+            except ValueError:
+                pass
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)      # jitter
+
+    def _send(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> requests.Response:
+        """
+        실제 요청 (요청 수 제한 + 재시도). 재시도 대상이 아닌 응답(200 / 304 / 404)을 돌려주고,
+        재시도 횟수를 넘기면 마지막 오류를 그대로 발생시킵니다.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            response = None
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUS:
+                    if response.status_code != 404:
+                        response.raise_for_status()
+                    return response
+                error: Exception = requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if attempt == self.max_retries:
+                raise error
+            with self._stats_lock:
+                self.retries += 1
+            time.sleep(self._backoff(attempt, response))
+        raise RuntimeError("재시도 횟수 초과")
+
+    def get(self, path: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """GET 요청 (http_cache 경유). 404는 None"""
+        url = f"{self.base_url}{path}"
+        params = {"api_key": self.api_key, **params}
+        response = self.cache.fetch("tmdb", url, params, send=lambda headers: self._send(url, params, headers))
+        if response.status_code == 404:
+            return None
+        return response.json()
+
+    def fetch_title(self, item_type: str, tmdb_id: int) -> Optional[Dict[str, Any]]:
+        """작품 상세 + credits / watch/providers / keywords / 연령 등급을 한 번의 호출로 가져옵니다."""
+        append = ["credits", "watch/providers", "keywords", RATING_APPEND[item_type]]
+        return self.get(f"/{item_type}/{tmdb_id}", {"language": "ko-KR", "append_to_response": ",".join(append)})
+
+# %%
+# --- 3. 응답 → tmdb_data.jsonl 레코드 (노트북과 같은 필드) ---
+
+def _kr_rating(item_type: str, data: Dict[str, Any]) -> str:
+    if item_type == 'movie':
+        for r in data.get('release_dates', {}).get('results', []):
+            if r.get('iso_3166_1') == 'KR':
+                # 한국 데이터 중 'certification'이 있는 첫 번째 항목을 사용
+                for release in r.get('release_dates', []):
+                    if release.get('certification'):
+                        return release['certification']
+    else:
+        for r in data.get('content_ratings', {}).get('results', []):
+            if r.get('iso_3166_1') == 'KR':
+                return r.get('rating', '')
+    return ""
+
+
+def parse_title(seed: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """seed(wikidata.csv 한 줄)와 TMDB 응답으로 data_preprocessing.ipynb와 같은 형식의 레코드를 만듭니다."""
+    item_type = seed['type']
+    enriched_data = {
+        "qid": seed['qid'], "imdb_id": seed['imdb_id'], "tmdb_id": seed['tmdb_id'], "type": item_type,
+        "title_ko": seed['title_ko'], "title_en": seed['title_en'], "year": seed['year'],
+    }
+    enriched_data['overview'] = data.get('overview', '')
+    enriched_data['genres'] = [g['name'] for g in data.get('genres', [])]
+    enriched_data['poster_path'] = data.get('poster_path', '')
+    enriched_data['backdrop_path'] = data.get('backdrop_path', '')
+
+    # 런타임은 movie/tv 구조가 다름 (TV는 에피소드 평균 런타임)
+    if item_type == 'movie':
+        enriched_data['runtime_min'] = data.get('runtime', 0)
+    else:
+        rt_list = data.get('episode_run_time', [])
+        enriched_data['runtime_min'] = rt_list[0] if rt_list else 0
+
+    credits = data.get('credits', {})
+    enriched_data['cast'] = [c['name'] for c in credits.get('cast', [])[:10]]
+    crew = credits.get('crew', [])
+    enriched_data['directors'] = [c['name'] for c in crew if c.get('job') == 'Director']
+    enriched_data['writers'] = [c['name'] for c in crew if c.get('job') in ('Writer', 'Screenplay')]
+
+    kr_providers = data.get('watch/providers', {}).get('results', {}).get('KR', {})
+    enriched_data['ott_streaming_kr'] = [p['provider_name'] for p in kr_providers.get('flatrate', [])]
+    enriched_data['ott_rent_kr'] = [p['provider_name'] for p in kr_providers.get('rent', [])]
+    enriched_data['ott_buy_kr'] = [p['provider_name'] for p in kr_providers.get('buy', [])]
+
+    keywords = data.get('keywords', {})
+    keywords_list = keywords.get('keywords', []) if item_type == 'movie' else keywords.get('results', [])
+    enriched_data['keywords'] = [k['name'] for k in keywords_list]
+
+    enriched_data['rating_kr'] = _kr_rating(item_type, data)
+    return enriched_data
+
+# %%
+# --- 4. 입력 / 이어하기 ---
+
+def read_seeds(path: str = INPUT_CSV) -> Iterator[Dict[str, Any]]:
+    """wikidata.csv를 한 줄씩 읽습니다. (tmdbID / type이 없는 줄과 중복 tmdb_id는 건너뜀)"""
+    seen: Set[int] = set()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for index, row in enumerate(csv.DictReader(f)):
+            try:
+                tmdb_id = int(float(row['tmdbID']))
+                item_type = row['type'].strip()
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                print(f"Skipping row {index}: 필수 데이터(tmdbID, type) 로드 실패. {e}")
+                continue
+            if item_type not in RATING_APPEND or tmdb_id in seen:
+                continue
+            seen.add(tmdb_id)
+            try:
+                year = int(float(row.get('pubYear') or 0))
+            except ValueError:
+                year = 0
+            yield {
+                "qid": row.get('item', ''), "imdb_id": row.get('imdbID', ''), "tmdb_id": tmdb_id,
+                "type": item_type, "title_ko": row.get('itemLabel'), "title_en": row.get('enLabel'), "year": year,
+            }
+
+
+def load_processed_ids(path: str = OUTPUT_JSONL) -> Set[int]:
+    """출력 파일에 이미 저장된 tmdb_id (체크포인트)."""
+    processed_ids: Set[int] = set()
+    if not os.path.exists(path):
+        return processed_ids
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                # 중단 중에 쓰다 만 줄은 무시 (다음 실행에서 다시 처리)
+                continue
+            if 'tmdb_id' in data:
+                processed_ids.add(data['tmdb_id'])
+    return processed_ids
+
+# %%
+# --- 5. 실행 ---
+
+def run_ingest(seeds: Iterable[Dict[str, Any]], client: TMDBClient, output_path: str = OUTPUT_JSONL,
+               workers: int = TMDB_WORKERS, show_progress: bool = True) -> Dict[str, Any]:
+    """
+    seeds를 스레드 풀로 보강해서 output_path에 이어 씁니다.
+    파일 쓰기는 메인 스레드에서만 하고 줄마다 flush하므로, 중단되어도 완료된 작품까지는 체크포인트로 남습니다.
+    """
+    processed_ids = load_processed_ids(output_path)
+    pending = [seed for seed in seeds if seed['tmdb_id'] not in processed_ids]
+    if processed_ids:
+        print(f"총 {len(processed_ids)}개의 기처리된 항목을 발견했습니다. 이어서 작업을 시작합니다.")
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    stats = {"done": 0, "not_found": 0, "errors": 0, "skipped": len(processed_ids)}
+    retries_before = client.retries
+    start = time.perf_counter()
+
+    def work(seed):
+        data = client.fetch_title(seed['type'], seed['tmdb_id'])
+        return None if data is None else parse_title(seed, data)
+
+    with open(output_path, "a", encoding="utf-8") as output_file, \
+         ThreadPoolExecutor(max_workers=workers) as executor, \
+         tqdm(total=len(pending), desc="Processing items", disable=not show_progress) as progress:
+        # 제출해 두는 작업 수를 제한해서 카탈로그가 커져도 메모리 사용량이 일정하도록 함
+        queue = iter(pending)
+        in_flight = {}
+        while True:
+            while len(in_flight) < workers * 4:
+                seed = next(queue, None)
+                if seed is None:
+                    break
+                in_flight[executor.submit(work, seed)] = seed
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                seed = in_flight.pop(future)
+                progress.update(1)
+                try:
+                    enriched_data = future.result()
+                except Exception as e:
+                    stats["errors"] += 1
+                    print(f"Error processing {seed['tmdb_id']}: {e}")
+                    continue
+                if enriched_data is None:
+                    stats["not_found"] += 1
+                    continue
+                output_file.write(json.dumps(enriched_data, ensure_ascii=False) + "\n")
+                output_file.flush()
+                stats["done"] += 1
+
+    elapsed = time.perf_counter() - start
+    stats.update({
+        "retries": client.retries - retries_before,
+        "elapsed_s": round(elapsed, 2),
+        "items_per_sec": round(stats["done"] / elapsed, 2) if elapsed > 0 else 0.0,
+    })
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TMDB 데이터 보강 (병렬 / 요청 수 제한 / 이어하기)")
+    parser.add_argument("--input", default=INPUT_CSV)
+    parser.add_argument("--output", default=OUTPUT_JSONL)
+    parser.add_argument("--workers", type=int, default=TMDB_WORKERS)
+    parser.add_argument("--rate", type=float, default=TMDB_RATE_LIMIT, help="초당 최대 요청 수")
+    parser.add_argument("--base-url", default=TMDB_BASE_URL)
+    parser.add_argument("--rebuild", action="store_true",
+                        help="출력 파일을 처음부터 다시 만듦 (저장된 응답은 재사용, 오류가 없을 때만 기존 파일 교체)")
+    parser.add_argument("--offline", action="store_true", help="네트워크 없이 http_cache에 저장된 응답만 사용")
+    args = parser.parse_args()
+
+    cache = get_http_cache(mode="offline") if args.offline else get_http_cache()
+    client = TMDBClient(base_url=args.base_url, workers=args.workers, rate=args.rate, cache=cache)
+    # --rebuild는 임시 파일에 만든 뒤 교체 (offline에서 저장된 응답이 없는 작품이 있어도 기존 파일은 그대로)
+    # 중단된 --rebuild를 다시 실행하면 임시 파일에서 이어서 진행
+    output_path = args.output + ".rebuild.tmp" if args.rebuild else args.output
+    stats = run_ingest(read_seeds(args.input), client, output_path, workers=args.workers)
+    print(f"--- 데이터 보강 완료: {stats}, 응답 캐시: {cache.counters} ---")
+    if args.rebuild:
+        if stats["errors"]:
+            print(f"오류 {stats['errors']}건이 있어 '{args.output}'을 교체하지 않았습니다. (결과: '{output_path}')")
+            sys.exit(1)
+        os.replace(output_path, args.output)
+    print(f"최종 데이터가 '{args.output}' 파일에 저장되었습니다.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# wikidata_ingest.py
+"""
+Wikidata_SPARQL.txt 쿼리를 Wikidata Query Service에 보내서 data/wikidata.csv를 만듭니다. (수집 1단계)
+응답은 http_cache에 저장되므로 TTL(HTTP_CACHE_TTL_WIKIDATA, 기본 7일) 안에 다시 실행하면 쿼리를 보내지 않습니다.
+쿼리 파일을 고치면 요청 본문이 바뀌므로 새로 요청합니다.
+
+실행 방법:
+    python wikidata_ingest.py
+    python wikidata_ingest.py --offline     # 저장된 응답으로만 wikidata.csv를 다시 씀
+"""
+
+# %%
+import argparse
+import csv
+import io
+import os
+from typing import Optional
+
+import requests
+
+from http_cache import HttpCache, get_http_cache
+
+# %%
+# --- 1. 설정 ---
+WIKIDATA_SPARQL_ENDPOINT = os.getenv("WIKIDATA_SPARQL_ENDPOINT", "https://query.wikidata.org/sparql")
+WIKIDATA_TIMEOUT = float(os.getenv("WIKIDATA_TIMEOUT", "120"))     # 큰 쿼리는 WDQS에서 수십 초 걸림
+SPARQL_PATH = "./Wikidata_SPARQL.txt"
+OUTPUT_CSV = "./data/wikidata.csv"
+USER_AGENT = "OTTBotDataCollector/1.0 (test@example.com)"
+
+# %%
+def fetch_wikidata_csv(query: str, cache: Optional[HttpCache] = None,
+                       endpoint: str = WIKIDATA_SPARQL_ENDPOINT) -> bytes:
+    """SPARQL 결과를 CSV(헤더 = SELECT 변수 이름) 바이트로 반환합니다."""
+    cache = cache or get_http_cache()
+    headers = {"Accept": "text/csv", "User-Agent": USER_AGENT}
+    data = {"query": query}
+
+    def send(request_headers):
+        # 쿼리가 길어서 GET URL 길이 제한을 피하도록 POST (form)로 보냄
+        return requests.post(endpoint, data=data, headers=request_headers, timeout=WIKIDATA_TIMEOUT)
+
+    response = cache.fetch("wikidata", endpoint, headers=headers, method="POST", data=data, send=send)
+    if response.status_code != 200:
+        raise requests.HTTPError(f"Wikidata SPARQL 요청 실패 (HTTP {response.status_code})")
+    return response.content
+
+
+def write_wikidata_csv(content: bytes, output_path: str = OUTPUT_CSV) -> int:
+    """CSV를 임시 파일에 쓴 뒤 교체합니다. (중간에 실패해도 기존 wikidata.csv는 그대로) 작품 행 수를 반환"""
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, output_path)
+    return sum(1 for _ in csv.DictReader(io.StringIO(content.decode("utf-8"))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wikidata SPARQL → data/wikidata.csv (응답 캐시 사용)")
+    parser.add_argument("--query", default=SPARQL_PATH)
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--offline", action="store_true", help="네트워크 없이 http_cache에 저장된 응답만 사용")
+    args = parser.parse_args()
+
+    with open(args.query, "r", encoding="utf-8") as f:
+        query = f.read()
+    cache = get_http_cache(mode="offline") if args.offline else get_http_cache()
+    rows = write_wikidata_csv(fetch_wikidata_csv(query, cache), args.output)
+    print(f"--- Wikidata 수집 완료: 작품 {rows}개, 응답 캐시: {cache.counters} ---")
+    print(f"최종 데이터가 '{args.output}' 파일에 저장되었습니다.")
+
+
+if __name__ == "__main__":
+    main()